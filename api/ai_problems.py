@@ -7,6 +7,9 @@ import tempfile
 import json
 import re
 
+from services import jvm_pool, output_checker, parallel_runner, sandbox
+from services.build_cache import build_cache
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -103,13 +106,13 @@ def validate_test_cases(reference_code, test_cases, language='Python'):
 
     logger.info(f"[自测调试] 初始化failed_cases变量: {type(failed_cases)}")
 
-    for i, test_case in enumerate(test_cases):
+    def check_test_case(i, test_case):
         # 处理新格式的测试用例（包含id字段）或旧格式（不含id字段）
         test_input = test_case.get('input', '')
         expected_output = test_case.get('output', '')
 
         if not test_input or not expected_output:
-            continue
+            return None
 
         try:
             temp_file = None  # 初始化临时文件路径
@@ -165,14 +168,13 @@ def validate_test_cases(reference_code, test_cases, language='Python'):
 
             if proc.returncode != 0:
                 # 执行错误
-                failed_cases.append({
+                return {"passed": False, "failed_case": {
                     "index": i + 1,
                     "input": test_input,
                     "expected": expected_output,
                     "actual": stderr,
                     "error": f"执行错误 (返回码: {proc.returncode})"
-                })
-                continue
+                }}
 
             # 比对输出结果（忽略空格和换行差异）
             actual_output = stdout.strip()
@@ -181,38 +183,46 @@ def validate_test_cases(reference_code, test_cases, language='Python'):
             if not actual_output and stderr:
                 actual_output = f"程序错误: {stderr.strip()}"
 
-            if actual_output.replace(' ', '').replace('\n', '') == expected_output.replace(' ', '').replace('\n', ''):
-                passed_count += 1
-            else:
-                failed_cases.append({
-                    "index": i + 1,
-                    "input": test_input,
-                    "expected": expected_output,
-                    "actual": actual_output,
-                    "error": "输出不匹配"
-                })
-
             # 清理临时文件（仅适用于Python分支）
             if temp_file and os.path.exists(temp_file):
                 os.unlink(temp_file)
 
+            if output_checker.compare(actual_output, expected_output, output_checker.COMPARE_WHITESPACE):
+                return {"passed": True}
+            return {"passed": False, "failed_case": {
+                "index": i + 1,
+                "input": test_input,
+                "expected": expected_output,
+                "actual": actual_output,
+                "error": "输出不匹配"
+            }}
+
         except subprocess.TimeoutExpired:
             proc.kill()
-            failed_cases.append({
+            return {"passed": False, "failed_case": {
                 "index": i + 1,
                 "input": test_input,
                 "expected": expected_output,
                 "actual": "",
                 "error": "执行超时（超过5秒）"
-            })
+            }}
         except Exception as e:
-            failed_cases.append({
+            return {"passed": False, "failed_case": {
                 "index": i + 1,
                 "input": test_input,
                 "expected": expected_output,
                 "actual": "",
                 "error": f"系统错误: {str(e)}"
-            })
+            }}
+
+    # 各测试用例并行执行，结果按原顺序汇总
+    for case_result in parallel_runner.run_test_cases(test_cases, check_test_case):
+        if case_result is None:
+            continue
+        if case_result["passed"]:
+            passed_count += 1
+        else:
+            failed_cases.append(case_result["failed_case"])
 
     success = passed_count == len(test_cases)
 
@@ -233,59 +243,40 @@ def execute_cpp_code(cpp_code, input_data):
     logger.info(f"[C++自测] C++代码前100字符: {cpp_code[:100]}...")
 
     try:
-        # 创建临时目录用于C++编译
-        import tempfile
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # 确保C++代码包含main函数
-            if 'int main(' not in cpp_code and 'main(' not in cpp_code:
-                logger.error("[C++自测] C++代码缺少main函数")
-                return "", "C++代码格式错误：缺少main函数\n"
-
-            # 写入C++文件
-            cpp_file = os.path.join(temp_dir, 'main.cpp')
-            with open(cpp_file, 'w', encoding='utf-8') as f:
-                f.write(cpp_code)
-
-            logger.info(f"[C++自测] C++文件已写入: {cpp_file}")
-
-            # 编译C++文件
-            exe_file = os.path.join(temp_dir, 'main')
-            compile_result = subprocess.run(
-                ['g++', '-o', exe_file, cpp_file],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+        # 确保C++代码包含main函数
+        if 'int main(' not in cpp_code and 'main(' not in cpp_code:
+            logger.error("[C++自测] C++代码缺少main函数")
+            return "", "C++代码格式错误：缺少main函数\n"
 
-            if compile_result.returncode != 0:
-                logger.error(f"[C++自测] 编译失败: {compile_result.stderr}")
-                logger.error(f"[C++自测] 尝试编译的文件内容: {cpp_code[:200]}...")
-                return "", f"编译错误:\n{compile_result.stderr}\n"
+        # 编译C++文件（同一份参考代码在多个测试用例间复用编译结果）
+        exe_file, compile_stderr = build_cache.compile_cpp(cpp_code, 'g++')
 
-            logger.info("[C++自测] C++编译成功")
+        if exe_file is None:
+            logger.error(f"[C++自测] 编译失败: {compile_stderr}")
+            logger.error(f"[C++自测] 尝试编译的文件内容: {cpp_code[:200]}...")
+            return "", f"编译错误:\n{compile_stderr}\n"
 
-            # 执行C++程序
-            execute_result = subprocess.run(
-                [exe_file],
-                input=input_data,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+        logger.info("[C++自测] C++编译成功")
+
+        # 在沙箱中执行C++程序
+        with sandbox.run_user_copy(exe_file) as run_file:
+            execute_result = sandbox.run([run_file], input_data, sandbox.SandboxLimits(timeout=10))
+        if execute_result.verdict == sandbox.VERDICT_TLE:
+            raise subprocess.TimeoutExpired(exe_file, 10)
 
-            stdout = execute_result.stdout
-            stderr = execute_result.stderr
+        stdout = execute_result.stdout
+        stderr = execute_result.stderr
 
-            logger.info(f"[C++自测] 执行C++命令: {exe_file}")
-            logger.info(f"[C++自测] 输入数据: {input_data[:50]}{'...' if len(input_data) > 50 else ''}")
+        logger.info(f"[C++自测] 执行C++命令: {exe_file}")
+        logger.info(f"[C++自测] 输入数据: {input_data[:50]}{'...' if len(input_data) > 50 else ''}")
 
-            if execute_result.returncode != 0:
-                logger.error(f"[C++自测] 执行失败: {stderr}")
-                logger.error(f"[C++自测] 错误详情 - 返回码: {execute_result.returncode}, stderr: {stderr[:200]}...")
-                return "", f"运行错误 (返回码: {execute_result.returncode}):\n{stderr}\n"
+        if execute_result.returncode != 0:
+            logger.error(f"[C++自测] 执行失败: {stderr}")
+            logger.error(f"[C++自测] 错误详情 - 返回码: {execute_result.returncode}, stderr: {stderr[:200]}...")
+            return "", f"运行错误 (返回码: {execute_result.returncode}):\n{stderr}\n"
 
-            logger.info(f"[C++自测] C++执行成功，输出: {stdout[:50]}{'...' if len(stdout) > 50 else ''}")
-            return stdout, ""
+        logger.info(f"[C++自测] C++执行成功，输出: {stdout[:50]}{'...' if len(stdout) > 50 else ''}")
+        return stdout, ""
 
     except subprocess.TimeoutExpired:
         logger.error("[C++自测] C++执行超时")
@@ -465,120 +456,110 @@ public static void main(String[] args) {
     logger.info(f"[Java自测] 最终使用的输入数据: {repr(input_data)}")
 
     try:
-        # 创建临时目录用于Java编译
-        import tempfile
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # 统一提取类名，支持多种格式
-            class_name_match = re.search(r'\b(class|interface|enum)\s+(\w+)', java_code)
-            if class_name_match:
-                actual_class_name = class_name_match.group(2)
-                java_file = os.path.join(temp_dir, f'{actual_class_name}.java')
-                logger.info(f"[Java自测] 提取类名: {actual_class_name}, 文件路径: {java_file}")
+        # 统一提取类名，支持多种格式
+        class_name_match = re.search(r'\b(class|interface|enum)\s+(\w+)', java_code)
+        if class_name_match:
+            actual_class_name = class_name_match.group(2)
+            logger.info(f"[Java自测] 提取类名: {actual_class_name}")
+        else:
+            logger.error("[Java自测] 无法提取Java代码中的类名")
+            return "", "Java代码格式错误：无法提取类名\n"
+
+        # 检查代码中是否有包声明，如果有则移除
+        # 注意：需要处理词边界，避免破坏类名中的"import"或"package"
+        cleaned_code = java_code
+        cleaned_code = re.sub(r'(?<![\w])\bpackage\s', '// package ', cleaned_code)
+
+        # 检查是否需要添加必要的import语句
+        required_imports = []
+
+        # 检查是否需要java.util包（包含Scanner等工具类）
+        has_java_util_import = 'import java.util' in cleaned_code
+        has_util_classes = any(cls in cleaned_code for cls in ['Scanner', 'List', 'ArrayList', 'LinkedList', 'Deque', 'Queue'])
+
+        logger.info(f"[Java自测] 清理后代码前100字符: {cleaned_code[:100]}")
+        logger.info(f"[Java自测] 工具类使用检测: {[cls for cls in ['Scanner', 'List', 'ArrayList', 'LinkedList', 'Deque', 'Queue'] if cls in cleaned_code]}")
+        logger.info(f"[Java自测] java.util导入检测: {has_java_util_import}")
+
+        # 只有当确实需要工具类且没有相应导入时才添加
+        if has_util_classes and not has_java_util_import:
+            required_imports.append('import java.util.*;')
+            logger.info("[Java自测] 将添加 java.util.*; 导入")
+
+        logger.info(f"[Java自测] 需要添加的导入列表: {required_imports}")
+
+        # 如果需要添加import语句
+        if required_imports:
+            # 总是添加到代码开头（类声明之前）
+            class_start = cleaned_code.find('public class')
+            if class_start >= 0 and class_start > 0:
+                # 在类声明前添加，但保留已经存在的import语句
+                imports_string = '\n'.join(required_imports) + '\n'
+                cleaned_code = cleaned_code[:class_start] + imports_string + cleaned_code[class_start:]
+                logger.info("[Java自测] 在类前添加必需的import语句")
             else:
-                logger.error("[Java自测] 无法提取Java代码中的类名")
-                return "", "Java代码格式错误：无法提取类名\n"
-
-            # 检查代码中是否有包声明，如果有则移除
-            # 注意：需要处理词边界，避免破坏类名中的"import"或"package"
-            cleaned_code = java_code
-            cleaned_code = re.sub(r'(?<![\w])\bpackage\s', '// package ', cleaned_code)
-
-            # 检查是否需要添加必要的import语句
-            required_imports = []
-
-            # 检查是否需要java.util包（包含Scanner等工具类）
-            has_java_util_import = 'import java.util' in cleaned_code
-            has_util_classes = any(cls in cleaned_code for cls in ['Scanner', 'List', 'ArrayList', 'LinkedList', 'Deque', 'Queue'])
-
-            logger.info(f"[Java自测] 清理后代码前100字符: {cleaned_code[:100]}")
-            logger.info(f"[Java自测] 工具类使用检测: {[cls for cls in ['Scanner', 'List', 'ArrayList', 'LinkedList', 'Deque', 'Queue'] if cls in cleaned_code]}")
-            logger.info(f"[Java自测] java.util导入检测: {has_java_util_import}")
-
-            # 只有当确实需要工具类且没有相应导入时才添加
-            if has_util_classes and not has_java_util_import:
-                required_imports.append('import java.util.*;')
-                logger.info("[Java自测] 将添加 java.util.*; 导入")
-
-            logger.info(f"[Java自测] 需要添加的导入列表: {required_imports}")
-
-            # 如果需要添加import语句
-            if required_imports:
-                # 总是添加到代码开头（类声明之前）
-                class_start = cleaned_code.find('public class')
-                if class_start >= 0 and class_start > 0:
-                    # 在类声明前添加，但保留已经存在的import语句
-                    imports_string = '\n'.join(required_imports) + '\n'
-                    cleaned_code = cleaned_code[:class_start] + imports_string + cleaned_code[class_start:]
-                    logger.info("[Java自测] 在类前添加必需的import语句")
-                else:
-                    # 如果找不到类声明，添加到开头
-                    imports_string = '\n'.join(required_imports) + '\n'
-                    cleaned_code = imports_string + cleaned_code
-                    logger.info("[Java自测] 无法找到类声明，将import添加到开头")
-
-            logger.info(f"[Java自测] 需要添加的import语句: {required_imports}")
-            logger.info(f"[Java自测] 清理打包声明后的代码长度: {len(cleaned_code)}")
-            logger.info(f"[Java自测] 清理打包声明后的代码前100字符: {cleaned_code[:100]}...")
-
-            # 记录完整的代码内容用于调试
-            logger.info(f"[Java自测] 完整清理后的代码内容:")
-            for i, line in enumerate(cleaned_code.split('\n'), 1):
-                logger.info(f"[Java自测] 行{i}: {line}")
-
-            # 检查清洁后的代码是否仍然包含有效的类定义
-            cleaned_class_match = re.search(r'\b(class|interface|enum)\s+\w+', cleaned_code)
-            if not cleaned_class_match:
-                logger.error("[Java自测] 清洁后的代码中找不到有效的类定义")
-                return "", "Java代码格式错误：清洁后找不到有效的类定义\n"
-
-            logger.info(f"[Java自测] 清洁后类定义: {cleaned_class_match.group()}")
-
-            # 写入Java文件（指定UTF-8编码）
-            with open(java_file, 'w', encoding='utf-8') as f:
-                f.write(cleaned_code)
-
-            logger.info(f"[Java自测] Java文件已写入: {java_file}")
-
-            # 类名已经在前面提取并验证了
-            logger.info(f"[Java自测] 使用类名执行: {actual_class_name}")
-
-            # 编译Java文件（使用Dawn JDK完整路径）
-            compile_result = subprocess.run(
-                [r'C:\Program Files\Java\jdk-24\bin\javac.exe', '-cp', temp_dir, '-encoding', 'utf-8', java_file],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-
-            if compile_result.returncode != 0:
-                logger.error(f"[Java自测] 编译失败: {compile_result.stderr}")
-                logger.error(f"[Java自测] 尝试编译的文件内容: {cleaned_code[:200]}...")
-                return "", f"编译错误:\n{compile_result.stderr}\n"
-
-            logger.info("[Java自测] Java编译成功")
-
-            # 执行Java程序，使用Dawn JDK完整路径
-            execute_result = subprocess.run(
-                [r'C:\Program Files\Java\jdk-24\bin\java.exe', '-cp', temp_dir, actual_class_name],
-                input=input_data,
-                capture_output=True,
-                text=True,
-                timeout=10
+                # 如果找不到类声明，添加到开头
+                imports_string = '\n'.join(required_imports) + '\n'
+                cleaned_code = imports_string + cleaned_code
+                logger.info("[Java自测] 无法找到类声明，将import添加到开头")
+
+        logger.info(f"[Java自测] 需要添加的import语句: {required_imports}")
+        logger.info(f"[Java自测] 清理打包声明后的代码长度: {len(cleaned_code)}")
+        logger.info(f"[Java自测] 清理打包声明后的代码前100字符: {cleaned_code[:100]}...")
+
+        # 记录完整的代码内容用于调试
+        logger.info(f"[Java自测] 完整清理后的代码内容:")
+        for i, line in enumerate(cleaned_code.split('\n'), 1):
+            logger.info(f"[Java自测] 行{i}: {line}")
+
+        # 检查清洁后的代码是否仍然包含有效的类定义
+        cleaned_class_match = re.search(r'\b(class|interface|enum)\s+\w+', cleaned_code)
+        if not cleaned_class_match:
+            logger.error("[Java自测] 清洁后的代码中找不到有效的类定义")
+            return "", "Java代码格式错误：清洁后找不到有效的类定义\n"
+
+        logger.info(f"[Java自测] 清洁后类定义: {cleaned_class_match.group()}")
+
+        # 类名已经在前面提取并验证了
+        logger.info(f"[Java自测] 使用类名执行: {actual_class_name}")
+
+        # 编译Java文件（使用Dawn JDK完整路径，同一份参考代码在多个测试用例间复用编译结果）
+        class_dir, compile_stderr = build_cache.compile_java(
+            cleaned_code, actual_class_name,
+            javac_path=r'C:\Program Files\Java\jdk-24\bin\javac.exe',
+            flags=['-encoding', 'utf-8']
+        )
+
+        if class_dir is None:
+            logger.error(f"[Java自测] 编译失败: {compile_stderr}")
+            logger.error(f"[Java自测] 尝试编译的文件内容: {cleaned_code[:200]}...")
+            return "", f"编译错误:\n{compile_stderr}\n"
+
+        logger.info("[Java自测] Java编译成功")
+
+        # 执行Java程序，使用Dawn JDK完整路径
+        with sandbox.run_user_copy(class_dir) as run_class_dir:
+            execute_result = jvm_pool.run_java(
+                run_class_dir, actual_class_name, input_data, sandbox.SandboxLimits(timeout=10, limit_address_space=False),
+                java_path=r'C:\Program Files\Java\jdk-24\bin\java.exe',
+                javac_path=r'C:\Program Files\Java\jdk-24\bin\javac.exe'
             )
+        if execute_result.verdict == sandbox.VERDICT_TLE:
+            raise subprocess.TimeoutExpired(actual_class_name, 10)
 
-            stdout = execute_result.stdout.strip()
-            stderr = execute_result.stderr
+        stdout = execute_result.stdout.strip()
+        stderr = execute_result.stderr
 
-            logger.info(f"[Java自测] 执行Java命令: java -cp {temp_dir} {actual_class_name}")
-            logger.info(f"[Java自测] 输入数据: {input_data[:50]}{'...' if len(input_data) > 50 else ''}")
+        logger.info(f"[Java自测] 执行Java命令: java -cp {class_dir} {actual_class_name}")
+        logger.info(f"[Java自测] 输入数据: {input_data[:50]}{'...' if len(input_data) > 50 else ''}")
 
-            if execute_result.returncode != 0:
-                logger.error(f"[Java自测] 执行失败: {stderr}")
-                logger.error(f"[Java自测] 错误详情 - 返回码: {execute_result.returncode}, stderr: {stderr[:200]}...")
-                return "", f"运行错误 (返回码: {execute_result.returncode}):\n{stderr}\n"
+        if execute_result.returncode != 0:
+            logger.error(f"[Java自测] 执行失败: {stderr}")
+            logger.error(f"[Java自测] 错误详情 - 返回码: {execute_result.returncode}, stderr: {stderr[:200]}...")
+            return "", f"运行错误 (返回码: {execute_result.returncode}):\n{stderr}\n"
 
-            logger.info(f"[Java自测] Java执行成功，输出: {stdout[:50]}{'...' if len(stdout) > 50 else ''}")
-            return stdout.strip(), ""
+        logger.info(f"[Java自测] Java执行成功，输出: {stdout[:50]}{'...' if len(stdout) > 50 else ''}")
+        return stdout.strip(), ""
 
     except subprocess.TimeoutExpired:
         logger.error("[Java自测] Java执行超时")
@@ -1,10 +1,146 @@
 from flask import Blueprint, jsonify, request, session
 from database import db
+from services.problem_cache import problem_cache
+from services.question_catalog import QUESTION_TABLES, remove_question, sync_question
+from services.question_search import search_condition
+from services.question_stats import question_stats
+from services.question_tags import tag_facets, tag_filter_condition
+from services.testcase_store import resolve_test_cases
+from utils.db_utils import insert_test_cases
+from utils.pagination import (
+    CursorError, cursor_requested, decode_cursor, include_total, page_result, page_size
+)
+import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 question_bank_bp = Blueprint('question_bank', __name__)
 
+# 列表筛选参数中的题型（编程题为programming）
+PROBLEM_TYPE_FILTERS = {'programming': 'progressing', 'choice': 'choice', 'judgment': 'judgment'}
+
+# 游标分页的排序键：创建时间、题型、ID（均倒序）
+PROBLEM_CURSOR_KEYS = (datetime.datetime.fromisoformat, str, int)
+
+# 题目列表：先在题目目录上筛选、排序、分页，再按主键补充本页题目的描述
+PROBLEM_LIST_SQL = """
+    SELECT page.question_type, page.question_id as id, page.title, page.language,
+           COALESCE(pq.description, cq.description, jq.description) as description,
+           page.difficulty, page.knowledge_points, page.created_at
+    FROM (
+        SELECT qc.question_type, qc.question_id, qc.title, qc.language, qc.difficulty,
+               qc.knowledge_points, qc.created_at
+        FROM question_catalog qc{where}
+        ORDER BY qc.created_at DESC, qc.question_type DESC, qc.question_id DESC
+        {limit}
+    ) page
+    LEFT JOIN progressing_questions pq
+        ON page.question_type = 'progressing' AND pq.progressing_questions_id = page.question_id
+    LEFT JOIN choice_questions cq
+        ON page.question_type = 'choice' AND cq.choice_questions_id = page.question_id
+    LEFT JOIN judgment_questions jq
+        ON page.question_type = 'judgment' AND jq.judgment_questions_id = page.question_id
+    ORDER BY page.created_at DESC, page.question_type DESC, page.question_id DESC
+"""
+
+
+def _where(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def _catalog_search_condition(search, question_types):
+    """标题或描述包含搜索词：在各题目表的全文索引上查找，再与目录按 (题型, ID) 匹配"""
+    search_sql, search_params = search_condition(search)
+    parts = []
+    for question_type in question_types:
+        table, id_column = QUESTION_TABLES[question_type]
+        parts.append(f"(qc.question_type = '{question_type}' AND qc.question_id IN "
+                     f"(SELECT {id_column} FROM {table} WHERE {search_sql}))")
+    return "(" + " OR ".join(parts) + ")", search_params * len(question_types)
+
+
+def _problem_filters(args, with_knowledge_points=True):
+    """
+    题目目录（别名qc）上的筛选条件：题型、搜索词（走各题目表的全文索引）、语言、难度、知识点（走标签索引）
+    :return: (条件列表, 参数列表)
+    """
+    search = args.get('search', '').strip()
+    language = args.get('language', '').strip()
+    difficulty = args.get('difficulty', '').strip()
+    knowledge_points = args.get('knowledge_points', '').strip() if with_knowledge_points else ''
+    problem_type = args.get('problem_type', '').strip()
+
+    # 根据题型筛选，未指定时查询所有题型 (修复：从中文改为英文值，与前端保持一致)
+    if problem_type in PROBLEM_TYPE_FILTERS:
+        question_types = [PROBLEM_TYPE_FILTERS[problem_type]]
+    else:
+        question_types = list(QUESTION_TABLES)
+
+    conditions = []
+    params = []
+
+    if len(question_types) == 1:
+        conditions.append("qc.question_type = %s")
+        params.append(question_types[0])
+
+    if search:
+        search_sql, search_params = _catalog_search_condition(search, question_types)
+        conditions.append(search_sql)
+        params.extend(search_params)
+
+    if language:
+        conditions.append("qc.language = %s")
+        params.append(language)
+
+    if difficulty:
+        conditions.append("qc.difficulty = %s")
+        params.append(difficulty)
+
+    if knowledge_points:
+        tag_sql, tag_params = tag_filter_condition(knowledge_points)
+        conditions.append(tag_sql)
+        params.extend(tag_params)
+
+    return conditions, params
+
+
+def _count_problems(conditions, params):
+    """符合条件的题目总数"""
+    total_result = db.execute_query(f"SELECT COUNT(*) as total FROM question_catalog qc{_where(conditions)}", params)
+    return total_result[0]['total'] if total_result else 0
+
+
+def _problem_cursor(problem):
+    return problem['created_at'], problem['question_type'], problem['id']
+
+
+def _problem_keyset_page(conditions, params):
+    """
+    按 (created_at, question_type, id) 倒序的游标分页：在目录的 idx_created 索引上从游标处继续读取
+    per_page+1 条，多出的一行表示还有下一页
+    """
+    size = page_size(request.args)
+    cursor = request.args.get('cursor', '').strip()
+
+    page_conditions = list(conditions)
+    page_params = list(params)
+    if cursor:
+        created_at, after_type, after_id = decode_cursor(cursor, PROBLEM_CURSOR_KEYS)
+        page_conditions.append("""(qc.created_at < %s OR (qc.created_at = %s AND
+            (qc.question_type < %s OR (qc.question_type = %s AND qc.question_id < %s))))""")
+        page_params.extend([created_at, created_at, after_type, after_type, after_id])
+
+    rows = db.execute_query(
+        PROBLEM_LIST_SQL.format(where=_where(page_conditions), limit="LIMIT %s"),
+        page_params + [size + 1]
+    )
+    problems, pagination = page_result(rows, size, _problem_cursor)
+
+    if include_total(request.args):
+        pagination['total'] = _count_problems(conditions, params)
+
+    return jsonify({"success": True, "data": problems, "pagination": pagination})
+
 @question_bank_bp.route('/api/question-bank/problems', methods=['GET'])
 def get_question_bank_problems():
     """获取题库题目列表（支持筛选）"""
@@ -20,171 +156,23 @@ def get_question_bank_problems():
         # 获取查询参数
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
-        search = request.args.get('search', '').strip()
-        language = request.args.get('language', '').strip()
-        difficulty = request.args.get('difficulty', '').strip()
-        knowledge_points = request.args.get('knowledge_points', '').strip()
-        problem_type = request.args.get('problem_type', '').strip()
-
         offset = (page - 1) * per_page
 
-        # 构建查询条件
-        conditions = []
-        params = []
-
-        # 根据题型选择不同的表 (修复：从中文改为英文值，与前端保持一致)
-        if problem_type == 'programming':
-            base_sql = """
-                SELECT
-                    'progressing' as question_type,
-                    progressing_questions_id as id,
-                    title,
-                    language,
-                    description,
-                    difficulty,
-                    knowledge_points,
-                    created_at
-                FROM progressing_questions
-                WHERE 1=1
-            """
-            count_sql = "SELECT COUNT(*) as total FROM progressing_questions WHERE 1=1"
-
-        elif problem_type == 'choice':
-            base_sql = """
-                SELECT
-                    'choice' as question_type,
-                    choice_questions_id as id,
-                    title,
-                    language,
-                    description,
-                    difficulty,
-                    knowledge_points,
-                    created_at
-                FROM choice_questions
-                WHERE 1=1
-            """
-            count_sql = "SELECT COUNT(*) as total FROM choice_questions WHERE 1=1"
-
-        elif problem_type == 'judgment':
-            base_sql = """
-                SELECT
-                    'judgment' as question_type,
-                    judgment_questions_id as id,
-                    title,
-                    language,
-                    description,
-                    difficulty,
-                    knowledge_points,
-                    created_at
-                FROM judgment_questions
-                WHERE 1=1
-            """
-            count_sql = "SELECT COUNT(*) as total FROM judgment_questions WHERE 1=1"
-
-        else:
-            # 查询所有题型
-            base_sql = """
-                SELECT * FROM (
-                    SELECT
-                        'progressing' as question_type,
-                        progressing_questions_id as id,
-                        title,
-                        language,
-                        description,
-                        difficulty,
-                        knowledge_points,
-                        created_at
-                    FROM progressing_questions
-                    UNION ALL
-                    SELECT
-                        'choice' as question_type,
-                        choice_questions_id as id,
-                        title,
-                        language,
-                        description,
-                        difficulty,
-                        knowledge_points,
-                        created_at
-                    FROM choice_questions
-                    UNION ALL
-                    SELECT
-                        'judgment' as question_type,
-                        judgment_questions_id as id,
-                        title,
-                        language,
-                        description,
-                        difficulty,
-                        knowledge_points,
-                        created_at
-                    FROM judgment_questions
-                ) AS all_questions WHERE 1=1
-            """
-            count_sql = """
-                SELECT
-                    (SELECT COUNT(*) FROM progressing_questions) +
-                    (SELECT COUNT(*) FROM choice_questions) +
-                    (SELECT COUNT(*) FROM judgment_questions) as total
-            """
-
-        # 添加筛选条件 - 统一处理逻辑
-        if search:
-            search_param = f'%{search}%'
-            conditions.append("(title LIKE %s OR description LIKE %s)")
-            params.extend([search_param, search_param])
-
-        if language:
-            conditions.append("language = %s")
-            params.append(language)
-
-        if difficulty:
-            conditions.append("difficulty = %s")
-            params.append(difficulty)
-
-        if knowledge_points:
-            kp_param = f'%{knowledge_points}%'
-            conditions.append("knowledge_points LIKE %s")
-            params.append(kp_param)
+        # 构建查询条件（在题目目录上筛选）
+        conditions, params = _problem_filters(request.args)
 
-        # 构建完整查询
-        where_clause = " AND " + " AND ".join(conditions) if conditions else ""
-        final_sql = base_sql + where_clause + " ORDER BY created_at DESC LIMIT %s OFFSET %s"
-        params.extend([per_page, offset])
+        # 带 cursor 参数时使用游标分页（翻页代价与页数无关），否则按页码分页
+        if cursor_requested(request.args):
+            return _problem_keyset_page(conditions, params)
 
         # 获取总数
-        if problem_type and conditions:
-            # 如果指定了题型且有筛选条件，需要传递筛选参数
-            count_params = params[:-2] if params else []  # 去掉分页参数
-            try:
-                count_query = count_sql + where_clause
-                logger.debug(f"Count SQL: {count_query}, Params: {count_params}")
-                total_result = db.execute_query(count_query, count_params)
-                logger.debug(f"Count result: {total_result}")
-            except Exception as e:
-                logger.error(f"Count query failed: {e}, SQL: {count_query}, Params: {count_params}")
-                raise e
-        elif problem_type and not conditions:
-            # 如果指定了题型但没有筛选条件，直接使用基础count_sql
-            try:
-                logger.debug(f"Count SQL: {count_sql}, Params: []")
-                total_result = db.execute_query(count_sql, [])
-                logger.debug(f"Count result: {total_result}")
-            except Exception as e:
-                logger.error(f"Count query failed: {e}, SQL: {count_sql}")
-                raise e
-        else:
-            # 如果没有指定题型，直接使用count_sql
-            try:
-                logger.debug(f"Count SQL: {count_sql}, Params: []")
-                total_result = db.execute_query(count_sql, [])
-                logger.debug(f"Count result: {total_result}")
-            except Exception as e:
-                logger.error(f"Count query failed: {e}, SQL: {count_sql}")
-                raise e
-
-        total = total_result[0]['total'] if total_result else 0
+        total = _count_problems(conditions, params)
 
         # 获取题目列表
-        problems = db.execute_query(final_sql, params)
+        problems = db.execute_query(
+            PROBLEM_LIST_SQL.format(where=_where(conditions), limit="LIMIT %s OFFSET %s"),
+            params + [per_page, offset]
+        )
 
         return jsonify({
             "success": True,
@@ -197,6 +185,8 @@ def get_question_bank_problems():
             }
         })
 
+    except CursorError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         logger.error(f"获取题库题目失败: {e}")
         return jsonify({"success": False, "message": "获取题库题目失败"}), 500
@@ -243,15 +233,15 @@ def get_problem_detail(problem_id):
 
             problem = problem[0]
 
-            # 获取测试用例
+            # 获取测试用例（编辑时需要完整数据，保存为文件的数据读回）
             test_cases = db.execute_query("""
-                SELECT input, output, is_example
+                SELECT input, output, input_hash, output_hash, is_example
                 FROM progressing_questions_test_cases
                 WHERE progressing_questions_id = %s
                 ORDER BY id
             """, (problem_id,))
 
-            problem['test_cases'] = test_cases
+            problem['test_cases'] = resolve_test_cases(test_cases)
 
         elif problem_type == 'choice':
             # 获取选择题详情
@@ -325,55 +315,33 @@ def get_question_bank_stats():
                 "redirect": "/login"
             }), 401
 
-        # 获取各题型数量
-        progressing_count = db.execute_query("SELECT COUNT(*) as count FROM progressing_questions")[0]['count']
-        choice_count = db.execute_query("SELECT COUNT(*) as count FROM choice_questions")[0]['count']
-        judgment_count = db.execute_query("SELECT COUNT(*) as count FROM judgment_questions")[0]['count']
-
-        # 获取各语言统计
-        language_stats = db.execute_query("""
-            SELECT language, COUNT(*) as count
-            FROM (
-                SELECT language FROM progressing_questions WHERE language IS NOT NULL AND language != ''
-                UNION ALL
-                SELECT language FROM choice_questions WHERE language IS NOT NULL AND language != ''
-                UNION ALL
-                SELECT language FROM judgment_questions WHERE language IS NOT NULL AND language != ''
-            ) AS all_languages
-            GROUP BY language
-            ORDER BY count DESC
-        """)
-
-        # 获取各难度统计
-        difficulty_stats = db.execute_query("""
-            SELECT difficulty, COUNT(*) as count
-            FROM (
-                SELECT difficulty FROM progressing_questions WHERE difficulty IS NOT NULL AND difficulty != ''
-                UNION ALL
-                SELECT difficulty FROM choice_questions WHERE difficulty IS NOT NULL AND difficulty != ''
-                UNION ALL
-                SELECT difficulty FROM judgment_questions WHERE difficulty IS NOT NULL AND difficulty != ''
-            ) AS all_difficulties
-            GROUP BY difficulty
-            ORDER BY count DESC
-        """)
-
-        return jsonify({
-            "success": True,
-            "data": {
-                "total_problems": progressing_count + choice_count + judgment_count,
-                "progressing_count": progressing_count,
-                "choice_count": choice_count,
-                "judgment_count": judgment_count,
-                "language_stats": language_stats,
-                "difficulty_stats": difficulty_stats
-            }
-        })
+        # 统计数据来自进程内缓存（题目增删改时增量更新，到期后重新统计）
+        return jsonify({"success": True, "data": question_stats.get()})
 
     except Exception as e:
         logger.error(f"获取题库统计失败: {e}")
         return jsonify({"success": False, "message": "获取题库统计失败"}), 500
 
+@question_bank_bp.route('/api/question-bank/knowledge-points', methods=['GET'])
+def get_knowledge_point_facets():
+    """获取知识点分面统计：各知识点标签在符合筛选条件（题型、语言、难度、搜索词）的题目中的题目数"""
+    try:
+        # 检查教师权限
+        if 'identity' not in session or session['identity'] != 'teacher':
+            return jsonify({
+                "success": False,
+                "message": "需要教师权限",
+                "redirect": "/login"
+            }), 401
+
+        limit = request.args.get('limit', 0, type=int)
+        conditions, params = _problem_filters(request.args, with_knowledge_points=False)
+        return jsonify({"success": True, "data": tag_facets(conditions, params, limit)})
+
+    except Exception as e:
+        logger.error(f"获取知识点统计失败: {e}")
+        return jsonify({"success": False, "message": "获取知识点统计失败"}), 500
+
 @question_bank_bp.route('/api/question-bank/problems', methods=['POST'])
 def create_problem():
     """创建新题目"""
@@ -413,25 +381,15 @@ def create_problem():
             reference_code = data.get('reference_code', '').strip()
             test_cases = data.get('test_cases', [])
 
-            # 插入编程题
-            result = db.execute_query("""
-                INSERT INTO progressing_questions
-                (title, language, description, difficulty, knowledge_points, input_description, output_description, solution_idea, reference_code, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-            """, (title, language, description, difficulty, knowledge_points, input_description, output_description, solution_idea, reference_code))
-
-            # 获取插入的题目ID
-            problem_id = db.execute_query("SELECT LAST_INSERT_ID() as id")[0]['id']
-
-            # 插入测试用例
-            if test_cases:
-                for test_case in test_cases:
-                    if test_case.get('input') or test_case.get('output'):
-                        db.execute_query("""
-                            INSERT INTO progressing_questions_test_cases
-                            (progressing_questions_id, input, output, is_example)
-                            VALUES (%s, %s, %s, %s)
-                        """, (problem_id, test_case.get('input', ''), test_case.get('output', ''), False))
+            # 插入编程题和测试用例（同一个事务，测试用例批量插入，较大的数据保存为文件）
+            with db.transaction():
+                problem_id = db.execute_insert("""
+                    INSERT INTO progressing_questions
+                    (title, language, description, difficulty, knowledge_points, input_description, output_description, solution_idea, reference_code, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                """, (title, language, description, difficulty, knowledge_points, input_description, output_description, solution_idea, reference_code))
+                insert_test_cases(problem_id, test_cases)
+                sync_question('progressing', problem_id)
 
         elif question_type == 'choice':
             # 创建选择题
@@ -449,15 +407,14 @@ def create_problem():
             import json
             options_json = json.dumps(options, ensure_ascii=False)
 
-            # 插入选择题
-            result = db.execute_query("""
-                INSERT INTO choice_questions
-                (title, language, description, difficulty, knowledge_points, options, correct_answer, solution_idea, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
-            """, (title, language, description, difficulty, knowledge_points, options_json, correct_answer, solution_idea))
-
-            # 获取插入的题目ID
-            problem_id = db.execute_query("SELECT LAST_INSERT_ID() as id")[0]['id']
+            # 插入选择题，并在同一个事务中加入题目目录
+            with db.transaction():
+                problem_id = db.execute_insert("""
+                    INSERT INTO choice_questions
+                    (title, language, description, difficulty, knowledge_points, options, correct_answer, solution_idea, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                """, (title, language, description, difficulty, knowledge_points, options_json, correct_answer, solution_idea))
+                sync_question('choice', problem_id)
 
         elif question_type == 'judgment':
             # 创建判断题
@@ -475,15 +432,14 @@ def create_problem():
             else:
                 return jsonify({"success": False, "message": "判断题正确答案格式错误"}), 400
 
-            # 插入判断题
-            result = db.execute_query("""
-                INSERT INTO judgment_questions
-                (title, language, description, difficulty, knowledge_points, correct_answer, solution_idea, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-            """, (title, language, description, difficulty, knowledge_points, correct_answer, solution_idea))
-
-            # 获取插入的题目ID
-            problem_id = db.execute_query("SELECT LAST_INSERT_ID() as id")[0]['id']
+            # 插入判断题，并在同一个事务中加入题目目录
+            with db.transaction():
+                problem_id = db.execute_insert("""
+                    INSERT INTO judgment_questions
+                    (title, language, description, difficulty, knowledge_points, correct_answer, solution_idea, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                """, (title, language, description, difficulty, knowledge_points, correct_answer, solution_idea))
+                sync_question('judgment', problem_id)
 
         else:
             return jsonify({"success": False, "message": "无效的题目类型"}), 400
@@ -538,13 +494,17 @@ def delete_problem(problem_id):
         if not existing_problem:
             return jsonify({"success": False, "message": "题目不存在"}), 404
 
-        # 删除题目
-        if problem_type == 'progressing':
-            # 先删除相关的测试用例
-            db.execute_query(f"DELETE FROM {test_cases_table} WHERE {id_column} = %s", (problem_id,))
+        # 删除题目（测试用例、题目本身和目录行在同一个事务中删除）
+        with db.transaction():
+            if problem_type == 'progressing':
+                # 先删除相关的测试用例
+                db.execute_update(f"DELETE FROM {test_cases_table} WHERE {id_column} = %s", (problem_id,))
 
-        # 删除题目本身
-        db.execute_query(f"DELETE FROM {table_name} WHERE {id_column} = %s", (problem_id,))
+            # 删除题目本身
+            db.execute_update(f"DELETE FROM {table_name} WHERE {id_column} = %s", (problem_id,))
+            remove_question(problem_type, problem_id)
+        if problem_type == 'progressing':
+            problem_cache.invalidate(problem_id)
 
         return jsonify({
             "success": True,
@@ -627,24 +587,20 @@ def update_problem(problem_id):
             if not existing:
                 return jsonify({"success": False, "message": "题目不存在"}), 404
 
-            if update_fields:
-                update_sql = f"UPDATE {table_name} SET {', '.join(update_fields)} WHERE {id_column} = %s"
-                update_values.append(problem_id)
-                affected = db.execute_update(update_sql, update_values)
-
-            # 处理测试用例更新
-            if 'test_cases' in data and isinstance(data['test_cases'], list):
-                # 先删除现有的测试用例
-                db.execute_query(f"DELETE FROM progressing_questions_test_cases WHERE {id_column} = %s", (problem_id,))
-
-                # 插入新的测试用例
-                for test_case in data['test_cases']:
-                    if isinstance(test_case, dict) and (test_case.get('input') or test_case.get('output')):
-                        db.execute_query(f"""
-                            INSERT INTO progressing_questions_test_cases
-                            ({id_column}, input, output, is_example)
-                            VALUES (%s, %s, %s, %s)
-                        """, (problem_id, test_case.get('input', ''), test_case.get('output', ''), False))
+            # 题目字段和测试用例在同一个事务中更新，评测不会读到没有测试用例的中间状态
+            with db.transaction():
+                if update_fields:
+                    update_sql = f"UPDATE {table_name} SET {', '.join(update_fields)} WHERE {id_column} = %s"
+                    update_values.append(problem_id)
+                    affected = db.execute_update(update_sql, update_values)
+                    sync_question(problem_type, problem_id)
+
+                # 处理测试用例更新：删除现有的测试用例后批量插入新的测试用例（较大的数据保存为文件）
+                if 'test_cases' in data and isinstance(data['test_cases'], list):
+                    db.execute_update(f"DELETE FROM progressing_questions_test_cases WHERE {id_column} = %s", (problem_id,))
+                    insert_test_cases(problem_id, data['test_cases'])
+
+            problem_cache.invalidate(problem_id)
 
         elif problem_type == 'choice':
             # 选择题特定字段
@@ -670,10 +626,13 @@ def update_problem(problem_id):
             if not existing:
                 return jsonify({"success": False, "message": "题目不存在"}), 404
 
+            # 题目和题目目录在同一个事务中更新
             if update_fields:
-                update_sql = f"UPDATE {table_name} SET {', '.join(update_fields)} WHERE {id_column} = %s"
-                update_values.append(problem_id)
-                affected = db.execute_update(update_sql, update_values)
+                with db.transaction():
+                    update_sql = f"UPDATE {table_name} SET {', '.join(update_fields)} WHERE {id_column} = %s"
+                    update_values.append(problem_id)
+                    affected = db.execute_update(update_sql, update_values)
+                    sync_question(problem_type, problem_id)
 
         elif problem_type == 'judgment':
             # 判断题特有字段
@@ -699,10 +658,13 @@ def update_problem(problem_id):
             if not existing:
                 return jsonify({"success": False, "message": "题目不存在"}), 404
 
+            # 题目和题目目录在同一个事务中更新
             if update_fields:
-                update_sql = f"UPDATE {table_name} SET {', '.join(update_fields)} WHERE {id_column} = %s"
-                update_values.append(problem_id)
-                affected = db.execute_update(update_sql, update_values)
+                with db.transaction():
+                    update_sql = f"UPDATE {table_name} SET {', '.join(update_fields)} WHERE {id_column} = %s"
+                    update_values.append(problem_id)
+                    affected = db.execute_update(update_sql, update_values)
+                    sync_question(problem_type, problem_id)
 
         if not update_fields and 'test_cases' not in data:
             return jsonify({"success": False, "message": "没有有效的更新内容"}), 400
@@ -718,6 +680,8 @@ def update_problem(problem_id):
 
     except Exception as e:
         logger.error(f"更新题目失败: {e}")
+        # 更新中途失败时数据库中的题目可能已被部分修改
+        problem_cache.invalidate(problem_id)
         return jsonify({"success": False, "message": "更新题目失败"}), 500
 # 临时调试路由 - 题型筛选问题
 @question_bank_bp.route('/api/debug/filter-test', methods=['GET'])
@@ -1,14 +1,18 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request, session, current_app, Response, stream_with_context
 from database import db
+from services import code_runner
+from services.judge_service import judge_service
+from services.problem_cache import problem_cache
+from services.submission_summary import refresh_submission_summary
+from utils.pagination import CursorError, cursor_requested, decode_cursor, include_total, page_result, page_size
 import logging
+import datetime
 import hashlib
 import csv
 import io
 import json
 import re
-import zipfile
 import tempfile
-import os
 from werkzeug.utils import secure_filename
 
 logger = logging.getLogger(__name__)
@@ -168,19 +172,26 @@ def get_student_assignments():
         if not course_id:
             return jsonify({"success": False, "message": "缺少课程ID参数"}), 400
 
-        # 获取作业表
+        # 获取作业表，同时按作业汇总该学生已提交的答题记录数（一次查询）
         assignments_sql = """
             SELECT DISTINCT
                 ha.id as id,
                 ha.title,
                 ha.description,
                 ha.deadline as deadline,
-                ha.created_at
+                ha.created_at,
+                IFNULL(answered.submission_count, 0) as submission_count
             FROM homework_assignments ha
+            LEFT JOIN (
+                SELECT sa.homework_id, COUNT(*) as submission_count
+                FROM student_answers sa
+                WHERE sa.student_id = %s AND sa.status IN ('submitted', 'graded')
+                GROUP BY sa.homework_id
+            ) answered ON answered.homework_id = ha.id
             WHERE ha.course_id = %s
         """
 
-        params = [course_id]
+        params = [student_id, course_id]
 
         # 如果提供了班级ID，进一步筛选
         if class_id:
@@ -201,19 +212,9 @@ def get_student_assignments():
 
         assignments = db.execute_query(assignments_sql, tuple(params))
 
-        # 为每个作业查询完成状态
         for assignment in assignments:
-            # 查询该学生在该作业中的提交记录数
-            submission_check_sql = """
-                SELECT COUNT(*) as submission_count
-                FROM student_answers sa
-                WHERE sa.student_id = %s AND sa.homework_id = %s
-                AND sa.status IN ('submitted', 'graded')
-            """
-            submission_result = db.execute_query(submission_check_sql, (student_id, assignment['id']))
-
             # 如果有提交记录，标记为已完成，否则为进行中
-            assignment['status'] = 'completed' if submission_result and submission_result[0]['submission_count'] > 0 else 'pending'
+            assignment['status'] = 'completed' if assignment.pop('submission_count') > 0 else 'pending'
 
             # 处理时间格式
             if assignment['deadline']:
@@ -939,12 +940,37 @@ def get_all_students():
             search_pattern = f"%{search_term}%"
             params = [search_pattern, search_pattern, search_pattern]
 
+        # 带 cursor 参数时按 (created_at, student_id) 倒序游标分页，否则返回全部学生
+        if cursor_requested(request.args):
+            size = page_size(request.args)
+            cursor = request.args.get('cursor', '').strip()
+            total = None
+            if include_total(request.args):
+                total = db.execute_query(f"SELECT COUNT(*) as total FROM ({base_sql}) AS matched", tuple(params))[0]['total']
+
+            page_sql = base_sql
+            page_params = list(params)
+            if cursor:
+                created_at, after_id = decode_cursor(cursor, (datetime.datetime.fromisoformat, int))
+                page_sql += " AND (created_at < %s OR (created_at = %s AND student_id < %s))"
+                page_params.extend([created_at, created_at, after_id])
+            page_sql += " ORDER BY created_at DESC, student_id DESC LIMIT %s"
+            page_params.append(size + 1)
+
+            rows = db.execute_query(page_sql, tuple(page_params))
+            students, pagination = page_result(rows, size, lambda row: (row['created_at'], row['student_id']))
+            if total is not None:
+                pagination['total'] = total
+            return jsonify({"success": True, "data": students, "pagination": pagination})
+
         base_sql += " ORDER BY created_at DESC"
 
         students = db.execute_query(base_sql, tuple(params))
 
         logger.info(f"教师获取学生列表成功，共 {len(students)} 名学生")
         return jsonify({"success": True, "data": students})
+    except CursorError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         logger.error(f"获取学生列表失败: {e}")
         return jsonify({"success": False, "message": "获取学生列表失败"}), 500
@@ -1062,6 +1088,159 @@ def change_student_password():
 # 存储ZIP中的代码内容，用于后续提交
 _zip_code_cache = {}
 
+def _get_test_cases(problem_id):
+    """获取编程题测试用例（从编程题缓存中读取，保存为文件的数据只返回哈希值）"""
+    cached = problem_cache.get(problem_id)
+    return cached['test_cases'] if cached else []
+
+def _all_tests_passed(execution_result):
+    """评测结果是否为全部通过：至少执行了一个测试用例且全部通过（没有执行任何用例时不能判为正确）"""
+    test_results = execution_result.get('test_results') or []
+    return (execution_result.get('status') == 'success'
+            and bool(test_results)
+            and all(test_result.get('passed') for test_result in test_results))
+
+def _judge_job_data(job):
+    """判题任务对外返回的数据"""
+    return {
+        "job_id": job['job_id'],
+        "status": job['status'],
+        "result": job['result'],
+        "error": job['error'],
+        # 测试用例并行执行，完成顺序与用例顺序不一定相同，因此每条结果都带上用例序号
+        "test_results": [
+            {"index": event['index'], "test_result": event['data']}
+            for event in job['events'] if event['event'] == 'test_result'
+        ],
+        "cursor": job['cursor']
+    }
+
+def _answer_job_data(job_id, student_id):
+    """
+    提交任务查询不到时（已过期，或数据库不可用且查询落到了其他进程），根据已保存的答题记录返回提交结果。
+    请求需带上 assignment_id 和 problem_id 参数，没有对应的答题记录时返回None
+    """
+    assignment_id = request.args.get('assignment_id', type=int)
+    problem_id = request.args.get('problem_id', type=int)
+    if not assignment_id or not problem_id:
+        return None
+    # 长轮询、SSE请求只偶尔查询，不占用请求作用域的连接
+    with db.detached(), db.primary():
+        rows = db.execute_query("""
+            SELECT sa.is_correct, sa.score, ha.course_id, ha.class_id
+            FROM student_answers sa
+            JOIN homework_assignments ha ON ha.id = sa.homework_id
+            WHERE sa.student_id = %s AND sa.homework_id = %s AND sa.question_id = %s
+        """, (student_id, assignment_id, problem_id))
+    if not rows:
+        return None
+    row = rows[0]
+    return {
+        "job_id": job_id,
+        "status": "finished",
+        "result": {
+            "course_id": row['course_id'],
+            "class_id": row['class_id'],
+            "is_correct": None if row['is_correct'] is None else bool(row['is_correct']),
+            "score": None if row['score'] is None else float(row['score'])
+        },
+        "error": "",
+        "test_results": [],
+        "cursor": 0
+    }
+
+@students_bp.route('/api/student/judge/jobs/<job_id>', methods=['GET'])
+def get_judge_job(job_id):
+    """
+    查询判题任务状态和结果（支持cursor+wait长轮询，逐条返回新完成的测试用例）。
+    提交答案的任务可以带上 assignment_id 和 problem_id，任务查询不到时按已保存的答题记录返回结果
+    """
+    try:
+        # 检查学生会话
+        if 'identity' not in session or session['identity'] != 'student':
+            return jsonify({
+                "success": False,
+                "message": "需要学生权限",
+                "redirect": "/login"
+            }), 401
+
+        cursor = request.args.get('cursor', 0, type=int)
+        wait = min(request.args.get('wait', 0, type=int), 30)  # 长轮询最多等待30秒
+
+        student_id = session.get('user_id')
+        job = judge_service.get_job(job_id)
+        if job and job['owner'] == student_id and (cursor or wait):
+            job = judge_service.get_job(job_id, cursor=cursor, wait=wait)
+
+        if not job:
+            recovered = _answer_job_data(job_id, student_id)
+            if recovered:
+                return jsonify({"success": True, "data": recovered})
+        if not job or job['owner'] != student_id:
+            return jsonify({"success": False, "message": "评测任务不存在或已过期"}), 404
+
+        return jsonify({"success": True, "data": _judge_job_data(job)})
+
+    except Exception as e:
+        logger.error(f"查询评测任务失败: {e}")
+        return jsonify({"success": False, "message": "查询评测任务失败"}), 500
+
+@students_bp.route('/api/student/judge/jobs/<job_id>/stream', methods=['GET'])
+def stream_judge_job(job_id):
+    """
+    以SSE方式推送判题进度：每完成一个测试用例推送一条test_result事件，结束时推送done事件。
+    与轮询接口一样可以带上 assignment_id 和 problem_id，任务查询不到时按已保存的答题记录推送done事件
+    """
+    # 检查学生会话
+    if 'identity' not in session or session['identity'] != 'student':
+        return jsonify({
+            "success": False,
+            "message": "需要学生权限",
+            "redirect": "/login"
+        }), 401
+
+    student_id = session.get('user_id')
+    job = judge_service.get_job(job_id)
+    recovered = _answer_job_data(job_id, student_id) if not job else None
+    if not recovered and (not job or job['owner'] != student_id):
+        return jsonify({"success": False, "message": "评测任务不存在或已过期"}), 404
+
+    def done_event(data):
+        payload = json.dumps({key: data[key] for key in ('job_id', 'status', 'result', 'error')}, ensure_ascii=False)
+        return f"event: done\ndata: {payload}\n\n"
+
+    def generate():
+        if recovered:
+            yield done_event(recovered)
+            return
+
+        cursor = 0
+        while True:
+            job = judge_service.get_job(job_id, cursor=cursor, wait=15)
+            if job is None:
+                # 任务在推送过程中过期
+                data = _answer_job_data(job_id, student_id)
+                yield done_event(data) if data else "event: done\ndata: {}\n\n"
+                return
+
+            for event in job['events']:
+                payload = json.dumps({"index": event['index'], "test_result": event['data']}, ensure_ascii=False)
+                yield f"event: {event['event']}\ndata: {payload}\n\n"
+            cursor = job['cursor']
+
+            if job['status'] in ('finished', 'failed'):
+                yield done_event(job)
+                return
+
+            if not job['events']:
+                # 保持连接，避免代理超时断开
+                yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @students_bp.route('/api/student/run_zip_code', methods=['POST'])
 def run_student_zip_code():
     """学生运行ZIP文件中的代码，进行测试"""
@@ -1097,46 +1276,40 @@ def run_student_zip_code():
         if not problem_id:
             return jsonify({"success": False, "message": "缺少题目ID参数"}), 400
 
-        # 验证题目存在且为编程题
-        problem_check_sql = """
-            SELECT pq.progressing_questions_id, pq.title
-            FROM progressing_questions pq
-            WHERE pq.progressing_questions_id = %s
-        """
-        problem_info = db.execute_query(problem_check_sql, (problem_id,))
-        if not problem_info:
+        # 验证题目存在且为编程题（题目信息和测试用例从缓存读取）
+        cached_problem = problem_cache.get(problem_id)
+        if not cached_problem:
             return jsonify({"success": False, "message": "题目不存在或不是编程题"}), 404
 
-        # 保存上传的zip文件到临时位置
+        test_cases = cached_problem['test_cases']
+
+        # 保存上传的zip文件到临时位置，由判题工作进程使用后删除
         with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as temp_file:
             file.save(temp_file.name)
             temp_zip_path = temp_file.name
 
-        try:
-            # 从ZIP文件中提取并执行代码
-            execution_result = _execute_zip_code(temp_zip_path, language, problem_id)
-
+        def on_complete(execution_result):
             # 将提取的代码存储在缓存中，供后续提交使用
             cache_key = f"{student_id}_{problem_id}"
             _zip_code_cache[cache_key] = {
                 'code': execution_result.get('extracted_code', ''),
                 'language': language,
-                'timestamp': db.execute_query("SELECT NOW()")[0]['NOW()']
+                'timestamp': datetime.datetime.now()
             }
-
             logger.info(f"学生 {student_id} ZIP代码运行完成 - 题目 {problem_id}")
-            return jsonify({
-                "success": True,
-                "message": "ZIP文件代码运行完成",
-                "data": execution_result
-            })
 
-        finally:
-            # 清理临时文件
-            try:
-                os.unlink(temp_zip_path)
-            except:
-                pass
+        job_id = judge_service.submit('zip', {
+            'zip_path': temp_zip_path,
+            'language': language,
+            'test_cases': test_cases,
+            'gpp_path': current_app.config.get('GPP_PATH', 'g++')
+        }, owner=student_id, on_complete=on_complete)
+
+        return jsonify({
+            "success": True,
+            "message": "ZIP文件已提交评测",
+            "data": {"job_id": job_id}
+        })
 
     except Exception as e:
         logger.error(f"学生ZIP代码运行失败: {e}")
@@ -1158,17 +1331,19 @@ def submit_student_code_zip():
         if not student_id:
             return jsonify({"success": False, "message": "无法获取学生信息"}), 401
 
-        # 获取参数
-        problem_id = request.form.get('problem_id')
-        assignment_id = request.form.get('assignment_id')
+        # 获取参数（前端以JSON提交，兼容表单提交）
+        data = request.get_json(silent=True) or request.form
+        problem_id = data.get('problem_id')
+        assignment_id = data.get('assignment_id')
 
         if not all([problem_id, assignment_id]):
             return jsonify({"success": False, "message": "缺少必要参数"}), 400
 
         # 验证题目和作业关系
         homework_question_sql = """
-            SELECT hq.question_id, hq.question_type
+            SELECT hq.question_id, hq.question_type, hq.score, ha.course_id, ha.class_id
             FROM homework_questions hq
+            JOIN homework_assignments ha ON hq.homework_id = ha.id
             WHERE hq.question_id = %s AND hq.homework_id = %s
         """
         homework_question = db.execute_query(homework_question_sql, (problem_id, assignment_id))
@@ -1187,30 +1362,20 @@ def submit_student_code_zip():
             return jsonify({"success": False, "message": "未找到已运行的ZIP代码，请先运行代码"}), 400
 
         # 检查缓存是否过期（5分钟）
-        import datetime
         if (datetime.datetime.now() - cached_code['timestamp']).seconds > 300:
             # 清理过期缓存
             del _zip_code_cache[cache_key]
             return jsonify({"success": False, "message": "代码已过期，请重新运行ZIP文件"}), 400
 
-        # 获取题目分数并评估代码
-        score_sql = "SELECT score FROM homework_questions WHERE question_id = %s AND homework_id = %s"
-        score_result = db.execute_query(score_sql, (problem_id, assignment_id))
-        score = score_result[0]['score'] if score_result else 0
-
-        # 评估编程题答案
-        is_correct = _evaluate_programming_answer(cached_code['code'], problem_id)
+        # 题目信息和测试用例从缓存读取，题目不存在（或已删除）时不评测
+        cached_problem = problem_cache.get(problem_id)
+        if not cached_problem:
+            return jsonify({"success": False, "message": "题目不存在或不是编程题"}), 404
 
-        # 准备答案数据
-        answer_data = {
-            'student_id': student_id,
-            'homework_id': assignment_id,
-            'question_id': problem_id,
-            'question_type': 'progressing',
-            'status': 'submitted',
-            'is_correct': is_correct,
-            'score': score if is_correct else 0
-        }
+        test_cases = cached_problem['test_cases']
+        score = homework_question[0]['score'] or 0
+        course_id = homework_question[0]['course_id']
+        class_id = homework_question[0]['class_id']
 
         # 检查是否已提交过答案
         existing_answer_sql = """
@@ -1222,41 +1387,72 @@ def submit_student_code_zip():
         if existing:
             return jsonify({"success": False, "message": "该题目已提交过答案，无法重复提交"}), 400
 
-        # 插入答题记录
-        insert_sql = """
-            INSERT INTO student_answers
-            (student_id, homework_id, question_id, question_type, answer_text, status, is_correct, score, last_attempt_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
-        """
-
-        params = (
-            answer_data['student_id'], answer_data['homework_id'], answer_data['question_id'],
-            answer_data['question_type'], cached_code['code'], answer_data['status'],
-            answer_data['is_correct'], answer_data['score']
-        )
+        def save_answer(is_correct, answer_score):
+            """保存答题记录；is_correct和answer_score为None表示待教师批改"""
+            insert_sql = """
+                INSERT INTO student_answers
+                (student_id, homework_id, question_id, question_type, answer_text, status, is_correct, score, last_attempt_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
+            """
+            params = (
+                student_id, assignment_id, problem_id,
+                'progressing', cached_code['code'], 'submitted',
+                is_correct, answer_score
+            )
+            with db.transaction():
+                # 排队期间可能已有其他提交写入
+                if db.execute_query(existing_answer_sql, (student_id, assignment_id, problem_id)):
+                    raise RuntimeError("该题目已提交过答案，无法重复提交")
 
-        affected = db.execute_update(insert_sql, params)
+                affected = db.execute_update(insert_sql, params)
+                if affected <= 0:
+                    raise RuntimeError("答案保存失败")
 
-        if affected > 0:
-            # 记录编程题提交历史
-            if answer_data['question_type'] == 'progressing':
+                # 记录编程题提交历史
                 _record_programming_submission(student_id, assignment_id, problem_id, cached_code['code'])
+                refresh_submission_summary(student_id, assignment_id)
 
             # 清理缓存
-            del _zip_code_cache[cache_key]
+            _zip_code_cache.pop(cache_key, None)
+            return {
+                "course_id": course_id,
+                "class_id": class_id,
+                "is_correct": is_correct,
+                "score": answer_score
+            }
 
-            logger.info(f"学生 {student_id} ZIP代码提交题目 {problem_id} 成功 - 评判结果: {'正确' if is_correct else '错误'}")
+        if not test_cases:
+            # 没有测试用例无法自动评测，保存为待教师批改，不给分
+            data = save_answer(None, None)
+            logger.warning(f"编程题 {problem_id} 没有测试用例，学生 {student_id} 的ZIP代码提交保存为待批改")
             return jsonify({
                 "success": True,
-                "message": "ZIP代码提交成功！",
-                "data": {
-                    "course_id": homework_question[0]['course_id'],
-                    "class_id": homework_question[0]['class_id'],
-                    "is_correct": is_correct,
-                    "score": answer_data['score']
-                }
+                "message": "该题目暂无测试用例，答案已保存，等待教师批改",
+                "data": data
             })
 
+        def on_complete(execution_result):
+            # 评测完成后保存答题记录，至少执行一个测试用例且全部通过才判为正确
+            is_correct = _all_tests_passed(execution_result)
+            answer_score = score if is_correct else 0
+            data = save_answer(is_correct, answer_score)
+            logger.info(f"学生 {student_id} ZIP代码提交题目 {problem_id} 成功 - 评判结果: {'正确' if is_correct else '错误'}")
+            return data
+
+        job_id = judge_service.submit('code', {
+            'code': cached_code['code'],
+            'language': cached_code['language'],
+            'test_cases': test_cases,
+            'gpp_path': current_app.config.get('GPP_PATH', 'g++'),
+            'stop_on_failure': current_app.config.get('JUDGE_STOP_ON_FIRST_FAILURE', False)
+        }, owner=student_id, on_complete=on_complete)
+
+        return jsonify({
+            "success": True,
+            "message": "ZIP代码已提交评测",
+            "data": {"job_id": job_id}
+        })
+
     except Exception as e:
         logger.error(f"学生ZIP代码提交失败: {e}")
         return jsonify({"success": False, "message": f"提交失败：{str(e)}"}), 500
@@ -1328,8 +1524,7 @@ def submit_student_answer():
             'homework_id': assignment_id,
             'question_id': problem_id,
             'question_type': question_type,
-            'status': 'submitted',
-            'last_attempt_at': db.execute_query("SELECT NOW()")[0]['NOW()']
+            'status': 'submitted'
         }
 
         # 根据题目类型处理答案
@@ -1359,23 +1554,27 @@ def submit_student_answer():
             INSERT INTO student_answers
             (student_id, homework_id, question_id, question_type, answer_text, choice_answer, judgment_answer,
              is_correct, score, status, last_attempt_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
         """
 
         params = (
             answer_data['student_id'], answer_data['homework_id'], answer_data['question_id'],
             answer_data['question_type'], answer_data.get('answer_text'), answer_data.get('choice_answer'),
             answer_data.get('judgment_answer'), answer_data['is_correct'], answer_data['score'],
-            answer_data['status'], answer_data['last_attempt_at']
+            answer_data['status']
         )
 
-        affected = db.execute_update(insert_sql, params)
+        # 答案记录和编程题提交历史在同一个事务中写入
+        with db.transaction():
+            affected = db.execute_update(insert_sql, params)
 
-        if affected > 0:
-            # 记录编程题提交历史（如果需要）
-            if question_type == 'progressing':
+            if affected > 0 and question_type == 'progressing':
+                # 记录编程题提交历史（如果需要）
                 _record_programming_submission(student_id, assignment_id, problem_id, answer)
+            if affected > 0:
+                refresh_submission_summary(student_id, assignment_id)
 
+        if affected > 0:
             logger.info(f"学生 {student_id} 提交题目 {problem_id} 答案成功")
 
             return jsonify({
@@ -1471,437 +1670,37 @@ def run_student_code():
         if not problem_id:
             return jsonify({"success": False, "message": "缺少题目ID参数"}), 400
 
-        # 验证题目存在且为编程题
-        problem_check_sql = """
-            SELECT pq.progressing_questions_id, pq.title
-            FROM progressing_questions pq
-            WHERE pq.progressing_questions_id = %s
-        """
-        problem_info = db.execute_query(problem_check_sql, (problem_id,))
-        if not problem_info:
+        # 验证题目存在且为编程题（题目信息和测试用例从缓存读取）
+        cached_problem = problem_cache.get(problem_id)
+        if not cached_problem:
             return jsonify({"success": False, "message": "题目不存在或不是编程题"}), 404
 
         # 获取测试用例
-        test_cases_sql = """
-            SELECT input, output, is_example
-            FROM progressing_questions_test_cases
-            WHERE progressing_questions_id = %s
-            ORDER BY id
-        """
-        test_cases = db.execute_query(test_cases_sql, (problem_id,))
+        test_cases = cached_problem['test_cases']
 
-        # 执行代码
-        execution_result = _execute_code(code, language, test_cases)
+        def on_complete(execution_result):
+            # 记录运行历史
+            _record_code_run(student_id, problem_id, code, language, execution_result)
+            logger.info(f"学生 {student_id} 运行题目 {problem_id} 代码成功")
 
-        # 记录运行历史
-        _record_code_run(student_id, problem_id, code, language, execution_result)
+        # 放入判题队列，由判题工作进程执行
+        job_id = judge_service.submit('code', {
+            'code': code,
+            'language': language,
+            'test_cases': test_cases,
+            'gpp_path': current_app.config.get('GPP_PATH', 'g++')
+        }, owner=student_id, on_complete=on_complete)
 
-        logger.info(f"学生 {student_id} 运行题目 {problem_id} 代码成功")
         return jsonify({
             "success": True,
-            "message": "代码运行完成",
-            "data": execution_result
+            "message": "代码已提交评测",
+            "data": {"job_id": job_id}
         })
 
     except Exception as e:
         logger.error(f"学生运行代码失败: {e}")
         return jsonify({"success": False, "message": "运行失败，请重试"}), 500
 
-def _execute_code(code, language, test_cases):
-    """执行代码并返回结果"""
-    import subprocess
-    import tempfile
-    import os
-    import time
-
-    start_time = time.time()
-    result = {
-        "status": "success",
-        "execution_time": 0,
-        "output": "",
-        "error": "",
-        "test_results": []
-    }
-
-    try:
-        if language == 'python':
-            # Python代码执行
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-
-            try:
-                # 如果有测试用例，使用测试用例执行
-                if test_cases:
-                    all_passed = True
-                    for i, test_case in enumerate(test_cases):
-                        test_result = {
-                            "input": test_case['input'],
-                            "expected_output": test_case['output'],
-                            "actual_output": "",
-                            "passed": False,
-                            "error": ""
-                        }
-
-                        try:
-                            # 创建临时输入文件
-                            with tempfile.NamedTemporaryFile(mode='w', delete=False) as input_file:
-                                input_file.write(test_case['input'] or "")
-                                input_file_path = input_file.name
-
-                            # 执行Python代码
-                            process = subprocess.run(
-                                ['python', temp_file],
-                                input=test_case['input'] or "",
-                                text=True,
-                                capture_output=True,
-                                timeout=10  # 10秒超时
-                            )
-
-                            test_result["actual_output"] = process.stdout.strip()
-                            test_result["error"] = process.stderr.strip()
-
-                            # 比较输出
-                            expected = test_case['output'].strip() if test_case['output'] else ""
-                            actual = process.stdout.strip()
-
-                            if process.returncode == 0 and actual == expected:
-                                test_result["passed"] = True
-                            else:
-                                all_passed = False
-
-                        except subprocess.TimeoutExpired:
-                            test_result["error"] = "执行超时"
-                            all_passed = False
-                        except Exception as e:
-                            test_result["error"] = str(e)
-                            all_passed = False
-                        finally:
-                            # 清理临时输入文件
-                            if 'input_file_path' in locals():
-                                try:
-                                    os.unlink(input_file_path)
-                                except:
-                                    pass
-
-                        result["test_results"].append(test_result)
-
-                    result["status"] = "success" if all_passed else "partial"
-                else:
-                    # 没有测试用例，直接执行
-                    process = subprocess.run(
-                        ['python', temp_file],
-                        text=True,
-                        capture_output=True,
-                        timeout=10
-                    )
-
-                    if process.returncode == 0:
-                        result["output"] = process.stdout
-                    else:
-                        result["error"] = process.stderr or "执行失败"
-
-            finally:
-                # 清理临时文件
-                try:
-                    os.unlink(temp_file)
-                except:
-                    pass
-
-        elif language == 'cpp':
-            # C++代码执行
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.cpp', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-
-            executable_file = temp_file.replace('.cpp', '')
-
-            try:
-                # 编译C++代码 - 使用配置中的GPP路径
-                from flask import current_app
-                gpp_path = current_app.config.get('GPP_PATH', 'g++')
-
-                compile_process = subprocess.run(
-                    [gpp_path, temp_file, '-o', executable_file],
-                    text=True,
-                    capture_output=True,
-                    timeout=10
-                )
-
-                if compile_process.returncode != 0:
-                    result["status"] = "error"
-                    # 处理不同的编译错误类型
-                    stderr = compile_process.stderr.strip()
-                    if not stderr:
-                        stderr = "编译失败，可能是语法错误或头文件缺失"
-
-                    result["error"] = stderr
-
-                    # 添加编译错误特殊处理
-                    if "g++: command not found" in stderr or "系统找不到指定的文件" in stderr:
-                        result["error"] = f"编译器未找到: {stderr}\n\n💡 解决方案:\n1. 设置环境变量GPP_PATH指向g++.exe的完整路径\n2. 或者安装GCC编译器到标准位置\n3. 或者使用Python语言代替C++"
-                    elif "undefined reference" in stderr:
-                        result["error"] = f"链接错误: {stderr}\n\n💡 调试建议:\n• 检查是否包含了所有必要的头文件\n• 确认函数名称和参数是否正确"
-                    elif "expected" in stderr or "syntax error" in stderr.lower():
-                        result["error"] = f"语法错误: {stderr}\n\n💡 调试建议:\n• 检查语法格式是否正确\n• 确认分号、括号是否匹配\n• 查看变量声明是否完整"
-                    elif "cannot open include file" in stderr.lower():
-                        result["error"] = f"头文件错误: {stderr}\n\n💡 调试建议:\n• 检查include语句的拼写\n• 确认系统已安装标准库"
-                    else:
-                        result["error"] = f"编译错误: {stderr}"
-                else:
-                    # 如果有测试用例，使用测试用例执行
-                    if test_cases:
-                        all_passed = True
-                        for i, test_case in enumerate(test_cases):
-                            test_result = {
-                                "input": test_case['input'],
-                                "expected_output": test_case['output'],
-                                "actual_output": "",
-                                "passed": False,
-                                "error": ""
-                            }
-
-                            try:
-                                # 执行编译后的程序
-                                process = subprocess.run(
-                                    [executable_file],
-                                    input=test_case['input'] or "",
-                                    text=True,
-                                    capture_output=True,
-                                    timeout=10
-                                )
-
-                                test_result["actual_output"] = process.stdout.strip()
-                                test_result["error"] = process.stderr.strip()
-
-                                # 比较输出
-                                expected = test_case['output'].strip() if test_case['output'] else ""
-                                actual = process.stdout.strip()
-
-                                if process.returncode == 0 and actual == expected:
-                                    test_result["passed"] = True
-                                else:
-                                    all_passed = False
-
-                            except subprocess.TimeoutExpired:
-                                test_result["error"] = "执行超时"
-                                all_passed = False
-                            except Exception as e:
-                                test_result["error"] = str(e)
-                                all_passed = False
-
-                            result["test_results"].append(test_result)
-
-                        result["status"] = "success" if all_passed else "partial"
-                    else:
-                        # 没有测试用例，直接执行
-                        process = subprocess.run(
-                            [executable_file],
-                            text=True,
-                            capture_output=True,
-                            timeout=10
-                        )
-
-                        if process.returncode == 0:
-                            result["output"] = process.stdout
-                        else:
-                            result["error"] = process.stderr or "执行失败"
-
-            finally:
-                # 清理临时文件
-                try:
-                    os.unlink(temp_file)
-                    if os.path.exists(executable_file):
-                        os.unlink(executable_file)
-                except:
-                    pass
-
-        elif language == 'java':
-            # Java代码执行
-            # 提取类名（从类定义中提取）
-            class_name = None
-            class_pattern = r'public\s+class\s+(\w+)'
-            match = re.search(class_pattern, code)
-            if match:
-                class_name = match.group(1)
-            else:
-                result["status"] = "error"
-                result["error"] = "无法识别Java类名，请确保代码包含 public class ClassName"
-                # 为编译错误创建空的测试结果
-                if test_cases:
-                    result["test_results"] = []
-                    for test_case in test_cases:
-                        result["test_results"].append({
-                            "input": test_case['input'],
-                            "expected_output": test_case['output'],
-                            "actual_output": "",
-                            "passed": False,
-                            "error": result["error"]
-                        })
-                return result
-
-            # 创建以类名为基础的临时文件
-            temp_dir = tempfile.gettempdir()
-            temp_file = os.path.join(temp_dir, f"{class_name}.java")
-
-            # 移除BOM字符以避免编译错误
-            if code.startswith('\ufeff'):
-                code = code[1:]
-                logger.info(f"检测并移除了Java代码的BOM字符")
-
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                f.write(code)
-
-            # 编译Java文件
-            class_file = temp_file.replace('.java', '.class')
-
-            # 编译Java代码
-            compile_process = subprocess.run(
-                ['javac', temp_file],
-                text=True,
-                capture_output=True,
-                timeout=10
-            )
-
-            if compile_process.returncode != 0:
-                result["status"] = "error"
-                # 优化编译错误信息
-                stderr = compile_process.stderr.strip()
-                if not stderr:
-                    stderr = "编译失败，可能是语法错误或头文件缺失"
-
-                # 处理不同的编译错误类型
-                if "g++: command not found" in stderr or "系统找不到指定的文件" in stderr:
-                    result["error"] = f"编译器未找到\n解决方法:\n1. 检查JAVA_HOME环境变量设置\n2. 确认javac命令是否在PATH路径中\n3. 或者使用其他编程语言测试"
-                elif "expected" in stderr or "syntax error" in stderr.lower() or ";" in stderr.lower():
-                    result["error"] = f"语法错误\n调试建议:\n• 检查分号是否完整\n• 确认括号是否匹配\n• 验证变量名称是否正确\n\n错误详情:\n{stderr}"
-                elif "cannot find symbol" in stderr.lower():
-                    result["error"] = f"符号未找到\n调试建议:\n• 检查变量是否已声明\n• 确认方法名是否正确\n• 验证导入的包是否存在\n\n错误详情:\n{stderr}"
-                elif "class" in stderr.lower() and "is public" in stderr.lower():
-                    result["error"] = f"类名错误\n调试建议:\n• 确保类的声明为public class ClassName格式\n• 检查类名是否与文件名匹配\n\n错误详情:\n{stderr}"
-                else:
-                    result["error"] = f"编译错误\n{stderr}"
-
-                # 为编译错误创建测试结果，显示哪些测试用例无法执行
-                if test_cases:
-                    result["test_results"] = []
-                    for i, test_case in enumerate(test_cases):
-                        result["test_results"].append({
-                            "input": test_case['input'],
-                            "expected_output": test_case['output'],
-                            "actual_output": "",
-                            "passed": False,
-                            "error": "编译失败，无法执行测试用例"
-                        })
-                return result
-
-            # 如果有测试用例，使用测试用例执行
-            if test_cases:
-                all_passed = True
-                failed_tests_count = 0
-                for i, test_case in enumerate(test_cases):
-                    test_result = {
-                        "input": test_case['input'],
-                        "expected_output": test_case['output'],
-                        "actual_output": "",
-                        "passed": False,
-                        "error": "",
-                        "test_case_index": i + 1
-                    }
-
-                    try:
-                        # 执行Java程序
-                        process = subprocess.run(
-                            ['java', '-cp', os.path.dirname(temp_file), class_name],
-                            input=test_case['input'] or "",
-                            text=True,
-                            capture_output=True,
-                            timeout=10
-                        )
-
-                        test_result["actual_output"] = process.stdout.strip()
-                        stderr_output = process.stderr.strip()
-
-                        # 比较输出
-                        expected = test_case['output'].strip() if test_case['output'] else ""
-                        actual = process.stdout.strip()
-
-                        if process.returncode == 0 and actual == expected:
-                            test_result["passed"] = True
-                        else:
-                            all_passed = False
-                            failed_tests_count += 1
-
-                            # 增强错误信息
-                            if process.returncode != 0:
-                                if stderr_output:
-                                    test_result["error"] = f"运行时错误: {stderr_output}"
-                                else:
-                                    test_result["error"] = "程序执行失败，返回码非零"
-                            elif actual != expected:
-                                test_result["error"] = "输出结果不匹配"
-                                # 显示具体的差异
-                                if len(actual) > 100 or len(expected) > 100:
-                                    test_result["error"] += f"\n实际输出长度: {len(actual)} 字符\n期望输出长度: {len(expected)} 字符"
-                                else:
-                                    # 突出显示差异的建议
-                                    test_result["error"] += "\n可能原因: 多余/缺少的空格、空行或换行符"
-
-                    except subprocess.TimeoutExpired:
-                        test_result["error"] = "执行超时 (可能存在死循环或性能问题)"
-                        test_result["actual_output"] = "执行超时"
-                        all_passed = False
-                        failed_tests_count += 1
-                    except Exception as e:
-                        test_result["error"] = f"执行异常: {str(e)}"
-                        all_passed = False
-                        failed_tests_count += 1
-
-                    result["test_results"].append(test_result)
-
-                result["status"] = "success" if all_passed else ("error" if failed_tests_count == len(test_cases) else "partial")
-
-                # 添加失败测试用例的汇总信息
-                if not all_passed:
-                    result["error"] = f"部分测试用例失败 ({failed_tests_count}/{len(test_cases)} 个失败)\n请查看下方详细的测试用例结果"
-            else:
-                # 没有测试用例，直接执行
-                process = subprocess.run(
-                    ['java', '-cp', os.path.dirname(temp_file), class_name],
-                    text=True,
-                    capture_output=True,
-                    timeout=10
-                )
-
-                if process.returncode == 0:
-                    result["output"] = process.stdout
-                else:
-                    result["error"] = process.stderr or "执行失败"
-                    result["status"] = "error"
-
-            # 清理临时文件
-            try:
-                os.unlink(temp_file)
-                if os.path.exists(class_file):
-                    os.unlink(class_file)
-            except:
-                pass
-        else:
-            result["status"] = "error"
-            result["error"] = f"不支持的编程语言: {language}"
-
-    except subprocess.TimeoutExpired:
-        result["status"] = "error"
-        result["error"] = "代码执行超时"
-    except Exception as e:
-        result["status"] = "error"
-        result["error"] = f"执行错误: {str(e)}"
-
-    # 计算执行时间
-    result["execution_time"] = int((time.time() - start_time) * 1000)  # 毫秒
-
-    return result
-
 def _record_code_run(student_id, problem_id, code, language, result):
     """记录代码运行历史"""
     try:
@@ -1924,190 +1723,15 @@ def _record_code_run(student_id, problem_id, code, language, result):
         logger.error(f"记录代码运行历史失败: {e}")
         # 不影响主流程
 
-def _extract_zip_file(zip_file_path, extract_to):
-    """解压zip文件到指定目录"""
-    try:
-        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
-        return True, "解压成功"
-    except zipfile.BadZipFile:
-        return False, "无效的zip文件格式"
-    except Exception as e:
-        return False, f"解压失败: {str(e)}"
-
-def _find_code_files(extract_path, language):
-    """在解压目录中查找代码文件"""
-    code_files = []
-
-    # 定义不同语言的文件扩展名映射
-    language_extensions = {
-        'python': ['.py', '.PY'],
-        'cpp': ['.cpp', '.cc', '.cxx', '.c++', '.CPP', '.CC'],
-        'java': ['.java', '.JAVA']
-    }
-
-    try:
-        # 遍历所有文件
-        for root, dirs, files in os.walk(extract_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                _, ext = os.path.splitext(file)
-
-                # 检查文件扩展名是否匹配
-                if ext in language_extensions.get(language, []):
-                    # 获取文件的相对路径（相对于解压根目录）
-                    relative_path = os.path.relpath(file_path, extract_path)
-                    code_files.append({
-                        'path': file_path,
-                        'relative_path': relative_path,
-                        'filename': file,
-                        'extension': ext
-                    })
-
-        return code_files
-    except Exception as e:
-        logger.error(f"查找代码文件失败: {e}")
-        return []
-
-def _validate_code_files(code_files, language):
-    """验证找到的代码文件"""
-    if not code_files:
-        return False, "未找到任何代码文件"
-
-    if language == 'java':
-        # Java必须有且只有一个类文件作为主入口
-        main_classes = []
-        for file_info in code_files:
-            try:
-                with open(file_info['path'], 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # 查找public class声明
-                    import re
-                    match = re.search(r'public\s+class\s+(\w+)', content)
-                    if match:
-                        class_name = match.group(1)
-                        # 验证类名是否与文件名匹配
-                        expected_filename = f"{class_name}.java"
-                        if file_info['filename'] != expected_filename:
-                            return False, f"Java类名 {class_name} 与文件名 {file_info['filename']} 不匹配"
-                        main_classes.append(file_info)
-            except Exception as e:
-                return False, f"读取文件 {file_info['filename']} 失败: {str(e)}"
-
-        if len(main_classes) != 1:
-            return False, f"Java项目应有且只有一个public主类，找到 {len(main_classes)} 个"
-
-    return True, "代码文件验证通过"
-
-def _load_code_from_files(code_files, language):
-    """从代码文件中读取代码内容"""
-    try:
-        if language == 'java':
-            # Java只读取主类文件
-            for file_info in code_files:
-                with open(file_info['path'], 'r', encoding='utf-8') as f:
-                    content = f.read()
-                # 查找是否包含main方法，一定要是主类才读取
-                if 'public static void main' in content or 'void main(' in content:
-                    return content
-            return ""
-
-        elif language in ['python', 'cpp']:
-            # Python和C++可以有多个文件，这里读取第一个文件
-            # 实际项目中可能需要更复杂的处理，如处理多个文件
-            if code_files:
-                with open(code_files[0]['path'], 'r', encoding='utf-8') as f:
-                    return f.read()
-
-        return ""
-    except Exception as e:
-        logger.error(f"读取代码文件失败: {e}")
-        return ""
-
 def _execute_zip_code(zip_file_path, language, problem_id):
-    """从ZIP文件中提取代码并执行，返回执行结果"""
-
-    # 结果模板
-    result = {
-        "status": "error",
-        "execution_time": 0,
-        "output": "",
-        "error": "",
-        "test_results": [],
-        "extracted_code": "",
-        "files_found": [],
-        "validation_message": ""
-    }
-
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            # 1. 解压zip文件
-            extract_path = os.path.join(temp_dir, 'extracted')
-            os.makedirs(extract_path)
-            success, message = _extract_zip_file(zip_file_path, extract_path)
-
-            if not success:
-                result["error"] = message
-                return result
-
-            # 2. 查找代码文件
-            code_files = _find_code_files(extract_path, language)
-            result["files_found"] = [
-                {
-                    "filename": f["filename"],
-                    "path": f["relative_path"],
-                    "extension": f["extension"]
-                }
-                for f in code_files
-            ]
-
-            # 3. 验证代码文件
-            valid, message = _validate_code_files(code_files, language)
-            result["validation_message"] = message
-
-            if not valid:
-                result["error"] = message
-                result["status"] = "error"
-                return result
-
-            # 4. 读取代码内容
-            code_content = _load_code_from_files(code_files, language)
-            if not code_content:
-                result["error"] = "无法读取代码内容"
-                return result
-
-            result["extracted_code"] = code_content
-
-            # 5. 获取测试用例并执行代码
-            test_cases_sql = """
-                SELECT input, output, is_example
-                FROM progressing_questions_test_cases
-                WHERE progressing_questions_id = %s
-                ORDER BY id
-            """
-            test_cases = db.execute_query(test_cases_sql, (problem_id,))
-
-            # 6. 使用现有的代码执行引擎运行代码
-            execution_result = _execute_code(code_content, language, test_cases)
-
-            # 7. 合并结果
-            result.update({
-                "status": execution_result["status"],
-                "execution_time": execution_result["execution_time"],
-                "output": execution_result.get("output", ""),
-                "error": execution_result.get("error", ""),
-                "test_results": execution_result.get("test_results", [])
-            })
-
-            return result
-
-        except Exception as e:
-            logger.error(f"执行ZIP代码失败: {e}")
-            result["error"] = f"执行失败: {str(e)}"
-            return result
+    """在当前进程中同步从ZIP文件中提取代码并执行，返回执行结果"""
+    gpp_path = current_app.config.get('GPP_PATH', 'g++')
+    return code_runner.execute_zip_code(zip_file_path, language, _get_test_cases(problem_id), gpp_path)
 
 def _evaluate_zip_submission(zip_file, language, problem_id):
     """评估zip文件提交的编程题答案（用于兼容性）"""
+    if not _get_test_cases(problem_id):
+        # 题目不存在或没有测试用例，无法自动评测
+        return False, "题目不存在或没有测试用例，无法自动评测"
     execution_result = _execute_zip_code(zip_file, language, problem_id)
-    is_correct = execution_result["status"] in ["success", "partial"]
-    return is_correct, "代码评测完成"
+    return _all_tests_passed(execution_result), "代码评测完成"
@@ -1,13 +1,28 @@
 from flask import Blueprint, jsonify, request, session
 from database import db
+from services.question_catalog import question_types_by_id
+from services.question_tags import tag_filter_condition
+from services.submission_summary import refresh_submission_summary
+from utils.pagination import CursorError, cursor_requested, decode_cursor, include_total, page_result, page_size
 import logging
 import hashlib
 import json
+import datetime
+import pymysql
 from decimal import Decimal
 
 logger = logging.getLogger(__name__)
 teachers_bp = Blueprint('teachers', __name__)
 
+# 由请求数据不合法引起的MySQL错误码：日期等值格式错误、字段超长、必填字段为空、引用的记录不存在
+INVALID_DATA_ERROR_CODES = (1292, 1366, 1406, 1048, 1452)
+
+def is_invalid_data_error(exc):
+    """数据库错误是否由请求数据不合法引起（应返回400而不是500）"""
+    if isinstance(exc, (pymysql.err.DataError, pymysql.err.IntegrityError)):
+        return True
+    return bool(exc.args) and exc.args[0] in INVALID_DATA_ERROR_CODES
+
 # 辅助函数：加密密码
 def encrypt_password(password):
     return hashlib.md5(password.encode()).hexdigest()
@@ -30,6 +45,34 @@ def convert_decimal(obj):
 def get_teachers():
     """获取所有教师列表"""
     try:
+        # 带 cursor 参数时按 (username, teacher_id) 游标分页，先取出一页教师再汇总其课程
+        if cursor_requested(request.args):
+            size = page_size(request.args)
+            cursor = request.args.get('cursor', '').strip()
+            page_sql = "SELECT teacher_id, username, email, telenum, status FROM teachers"
+            page_params = []
+            if cursor:
+                after_username, after_id = decode_cursor(cursor, (str, int))
+                page_sql += " WHERE (username > %s OR (username = %s AND teacher_id > %s))"
+                page_params.extend([after_username, after_username, after_id])
+            page_sql += " ORDER BY username, teacher_id LIMIT %s"
+            page_params.append(size + 1)
+
+            sql = f"""
+                SELECT t.teacher_id as id, t.username, t.email, t.telenum, t.status,
+                       GROUP_CONCAT(DISTINCT c.course_name ORDER BY c.course_name SEPARATOR ', ') as course_assignment
+                FROM ({page_sql}) t
+                LEFT JOIN teacher_courses tc ON t.teacher_id = tc.teacher_id
+                LEFT JOIN courses c ON tc.course_id = c.course_id
+                GROUP BY t.teacher_id, t.username, t.email, t.telenum, t.status
+                ORDER BY t.username, t.teacher_id
+            """
+            rows = db.execute_query(sql, tuple(page_params))
+            teachers, pagination = page_result(rows, size, lambda row: (row['username'], row['id']))
+            if include_total(request.args):
+                pagination['total'] = db.execute_query("SELECT COUNT(*) as total FROM teachers")[0]['total']
+            return jsonify({"success": True, "data": teachers, "pagination": pagination})
+
         sql = """
             SELECT t.teacher_id as id, t.username, t.email, t.telenum, t.status,
                    GROUP_CONCAT(DISTINCT c.course_name ORDER BY c.course_name SEPARATOR ', ') as course_assignment
@@ -41,6 +84,8 @@ def get_teachers():
         """
         teachers = db.execute_query(sql)
         return jsonify({"success": True, "data": teachers})
+    except CursorError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         logger.error(f"获取教师列表失败: {e}")
         return jsonify({"success": False, "message": "获取教师列表失败"}), 500
@@ -1239,67 +1284,51 @@ def get_pending_submissions():
 
         teacher_id = session['user_id']
 
-        # 获取所有有提交记录的学生作业组合（按作业聚合）
+        # 从作业提交汇总表读取该教师的学生作业组合（汇总行在提交、评分时维护），
+        # 作业题目总数只统计该教师的作业
         aggregated_sql = """
             SELECT
-                sa.student_id,
-                sa.homework_id,
+                ss.student_id,
+                ss.homework_id,
                 s.username as student_name,
                 s.email as student_email,
                 ha.title as assignment_name,
                 c.class_name,
-                MAX(sa.last_attempt_at) as last_submit_time,
-                COUNT(CASE WHEN sa.status IN ('submitted', 'graded') THEN 1 END) as submitted_questions,
-                COUNT(CASE WHEN (sa.status = 'graded') OR (sa.status = 'submitted' AND sa.is_correct = 1) THEN 1 END) as completed_questions
-            FROM student_answers sa
-            JOIN students s ON sa.student_id = s.student_id
-            JOIN homework_assignments ha ON sa.homework_id = ha.id
+                ss.last_submit_time,
+                ss.submitted_questions,
+                ss.completed_questions,
+                ss.pending_questions,
+                COALESCE(hq.total_questions, 0) as total_questions
+            FROM homework_submission_summary ss
+            JOIN students s ON ss.student_id = s.student_id
+            JOIN homework_assignments ha ON ss.homework_id = ha.id
             JOIN classes c ON ha.class_id = c.class_id
-            WHERE ha.teacher_id = %s
-            AND sa.status IN ('submitted', 'graded')
-            GROUP BY sa.student_id, sa.homework_id, s.username, s.email, ha.title, c.class_name
-            HAVING submitted_questions > 0
-            ORDER BY last_submit_time DESC
+            LEFT JOIN (
+                SELECT hq.homework_id, COUNT(*) as total_questions
+                FROM homework_questions hq
+                JOIN homework_assignments tha ON hq.homework_id = tha.id
+                WHERE tha.teacher_id = %s
+                GROUP BY hq.homework_id
+            ) hq ON hq.homework_id = ss.homework_id
+            WHERE ss.teacher_id = %s
+            AND ss.submitted_questions > 0
+            ORDER BY ss.last_submit_time DESC
         """
 
-        aggregated_submissions = db.execute_query(aggregated_sql, (teacher_id,))
-
-        # 获取每个作业的题目总数
-        homework_questions_sql = """
-            SELECT homework_id, COUNT(*) as total_questions
-            FROM homework_questions
-            GROUP BY homework_id
-        """
-        homework_questions = db.execute_query(homework_questions_sql)
-        homework_total_map = {hw['homework_id']: hw['total_questions'] for hw in homework_questions}
-
-        # 获取待批改题目数量（状态为submitted且未评分）
-        pending_questions_sql = """
-            SELECT student_id, homework_id, COUNT(*) as pending_questions
-            FROM student_answers
-            WHERE status = 'submitted' AND (score IS NULL OR score = 0)
-            GROUP BY student_id, homework_id
-        """
-        pending_questions = db.execute_query(pending_questions_sql)
-        pending_map = {}
-        for pq in pending_questions:
-            key = f"{pq['student_id']}_{pq['homework_id']}"
-            pending_map[key] = pq['pending_questions']
+        aggregated_submissions = db.execute_query(aggregated_sql, (teacher_id, teacher_id))
 
         # 格式化数据
         formatted_submissions = []
         for submission in aggregated_submissions:
-            student_homework_key = f"{submission['student_id']}_{submission['homework_id']}"
-
             # 获取该作业的总题目数
-            total_questions = homework_total_map.get(submission['homework_id'], 0)
+            total_questions = submission['total_questions']
 
             # 获取已提交和已完成的题目数
             submitted_count = submission['submitted_questions']
             completed_count = submission['completed_questions']
 
             # 获取待批改题目数
-            pending_count = pending_map.get(student_homework_key, 0)
+            pending_count = submission['pending_questions']
 
             # 计算完成率（基于已提交题目数）
             completion_rate = (submitted_count / total_questions * 100) if total_questions > 0 else 0
@@ -1387,134 +1416,70 @@ def create_assignment():
         if len(teacher_classes) != len(class_ids):
             return jsonify({"success": False, "message": "只能为自己的班级布置作业"}), 403
 
-        # 检查题目是否存在（需要检查三个不同的题目表）
+        # 检查题目是否存在（在题目目录中按ID查找题型）
         valid_question_ids = set()
         question_type_map = {}  # 存储题目ID到题目类型的映射
 
-        if question_ids:
+        types_by_id = question_types_by_id(question_ids)
+        for i, question_id in enumerate(question_ids):
+            found_types = types_by_id.get(question_id, [])
             if use_frontend_types:
-                # 如果前端提供了题目类型信息，直接使用前端提供的信息
-                logger.info("使用前端提供的题目类型信息")
-                for i, question_id in enumerate(question_ids):
-                    question_type = question_types[i]
-                    # 验证题目在对应表中是否存在
-                    if question_type == 'progressing':
-                        check_sql = "SELECT COUNT(*) as count FROM progressing_questions WHERE progressing_questions_id = %s"
-                    elif question_type == 'choice':
-                        check_sql = "SELECT COUNT(*) as count FROM choice_questions WHERE choice_questions_id = %s"
-                    elif question_type == 'judgment':
-                        check_sql = "SELECT COUNT(*) as count FROM judgment_questions WHERE judgment_questions_id = %s"
-                    else:
-                        continue  # 无效的题目类型
-
-                    result = db.execute_query(check_sql, (question_id,))
-                    if result and result[0]['count'] > 0:
-                        valid_question_ids.add(question_id)
-                        question_type_map[question_id] = question_type
-            else:
-                # 使用优先级查询：编程题(1) > 选择题(2) > 判断题(3)
-                # 这样可以确保如果一个ID在多个表中存在，选择优先级最高的那个
-
-                # 构建UNION查询来同时获取所有题目类型的信息
-                union_sql = """
-                    SELECT progressing_questions_id as id, 'progressing' as question_type, 1 as priority
-                    FROM progressing_questions
-                    WHERE progressing_questions_id IN %s
-
-                    UNION
-
-                    SELECT choice_questions_id as id, 'choice' as question_type, 2 as priority
-                    FROM choice_questions
-                    WHERE choice_questions_id IN %s
-
-                    UNION
-
-                    SELECT judgment_questions_id as id, 'judgment' as question_type, 3 as priority
-                    FROM judgment_questions
-                    WHERE judgment_questions_id IN %s
-
-                    ORDER BY id, priority
-                """
-
-                all_questions = db.execute_query(union_sql, (tuple(question_ids), tuple(question_ids), tuple(question_ids)))
-
-                # 处理结果，为每个ID选择优先级最高的类型
-                current_id = None
-                best_priority = float('inf')
-                best_type = None
-
-                for q in all_questions:
-                    if current_id != q['id']:
-                        # 保存之前ID的最佳结果
-                        if current_id is not None:
-                            valid_question_ids.add(current_id)
-                            question_type_map[current_id] = best_type
-
-                        # 开始处理新ID
-                        current_id = q['id']
-                        best_priority = q['priority']
-                        best_type = q['question_type']
-                    else:
-                        # 同一ID，检查是否优先级更高（数字越小优先级越高）
-                        if q['priority'] < best_priority:
-                            best_priority = q['priority']
-                            best_type = q['question_type']
-
-                # 处理最后一个ID
-                if current_id is not None:
-                    valid_question_ids.add(current_id)
-                    question_type_map[current_id] = best_type
+                # 如果前端提供了题目类型信息，验证题目在对应题型中是否存在
+                if question_types[i] in found_types:
+                    valid_question_ids.add(question_id)
+                    question_type_map[question_id] = question_types[i]
+            elif found_types:
+                # 一个ID在多个题型中存在时选择优先级最高的：编程题 > 选择题 > 判断题
+                valid_question_ids.add(question_id)
+                question_type_map[question_id] = found_types[0]
 
         # 验证所有题目都存在
         invalid_question_ids = set(question_ids) - valid_question_ids
         if invalid_question_ids:
             return jsonify({"success": False, "message": f"以下题目不存在: {list(invalid_question_ids)}"}), 400
 
-        # 为每个班级创建作业
+        # 为每个班级创建作业，所有班级的作业和题目在同一个事务中写入
         created_assignments = []
-        for class_info in teacher_classes:
-            class_id = class_info['class_id']
-            course_id = class_info['course_id']
-
-            # 创建作业分配记录
-            assignment_sql = """
-                INSERT INTO homework_assignments (title, description, teacher_id, class_id, course_id, publish_date, deadline, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            import datetime
-            now = datetime.datetime.now()
-
-            # 执行插入并获取新插入的ID
-            try:
-                with db.get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        cursor.execute(assignment_sql, (
-                            data['title'],
-                            data.get('description', ''),
-                            teacher_id,
-                            class_id,
-                            course_id,
-                            data.get('publish_date'),  # 发布日期
-                            data.get('deadline'),      # 截止日期
-                            now,
-                            now
-                        ))
-                        assignment_id = cursor.lastrowid
-
-                        if assignment_id > 0:
-                            # 为作业添加题目
-                            question_sql = "INSERT INTO homework_questions (homework_id, question_id, question_type) VALUES (%s, %s, %s)"
-                            for question_id in question_ids:
-                                cursor.execute(question_sql, (assignment_id, question_id, question_type_map[question_id]))
-            except Exception as e:
-                logger.error(f"创建作业和题目失败: {e}")
-                continue
+        assignment_sql = """
+            INSERT INTO homework_assignments (title, description, teacher_id, class_id, course_id, publish_date, deadline, created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        question_sql = "INSERT INTO homework_questions (homework_id, question_id, question_type) VALUES (%s, %s, %s)"
+        now = datetime.datetime.now()
 
-                created_assignments.append({
-                    'assignment_id': assignment_id,
-                    'class_id': class_id,
-                    'class_name': class_info['class_name']
-                })
+        try:
+            with db.transaction():
+                for class_info in teacher_classes:
+                    # 创建作业分配记录并获取新插入的ID
+                    assignment_id = db.execute_insert(assignment_sql, (
+                        data['title'],
+                        data.get('description', ''),
+                        teacher_id,
+                        class_info['class_id'],
+                        class_info['course_id'],
+                        data.get('publish_date'),  # 发布日期
+                        data.get('deadline'),      # 截止日期
+                        now,
+                        now
+                    ))
+
+                    # 为作业添加题目
+                    db.execute_many_update(question_sql, [
+                        (assignment_id, question_id, question_type_map[question_id]) for question_id in question_ids
+                    ])
+
+                    created_assignments.append({
+                        'assignment_id': assignment_id,
+                        'class_id': class_info['class_id'],
+                        'class_name': class_info['class_name']
+                    })
+        except pymysql.MySQLError as e:
+            # 事务已整体回滚；只处理数据库错误，其他异常交给外层
+            if is_invalid_data_error(e):
+                logger.warning(f"创建作业的数据不合法: {e}")
+                return jsonify({"success": False, "message": "作业数据不合法，请检查标题长度和发布、截止日期"}), 400
+            logger.error(f"创建作业和题目失败: {e}")
+            return jsonify({"success": False, "message": "创建作业失败，请重试"}), 500
 
         logger.info(f"教师 {teacher_id} 创建作业成功: {data['title']}，分配给 {len(created_assignments)} 个班级")
 
@@ -1594,88 +1559,39 @@ def get_questions():
         difficulty = request.args.get('difficulty')
         language = request.args.get('language')
 
-        all_questions = []
-
-        # 获取编程题
-        progressing_sql = """
-            SELECT progressing_questions_id as id, title, description, difficulty,
-                   knowledge_points, language, 'progressing' as question_type, created_at
-            FROM progressing_questions
-            WHERE 1=1
-        """
-        progressing_params = []
-
-        if knowledge_point:
-            progressing_sql += " AND knowledge_points LIKE %s"
-            progressing_params.append(f"%{knowledge_point}%")
-
-        if difficulty:
-            progressing_sql += " AND difficulty = %s"
-            progressing_params.append(difficulty)
-
-        if language:
-            progressing_sql += " AND language = %s"
-            progressing_params.append(language)
-
-        progressing_sql += " ORDER BY created_at DESC"
-
-        progressing_questions = db.execute_query(progressing_sql, progressing_params)
-        all_questions.extend(progressing_questions)
-
-        # 获取选择题
-        choice_sql = """
-            SELECT choice_questions_id as id, title, description, difficulty,
-                   knowledge_points, language, 'choice' as question_type, created_at
-            FROM choice_questions
-            WHERE 1=1
-        """
-        choice_params = []
+        # 在题目目录上筛选并按创建时间排序，再按主键补充题目描述
+        conditions = []
+        params = []
 
         if knowledge_point:
-            choice_sql += " AND knowledge_points LIKE %s"
-            choice_params.append(f"%{knowledge_point}%")
+            tag_sql, tag_params = tag_filter_condition(knowledge_point)
+            conditions.append(tag_sql)
+            params.extend(tag_params)
 
         if difficulty:
-            choice_sql += " AND difficulty = %s"
-            choice_params.append(difficulty)
+            conditions.append("qc.difficulty = %s")
+            params.append(difficulty)
 
         if language:
-            choice_sql += " AND language = %s"
-            choice_params.append(language)
-
-        choice_sql += " ORDER BY created_at DESC"
-
-        choice_questions = db.execute_query(choice_sql, choice_params)
-        all_questions.extend(choice_questions)
-
-        # 获取判断题
-        judgment_sql = """
-            SELECT judgment_questions_id as id, title, description, difficulty,
-                   knowledge_points, language, 'judgment' as question_type, created_at
-            FROM judgment_questions
-            WHERE 1=1
+            conditions.append("qc.language = %s")
+            params.append(language)
+
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        questions_sql = f"""
+            SELECT qc.question_id as id, qc.title,
+                   COALESCE(pq.description, cq.description, jq.description) as description,
+                   qc.difficulty, qc.knowledge_points, qc.language, qc.question_type, qc.created_at
+            FROM question_catalog qc
+            LEFT JOIN progressing_questions pq
+                ON qc.question_type = 'progressing' AND pq.progressing_questions_id = qc.question_id
+            LEFT JOIN choice_questions cq
+                ON qc.question_type = 'choice' AND cq.choice_questions_id = qc.question_id
+            LEFT JOIN judgment_questions jq
+                ON qc.question_type = 'judgment' AND jq.judgment_questions_id = qc.question_id
+            {where_clause}
+            ORDER BY qc.created_at DESC
         """
-        judgment_params = []
-
-        if knowledge_point:
-            judgment_sql += " AND knowledge_points LIKE %s"
-            judgment_params.append(f"%{knowledge_point}%")
-
-        if difficulty:
-            judgment_sql += " AND difficulty = %s"
-            judgment_params.append(difficulty)
-
-        if language:
-            judgment_sql += " AND language = %s"
-            judgment_params.append(language)
-
-        judgment_sql += " ORDER BY created_at DESC"
-
-        judgment_questions = db.execute_query(judgment_sql, judgment_params)
-        all_questions.extend(judgment_questions)
-
-        # 按创建时间排序（移除数量限制）
-        all_questions.sort(key=lambda x: x['created_at'], reverse=True)
+        all_questions = db.execute_query(questions_sql, params)
 
         return jsonify({"success": True, "data": all_questions})
 
@@ -1830,34 +1746,31 @@ def get_assignment_submissions(assignment_id):
         """
         all_students = db.execute_query(students_sql, (assignment['class_id'],))
 
+        # 一次查询该作业的全部答题记录，再按学生分组（查询次数与班级人数无关）
+        answers_sql = """
+            SELECT
+                sa.student_id,
+                sa.question_id,
+                sa.question_type,
+                sa.status,
+                sa.score,
+                sa.is_correct,
+                sa.last_attempt_at as submit_time,
+                sa.teacher_comment,
+                qc.title as question_title
+            FROM student_answers sa
+            LEFT JOIN question_catalog qc ON qc.question_type = sa.question_type AND qc.question_id = sa.question_id
+            WHERE sa.homework_id = %s
+            ORDER BY sa.student_id, sa.question_id
+        """
+        answers_by_student = {}
+        for answer in db.execute_query(answers_sql, (assignment_id,)):
+            answers_by_student.setdefault(answer['student_id'], []).append(answer)
+
         # 获取学生的答题情况
         submissions = []
         for student in all_students:
-            student_id = student['student_id']
-
-            # 获取该学生在该作业中的答题记录
-            answers_sql = """
-                SELECT
-                    sa.question_id,
-                    sa.question_type,
-                    sa.status,
-                    sa.score,
-                    sa.is_correct,
-                    sa.last_attempt_at as submit_time,
-                    sa.teacher_comment,
-                    CASE
-                        WHEN sa.question_type = 'progressing' THEN pq.title
-                        WHEN sa.question_type = 'choice' THEN cq.title
-                        WHEN sa.question_type = 'judgment' THEN jq.title
-                    END as question_title
-                FROM student_answers sa
-                LEFT JOIN progressing_questions pq ON sa.question_id = pq.progressing_questions_id AND sa.question_type = 'progressing'
-                LEFT JOIN choice_questions cq ON sa.question_id = cq.choice_questions_id AND sa.question_type = 'choice'
-                LEFT JOIN judgment_questions jq ON sa.question_id = jq.judgment_questions_id AND sa.question_type = 'judgment'
-                WHERE sa.student_id = %s AND sa.homework_id = %s
-                ORDER BY sa.question_id
-            """
-            student_answers = db.execute_query(answers_sql, (student_id, assignment_id))
+            student_answers = answers_by_student.get(student['student_id'], [])
 
             # 计算统计信息
             total_questions = len(student_answers)
@@ -1922,6 +1835,51 @@ def get_assignment_submissions(assignment_id):
         logger.error(f"获取作业提交情况失败: {e}")
         return jsonify({"success": False, "message": "获取作业提交情况失败"}), 500
 
+# 各题型题目详情的查询列
+QUESTION_DETAIL_SQL = {
+    'progressing': """
+        SELECT progressing_questions_id as id, title, description, language,
+               difficulty, knowledge_points, input_description, output_description,
+               solution_idea, reference_code, created_at
+        FROM progressing_questions
+        WHERE progressing_questions_id IN ({placeholders})
+    """,
+    'choice': """
+        SELECT choice_questions_id as id, title, description, language,
+               difficulty, knowledge_points, options, correct_answer,
+               solution_idea, created_at
+        FROM choice_questions
+        WHERE choice_questions_id IN ({placeholders})
+    """,
+    'judgment': """
+        SELECT judgment_questions_id as id, title, description, language,
+               difficulty, knowledge_points, correct_answer,
+               solution_idea, created_at
+        FROM judgment_questions
+        WHERE judgment_questions_id IN ({placeholders})
+    """,
+}
+
+
+def _fetch_question_details(questions):
+    """
+    批量获取题目详情，每种题型查询一次
+    :param questions: [{question_id, question_type}, ...]
+    :return: {(题型, 题目ID): 题目详情}
+    """
+    ids_by_type = {}
+    for question in questions:
+        if question['question_type'] in QUESTION_DETAIL_SQL:
+            ids_by_type.setdefault(question['question_type'], set()).add(question['question_id'])
+
+    details = {}
+    for q_type, ids in ids_by_type.items():
+        ids = sorted(ids)
+        sql = QUESTION_DETAIL_SQL[q_type].format(placeholders=', '.join(['%s'] * len(ids)))
+        for row in db.execute_query(sql, tuple(ids)):
+            details[(q_type, row['id'])] = row
+    return details
+
 @teachers_bp.route('/api/teacher/assignment/<int:student_id>/<int:homework_id>/submissions', methods=['GET'])
 def get_student_assignment_submissions(student_id, homework_id):
     """获取学生特定作业的所有题目提交详情"""
@@ -1969,56 +1927,53 @@ def get_student_assignment_submissions(student_id, homework_id):
         """
         homework_questions = db.execute_query(questions_sql, (homework_id,))
 
+        # 题目详情按题型各查询一次，学生答题记录和编程题最新提交也各查询一次（查询次数与题目数无关）
+        question_details = _fetch_question_details(homework_questions)
+
+        answers_sql = """
+            SELECT sa.question_id, sa.status, sa.score, sa.is_correct,
+                   sa.answer_text, sa.choice_answer, sa.judgment_answer,
+                   sa.teacher_comment, sa.last_attempt_at,
+                   sa.graded_at
+            FROM student_answers sa
+            WHERE sa.student_id = %s AND sa.homework_id = %s
+            ORDER BY sa.id
+        """
+        student_answers = {}
+        for answer in db.execute_query(answers_sql, (student_id, homework_id)):
+            student_answers.setdefault(answer['question_id'], answer)
+
+        # 编程题：programming_submissions表中每道题最新提交的代码和执行结果
+        latest_code = {}
+        if any(question['question_type'] == 'progressing' for question in homework_questions):
+            code_sql = """
+                SELECT ps.question_id, ps.submission_code, ps.run_status, ps.execution_time,
+                       ps.memory_usage, ps.compile_error, ps.runtime_error, ps.test_results
+                FROM programming_submissions ps
+                JOIN (
+                    SELECT question_id, MAX(submit_time) as submit_time
+                    FROM programming_submissions
+                    WHERE student_id = %s AND homework_id = %s
+                    GROUP BY question_id
+                ) latest ON latest.question_id = ps.question_id AND latest.submit_time = ps.submit_time
+                WHERE ps.student_id = %s AND ps.homework_id = %s
+                ORDER BY ps.id DESC
+            """
+            for code_info in db.execute_query(code_sql, (student_id, homework_id, student_id, homework_id)):
+                latest_code.setdefault(code_info['question_id'], code_info)
+
         # 获取学生的答题情况
         submissions = []
         for question in homework_questions:
             q_id = question['question_id']
             q_type = question['question_type']
 
-            # 获取题目详情
-            if q_type == 'progressing':
-                question_sql = """
-                    SELECT progressing_questions_id as id, title, description, language,
-                           difficulty, knowledge_points, input_description, output_description,
-                           solution_idea, reference_code, created_at
-                    FROM progressing_questions
-                    WHERE progressing_questions_id = %s
-                """
-            elif q_type == 'choice':
-                question_sql = """
-                    SELECT choice_questions_id as id, title, description, language,
-                           difficulty, knowledge_points, options, correct_answer,
-                           solution_idea, created_at
-                    FROM choice_questions
-                    WHERE choice_questions_id = %s
-                """
-            elif q_type == 'judgment':
-                question_sql = """
-                    SELECT judgment_questions_id as id, title, description, language,
-                           difficulty, knowledge_points, correct_answer,
-                           solution_idea, created_at
-                    FROM judgment_questions
-                    WHERE judgment_questions_id = %s
-                """
-
-            question_detail = db.execute_query(question_sql, (q_id,))
-
-            if not question_detail:
+            question_info = question_details.get((q_type, q_id))
+            if not question_info:
                 continue
 
-            question_info = question_detail[0]
             question_info['question_type'] = q_type
-
-            # 获取学生答题记录
-            answer_sql = """
-                SELECT sa.question_id, sa.status, sa.score, sa.is_correct,
-                       sa.answer_text, sa.choice_answer, sa.judgment_answer,
-                       sa.teacher_comment, sa.last_attempt_at,
-                       sa.graded_at
-                FROM student_answers sa
-                WHERE sa.student_id = %s AND sa.homework_id = %s AND sa.question_id = %s
-            """
-            student_answer = db.execute_query(answer_sql, (student_id, homework_id, q_id))
+            answer = student_answers.get(q_id)
 
             submission = {
                 'question_id': q_id,
@@ -2042,25 +1997,15 @@ def get_student_assignment_submissions(student_id, homework_id):
                 'output_description': question_info.get('output_description')
             }
 
-            if student_answer:
-                answer = student_answer[0]
-
+            if answer:
                 # 根据题目类型获取学生答案和判断正误
                 student_answer_text = None
                 is_correct = answer['is_correct']
 
                 if q_type == 'progressing':
-                    # 编程题：从programming_submissions表获取最新提交的代码和执行结果
-                    code_sql = """
-                        SELECT submission_code, run_status, execution_time,
-                               memory_usage, compile_error, runtime_error, test_results
-                        FROM programming_submissions
-                        WHERE student_id = %s AND homework_id = %s AND question_id = %s
-                        ORDER BY submit_time DESC LIMIT 1
-                    """
-                    code_result = db.execute_query(code_sql, (student_id, homework_id, q_id))
-                    if code_result:
-                        code_info = code_result[0]
+                    # 编程题：使用programming_submissions表中最新提交的代码和执行结果
+                    code_info = latest_code.get(q_id)
+                    if code_info:
                         student_answer_text = code_info['submission_code']
                         submission['code'] = code_info['submission_code']
                         submission['execution_result'] = f"运行状态: {code_info['run_status']}"
@@ -2292,7 +2237,11 @@ def grade_student_answer():
             WHERE student_id = %s AND homework_id = %s AND question_id = %s
         """
 
-        affected = db.execute_update(update_sql, (score, comment, student_id, homework_id, question_id))
+        # 答案和作业提交汇总在同一个事务中更新
+        with db.transaction():
+            affected = db.execute_update(update_sql, (score, comment, student_id, homework_id, question_id))
+            if affected > 0:
+                refresh_submission_summary(student_id, homework_id)
 
         if affected > 0:
             logger.info(f"教师 {teacher_id} 为学生 {student_id} 的题目 {question_id} 评分成功: {score} 分")
@@ -16,8 +16,9 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
 
-    # 初始化数据库
-    from database import init_database
+    # 初始化数据库，每个请求复用同一个数据库连接
+    from database import db, init_database
+    db.init_app(app)
     if init_database():
         logger.info("数据库初始化完成")
     else:
@@ -173,36 +174,81 @@ def register():
 def get_dashboard_stats():
     """获取仪表盘统计数据"""
     try:
-        from database import db
-        
-        # 获取教师数量
-        teachers_sql = "SELECT COUNT(*) as count FROM teachers"
-        teachers_count = db.execute_query(teachers_sql)[0]['count']
-        
-        # 获取学生数量
-        students_sql = "SELECT COUNT(*) as count FROM students"
-        students_count = db.execute_query(students_sql)[0]['count']
-        
-        # 获取管理员数量
-        admins_sql = "SELECT COUNT(*) as count FROM admins"
-        admins_count = db.execute_query(admins_sql)[0]['count']
-        
-        # 计算总用户数
-        total_users = teachers_count + students_count + admins_count
-        
+        from services.question_stats import question_stats
+
+        # 用户数量按有效期缓存（DASHBOARD_STATS_TTL）
         return jsonify({
             "success": True,
-            "data": {
-                "total_users": total_users,
-                "teachers_count": teachers_count,
-                "students_count": students_count,
-                "admins_count": admins_count
-            }
+            "data": question_stats.dashboard()
         })
     except Exception as e:
         logger.error(f"获取仪表盘统计数据失败: {e}")
         return jsonify({"success": False, "message": "获取统计数据失败"}), 500
 
+@app.route('/api/admin/db/query-stats', methods=['GET', 'DELETE'])
+def admin_query_stats():
+    """按SQL指纹汇总的执行统计和连接池计数器（仅管理员），DELETE清空统计"""
+    if 'identity' not in session or session['identity'] != 'admin':
+        return jsonify({
+            "success": False,
+            "message": "需要管理员权限",
+            "redirect": "/login"
+        }), 401
+
+    from database import db
+
+    if request.method == 'DELETE':
+        db.query_stats.reset()
+        return jsonify({"success": True, "message": "SQL执行统计已清空"})
+
+    sort_by = request.args.get('sort', 'total_ms')
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({
+        "success": True,
+        "data": {
+            "since": db.query_stats.started_at,
+            "slow_query_ms": db.query_stats.slow_query_ms,
+            "queries": db.query_stats_snapshot(sort_by, limit),
+            "pool": db.pool_stats()
+        }
+    })
+
+@app.route('/api/admin/stats/rebuild', methods=['POST'])
+def admin_rebuild_stats():
+    """
+    重建题库统计和仪表盘统计缓存（仅管理员）。catalog=true 时先根据题目表重建题目目录，
+    tags=true 时根据题目目录重新拆分知识点标签
+    """
+    if 'identity' not in session or session['identity'] != 'admin':
+        return jsonify({
+            "success": False,
+            "message": "需要管理员权限",
+            "redirect": "/login"
+        }), 401
+
+    from services.question_catalog import rebuild_catalog
+    from services.question_stats import question_stats
+    from services.question_tags import rebuild_question_tags
+
+    try:
+        if request.args.get('catalog', 'false').lower() == 'true':
+            rebuild_catalog()
+        if request.args.get('tags', 'false').lower() == 'true':
+            rebuild_question_tags()
+        question_stats.invalidate()
+        return jsonify({
+            "success": True,
+            "message": "统计缓存已重建",
+            "data": {
+                "question_bank": question_stats.rebuild(),
+                "dashboard": question_stats.dashboard(),
+                "cache": question_stats.stats()
+            }
+        })
+    except Exception as e:
+        logger.error(f"重建统计缓存失败: {e}")
+        return jsonify({"success": False, "message": "重建统计缓存失败"}), 500
+
 @app.route('/api/teacher/profile', methods=['GET'])
 def get_teacher_profile():
     """获取当前教师个人资料"""
@@ -24,6 +24,38 @@ class Config:
     MYSQL_DB = os.environ.get('DB_NAME', 'oljudge')
     MYSQL_PORT = int(os.environ.get('DB_PORT', 3306))
 
+    # 数据库连接池配置
+    DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 2))  # 保持的最少空闲连接数
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))  # 最大连接数
+    DB_POOL_MAX_WAIT = float(os.environ.get('DB_POOL_MAX_WAIT', 5))  # 连接用完时最长等待时间（秒）
+    DB_POOL_PING_INTERVAL = int(os.environ.get('DB_POOL_PING_INTERVAL', 30))  # 空闲超过该时间的连接借出前先ping（秒）
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 3600))  # 连接最长使用时间，超过后重建（秒）
+    DB_POOL_IDLE_TIMEOUT = int(os.environ.get('DB_POOL_IDLE_TIMEOUT', 600))  # 多余空闲连接的关闭时间（秒）
+
+    # 数据库迁移配置
+    DB_AUTO_MIGRATE = os.environ.get('DB_AUTO_MIGRATE', 'true').lower() == 'true'  # 启动时自动执行未执行的迁移（否则手动运行 python migrate.py）
+
+    # 批量插入配置（每条多行INSERT语句的行数和参数大小上限，需小于MySQL的max_allowed_packet）
+    DB_BULK_INSERT_ROWS = int(os.environ.get('DB_BULK_INSERT_ROWS', 500))
+    DB_BULK_INSERT_MAX_KB = int(os.environ.get('DB_BULK_INSERT_MAX_KB', 2048))
+
+    # 只读副本配置（查询默认读副本，账号密码与主库相同）
+    DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]  # 主机[:端口]，多个用逗号分隔
+    DB_REPLICA_STICKY_SECONDS = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))  # 请求之外写入后，该线程在这段时间内的查询仍读主库（秒）
+    DB_REPLICA_RETRY_SECONDS = int(os.environ.get('DB_REPLICA_RETRY_SECONDS', 30))  # 副本连接失败后暂停使用的时间（秒）
+
+    # SQL执行统计配置
+    DB_QUERY_STATS_ENABLED = os.environ.get('DB_QUERY_STATS_ENABLED', 'true').lower() == 'true'  # 按SQL指纹统计执行次数和耗时
+    DB_QUERY_STATS_MAX_FINGERPRINTS = int(os.environ.get('DB_QUERY_STATS_MAX_FINGERPRINTS', 500))  # 最多统计的SQL指纹数，超出的并入"其他"
+    DB_QUERY_STATS_SAMPLES = int(os.environ.get('DB_QUERY_STATS_SAMPLES', 512))  # 每个指纹保留的最近耗时样本数（用于计算p50/p99）
+    DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 500))  # 慢查询阈值（毫秒），超过时记录日志
+
+    # SQL语句日志配置（database.sql日志器，只记录SQL指纹和截断后的参数，密码等敏感语句的参数隐藏）
+    DB_LOG_LEVEL = os.environ.get('DB_LOG_LEVEL', 'WARNING')  # INFO时按采样率记录语句，WARNING时只记录出错的语句
+    DB_LOG_SAMPLE_RATE = float(os.environ.get('DB_LOG_SAMPLE_RATE', 0.01))  # 语句日志采样率（0~1）
+    DB_LOG_PARAM_MAX_CHARS = int(os.environ.get('DB_LOG_PARAM_MAX_CHARS', 64))  # 单个字符串参数最多记录的字符数
+    DB_LOG_MAX_PARAMS = int(os.environ.get('DB_LOG_MAX_PARAMS', 10))  # 最多记录的参数个数（批量执行时为行数）
+
     # DeepSeek AI API 配置
     DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY', 'your-deepseek-api-key-here')
     DEEPSEEK_API_URL = 'https://api.deepseek.com/v1/chat/completions'
@@ -31,6 +63,53 @@ class Config:
     # GCC编译器路径配置
     GPP_PATH = os.environ.get('GPP_PATH', 'g++')
 
+    # 判题工作进程配置
+    JUDGE_WORKERS = int(os.environ.get('JUDGE_WORKERS', os.cpu_count() or 2))
+    JUDGE_JOB_TTL = int(os.environ.get('JUDGE_JOB_TTL', 600))  # 已完成任务保留时间（秒）
+    JUDGE_CORE_BUDGET = int(os.environ.get('JUDGE_CORE_BUDGET', os.cpu_count() or 2))  # 全机同时运行的测试用例上限
+    JUDGE_TEST_CONCURRENCY = int(os.environ.get('JUDGE_TEST_CONCURRENCY', 4))  # 单次评测的测试用例并发数
+    JUDGE_STOP_ON_FIRST_FAILURE = os.environ.get('JUDGE_STOP_ON_FIRST_FAILURE', 'false').lower() == 'true'  # 正式提交遇到首个失败用例即停止
+    JUDGE_COMPARE_MODE = os.environ.get('JUDGE_COMPARE_MODE', 'exact')  # 输出比对模式：exact/whitespace/float/checker
+    JUDGE_FLOAT_TOLERANCE = float(os.environ.get('JUDGE_FLOAT_TOLERANCE', 1e-6))  # float模式的绝对/相对误差容限
+    JUDGE_CHECKER_PATH = os.environ.get('JUDGE_CHECKER_PATH', '')  # checker模式使用的自定义检查程序
+    JUDGE_CHECKER_TIMEOUT = int(os.environ.get('JUDGE_CHECKER_TIMEOUT', 10))  # 自定义检查程序超时（秒）
+
+    # 常驻JVM进程池配置（Java代码在预先启动的JVM中运行）
+    JVM_POOL_ENABLED = os.environ.get('JVM_POOL_ENABLED', 'true').lower() == 'true'
+    JVM_POOL_SIZE = int(os.environ.get('JVM_POOL_SIZE', JUDGE_TEST_CONCURRENCY))  # 每个进程的常驻JVM数
+    JVM_MAX_RUNS = int(os.environ.get('JVM_MAX_RUNS', 100))  # 单个JVM运行多少次后回收
+
+    # Python fork服务器配置（Python代码由预热的fork服务器派生子进程运行）
+    PYTHON_FORKSERVER_ENABLED = os.environ.get('PYTHON_FORKSERVER_ENABLED', 'true').lower() == 'true'
+
+    # 判题沙箱配置
+    SANDBOX_MEMORY_MB = int(os.environ.get('SANDBOX_MEMORY_MB', 256))  # 学生程序内存上限（MB）
+    SANDBOX_MAX_PROCESSES = int(os.environ.get('SANDBOX_MAX_PROCESSES', 64))  # 学生程序进程/线程数上限
+    SANDBOX_OUTPUT_LIMIT_KB = int(os.environ.get('SANDBOX_OUTPUT_LIMIT_KB', 16 * 1024))  # 标准输出上限（KB）
+    SANDBOX_CGROUP_ROOT = os.environ.get('SANDBOX_CGROUP_ROOT', '')  # 已委派给判题服务的cgroups v2目录，留空则只使用rlimit
+    SANDBOX_LIMIT_NPROC = os.environ.get('SANDBOX_LIMIT_NPROC', 'false').lower() == 'true'  # 以专用账号运行时用RLIMIT_NPROC限制进程数
+    SANDBOX_RUN_USER = os.environ.get('SANDBOX_RUN_USER', '')  # 运行学生程序的专用账号（判题服务需以root运行），留空则与判题服务同一账号
+
+    # 测试数据文件存储配置（超过内联上限的测试输入/输出按内容哈希保存为本地文件）
+    TEST_DATA_DIR = os.environ.get('TEST_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'test_data'))
+    TEST_DATA_INLINE_MAX_KB = int(os.environ.get('TEST_DATA_INLINE_MAX_KB', 64))  # 不超过该大小的数据仍保存在数据库中
+    TEST_DATA_COMPRESS = os.environ.get('TEST_DATA_COMPRESS', 'false').lower() == 'true'  # gzip压缩保存（判题时需解压，不能mmap）
+
+    # 题库搜索配置（标题、描述上的ngram全文索引）
+    QUESTION_SEARCH_NGRAM_SIZE = int(os.environ.get('QUESTION_SEARCH_NGRAM_SIZE', 2))  # 需与MySQL的ngram_token_size一致，更短的搜索词退回LIKE匹配
+
+    # 统计缓存配置
+    QUESTION_STATS_TTL = int(os.environ.get('QUESTION_STATS_TTL', 600))  # 题库统计计数的有效期（秒），期间按题目增删改增量更新，到期重新统计
+    DASHBOARD_STATS_TTL = int(os.environ.get('DASHBOARD_STATS_TTL', 60))  # 仪表盘用户数量的缓存时间（秒）
+
+    # 编程题缓存配置（进程内缓存题目信息和测试用例）
+    PROBLEM_CACHE_SIZE = int(os.environ.get('PROBLEM_CACHE_SIZE', 128))  # 最多缓存的题目数
+    PROBLEM_CACHE_TTL = int(os.environ.get('PROBLEM_CACHE_TTL', 300))  # 缓存有效期（秒），多进程部署时兜底
+
+    # 编译产物缓存配置
+    BUILD_CACHE_DIR = os.environ.get('BUILD_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'build_cache'))
+    BUILD_CACHE_MAX_MB = int(os.environ.get('BUILD_CACHE_MAX_MB', 512))  # 缓存容量上限（MB）
+
     # 邮件配置
     SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.qq.com')
     SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
@@ -67,6 +146,10 @@ class DevelopmentConfig(Config):
     # 开发环境Session配置 - 使用Lax以支持HTTP
     SESSION_COOKIE_SAMESITE = 'Lax'  # 开发环境使用Lax，支持HTTP
 
+    # 开发环境记录全部SQL语句
+    DB_LOG_LEVEL = os.environ.get('DB_LOG_LEVEL', 'INFO')
+    DB_LOG_SAMPLE_RATE = float(os.environ.get('DB_LOG_SAMPLE_RATE', 1.0))
+
 class ProductionConfig(Config):
     """生产环境配置"""
     DEBUG = False
@@ -77,10 +160,14 @@ class ProductionConfig(Config):
     # 生产环境Session配置
     SESSION_COOKIE_SECURE = True  # 生产环境必须使用HTTPS
 
+    # 生产环境只记录出错的SQL语句
+    DB_LOG_LEVEL = os.environ.get('DB_LOG_LEVEL', 'WARNING')
+
 class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     MYSQL_DB = 'oljudge_test'
+    DB_LOG_LEVEL = os.environ.get('DB_LOG_LEVEL', 'WARNING')
 
 # 配置字典
 config = {
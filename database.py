@@ -1,15 +1,426 @@
 import pymysql
+from pymysql.constants import SERVER_STATUS
 from pymysql.cursors import DictCursor
 from config import Config
+import collections
+import contextlib
+import functools
+import json
 import logging
+import random
+import re
 import threading
+import time
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# SQL语句日志，级别和采样率由配置单独控制
+sql_logger = logging.getLogger('database.sql')
+
+
+def is_connection_error(exc):
+    """异常是否表示连接本身已不可用（连接断开、协议错误等，客户端错误码2000以上），这类连接不再放回连接池"""
+    if isinstance(exc, pymysql.err.InterfaceError):
+        return True
+    if isinstance(exc, pymysql.err.OperationalError):
+        return bool(exc.args) and isinstance(exc.args[0], int) and exc.args[0] >= 2000
+    return False
+
+
+class PoolTimeoutError(Exception):
+    """等待空闲数据库连接超时"""
+    pass
+
+
+class ConnectionPool:
+    """数据库连接池
+
+    连接数不超过max_size，连接用完时请求在队列中等待，超过max_wait秒仍没有空闲连接则抛出PoolTimeoutError。
+    空闲超过ping_interval秒的连接借出前先ping检查，存活超过recycle_seconds秒的连接关闭重建；
+    空闲连接超过min_size个时，空闲超过idle_timeout秒的连接被关闭
+    """
+
+    def __init__(self, create_connection, min_size=2, max_size=10, max_wait=5,
+                 ping_interval=30, recycle_seconds=3600, idle_timeout=600):
+        self._create_connection = create_connection
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.ping_interval = ping_interval
+        self.recycle_seconds = recycle_seconds
+        self.idle_timeout = idle_timeout
+        # 空闲连接：(连接, 创建时间, 归还时间)，右端为最近归还的连接，借出时优先使用
+        self._idle = collections.deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._counters = {
+            "checkouts": 0,      # 借出次数
+            "waits": 0,          # 需要排队等待的次数
+            "wait_ms": 0,        # 累计等待时间
+            "timeouts": 0,       # 等待超时次数
+            "creations": 0,      # 新建连接次数
+            "discards": 0,       # 因失效或超龄关闭的连接数
+        }
+        self._created_at = {}
+
+    def warm_up(self):
+        """预先建立min_size个连接"""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._new_connection()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                raise
+            self.release(conn)
+
+    def _new_connection(self):
+        conn = self._create_connection()
+        with self._condition:
+            self._counters["creations"] += 1
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def acquire(self):
+        """借出一个连接"""
+        deadline = None
+        while True:
+            conn = None
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    now = time.monotonic()
+                    if deadline is None:
+                        deadline = now + self.max_wait
+                        self._counters["waits"] += 1
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeoutError(f"等待数据库连接超时（{self.max_wait}秒，连接数上限{self.max_size}）")
+                    waited_from = time.monotonic()
+                    self._condition.wait(remaining)
+                    self._counters["wait_ms"] += int((time.monotonic() - waited_from) * 1000)
+
+                self._counters["checkouts"] += 1
+                if self._idle:
+                    conn, created_at, released_at = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    return self._new_connection()
+                except Exception:
+                    self._discard(None)
+                    raise
+
+            now = time.monotonic()
+            if now - created_at > self.recycle_seconds:
+                self._discard(conn)
+                continue
+            if now - released_at > self.ping_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._discard(conn)
+                    continue
+            return conn
+
+    def release(self, conn, discard=False):
+        """归还连接，连接已失效时关闭"""
+        if not discard:
+            try:
+                # 调用方遗留的事务回滚，并恢复自动提交
+                if conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    conn.rollback()
+                if not conn.get_autocommit():
+                    conn.autocommit(True)
+            except Exception:
+                discard = True
+        if discard or not conn.open:
+            self._discard(conn)
+            return
+
+        now = time.monotonic()
+        expired = []
+        with self._condition:
+            self._idle.append((conn, self._created_at.get(id(conn), now), now))
+            # 关闭多余的长时间空闲连接
+            while len(self._idle) > self.min_size and now - self._idle[0][2] > self.idle_timeout:
+                expired.append(self._idle.popleft()[0])
+            self._condition.notify()
+        for old in expired:
+            self._discard(old)
+
+    def _discard(self, conn):
+        """关闭连接并释放名额"""
+        with self._condition:
+            self._size -= 1
+            if conn is not None:
+                self._counters["discards"] += 1
+                self._created_at.pop(id(conn), None)
+            self._condition.notify()
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @contextlib.contextmanager
+    def connection(self):
+        """借出连接的上下文管理器，退出时归还"""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception as e:
+            discard = is_connection_error(e)
+            raise
+        finally:
+            self.release(conn, discard)
+
+    def stats(self):
+        """连接池计数器"""
+        with self._condition:
+            return dict(self._counters, size=self._size, idle=len(self._idle), max_size=self.max_size)
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._condition:
+            idle, self._idle = list(self._idle), collections.deque()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+
+class PooledConnection:
+    """从连接池借出的连接，用作上下文管理器或调用close()时归还连接池（而不是关闭连接）"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(discard=exc is not None and is_connection_error(exc))
+        return False
+
+    def close(self, discard=False):
+        if self._conn is not None:
+            self._pool.release(self._conn, discard)
+            self._conn = None
+
+
+_FINGERPRINT_PATTERNS = [
+    (re.compile(r"'(?:[^'\\]|\\.|'')*'"), '?'),           # 字符串常量
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),               # 数字常量
+    (re.compile(r'%s|%\(\w+\)s'), '?'),                    # 参数占位符
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+'), '(...), ...'),  # 多行VALUES
+    (re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE), 'IN (...)'),                    # IN列表
+]
+
+# 统计的指纹数达到上限后，新出现的语句并入该指纹
+OTHER_FINGERPRINT = '<其他>'
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """SQL指纹：去掉常量和参数、合并空白和IN列表，参数不同的同一条语句得到相同的指纹"""
+    text = sql.strip().rstrip(';')
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+# 涉及这些列的语句，日志中隐藏全部字符串参数
+_SENSITIVE_SQL = re.compile(r'password|token|secret', re.IGNORECASE)
+
+
+def summarize_params(sql, params, max_chars=64, max_items=10):
+    """
+    整理写入日志的参数：超长字符串截断并注明原长度，字节串只记录长度，超出个数的参数省略，
+    涉及密码、令牌等列的语句隐藏字符串参数
+    """
+    sensitive = bool(_SENSITIVE_SQL.search(sql or ''))
+
+    def summarize(value):
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return f"<{len(value)}字节>"
+        if isinstance(value, (list, tuple)):
+            items = [summarize(item) for item in value[:max_items]]
+            if len(value) > max_items:
+                items.append(f"...<共{len(value)}项>")
+            return items
+        if isinstance(value, dict):
+            items = {key: summarize(item) for key, item in list(value.items())[:max_items]}
+            if len(value) > max_items:
+                items['...'] = f"<共{len(value)}项>"
+            return items
+        text = str(value)
+        if sensitive:
+            return f"<已隐藏{len(text)}字符>"
+        if len(text) > max_chars:
+            return f"{text[:max_chars]}...<共{len(text)}字符>"
+        return text
+
+    return summarize(params)
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def current_endpoint():
+    """发起SQL调用的位置：Flask请求中为 方法 路径 (端点名)，否则为线程名"""
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            return f"{request.method} {request.path} ({request.endpoint})"
+    except ImportError:
+        pass
+    return f"线程 {threading.current_thread().name}"
+
+
+class QueryStats:
+    """SQL执行统计
+
+    按SQL指纹汇总执行次数、出错次数、累计/最大耗时和返回（影响）行数，每个指纹保留最近samples个耗时样本
+    用于计算p50/p99；耗时超过slow_query_ms的语句连同发起调用的接口记录到慢查询日志（只记录指纹，不记录参数）
+    """
+
+    def __init__(self, enabled=True, max_fingerprints=500, samples=512, slow_query_ms=500):
+        self.enabled = enabled
+        self.max_fingerprints = max_fingerprints
+        self.samples = samples
+        self.slow_query_ms = slow_query_ms
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def record(self, sql, elapsed_ms, rows=0, error=False):
+        """记录一次SQL执行"""
+        if not self.enabled:
+            return
+        key = fingerprint(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    key = OTHER_FINGERPRINT
+                    entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = {
+                        "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                        "samples": collections.deque(maxlen=self.samples)
+                    }
+            entry["count"] += 1
+            entry["errors"] += 1 if error else 0
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["rows"] += rows or 0
+            entry["samples"].append(elapsed_ms)
+
+        if elapsed_ms >= self.slow_query_ms:
+            logger.warning(f"慢查询 {elapsed_ms:.1f}ms 行数: {rows or 0} 接口: {current_endpoint()} SQL: {key}")
+
+    def snapshot(self, sort_by='total_ms', limit=None):
+        """
+        统计结果列表，按sort_by（total_ms、p99_ms、count、rows等）从大到小排序
+        :return: [{fingerprint, count, errors, total_ms, avg_ms, p50_ms, p99_ms, max_ms, rows}, ...]
+        """
+        with self._lock:
+            entries = [(key, dict(entry, samples=sorted(entry["samples"]))) for key, entry in self._entries.items()]
+
+        result = []
+        for key, entry in entries:
+            samples = entry.pop("samples")
+            result.append({
+                "fingerprint": key,
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "total_ms": round(entry["total_ms"], 3),
+                "avg_ms": round(entry["total_ms"] / entry["count"], 3) if entry["count"] else 0,
+                "p50_ms": round(_percentile(samples, 50), 3),
+                "p99_ms": round(_percentile(samples, 99), 3),
+                "max_ms": round(entry["max_ms"], 3),
+                "rows": entry["rows"],
+            })
+        if result and sort_by not in result[0]:
+            sort_by = 'total_ms'
+        result.sort(key=lambda item: item[sort_by], reverse=True)
+        return result[:limit] if limit else result
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.started_at = time.time()
+
+
+class _Timing:
+    """一次语句执行的计时结果"""
+    __slots__ = ('rows',)
+
+    def __init__(self):
+        self.rows = 0
+
+
+# 可以在只读副本上执行的语句
+_READ_STATEMENT = re.compile(r'^\s*(?:SELECT|SHOW|DESCRIBE|DESC|EXPLAIN|WITH)\b', re.IGNORECASE)
+# 加锁、依赖当前连接状态的读语句，只能在主库（同一连接）上执行
+_PRIMARY_ONLY = re.compile(r'FOR\s+UPDATE|LOCK\s+IN\s+SHARE\s+MODE|LAST_INSERT_ID|FOUND_ROWS|GET_LOCK|RELEASE_LOCK', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def is_replica_safe(sql):
+    """语句是否可以在只读副本上执行"""
+    return bool(_READ_STATEMENT.match(sql)) and not _PRIMARY_ONLY.search(sql)
+
+
+class _Replica:
+    """只读副本：连接池和暂停使用的截止时间"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.down_until = 0
+
+
+class _RequestScope:
+    """一次请求（工作单元）的状态：固定使用的主库连接、副本连接、事务嵌套层数和是否已写入"""
+
+    def __init__(self):
+        self.conn = None
+        self.replica = None
+        self.replica_conn = None
+        self.transaction_depth = 0
+        self.wrote = False
+        self.after_commit = []
+
 
 class DatabaseManager:
-    """数据库管理器"""
+    """数据库管理器
+
+    请求作用域内（Flask请求由init_app注册的钩子自动开启）的所有数据库调用复用同一个连接，
+    该连接在第一次执行SQL时才从连接池借出，请求结束时归还；transaction()把其中的写操作合并为一个事务。
+
+    配置了只读副本时，execute_query的查询轮流发往各副本（请求作用域内固定使用同一个副本连接）。
+    请求已经写入过数据、处于事务中或在primary()块内时查询改读主库，保证读到本请求自己的写入；
+    请求作用域之外的线程写入后DB_REPLICA_STICKY_SECONDS秒内的查询也读主库
+    """
     _instance = None
     _lock = threading.Lock()
     
@@ -19,55 +430,339 @@ class DatabaseManager:
                 cls._instance = super(DatabaseManager, cls).__new__(cls)
                 cls._instance.config = config or Config()
                 cls._instance.connection_pool = None
+                cls._instance.replicas = []
+                cls._instance._replica_index = 0
+                cls._instance._local = threading.local()
+                cls._instance.query_stats = QueryStats(
+                    enabled=cls._instance.config.DB_QUERY_STATS_ENABLED,
+                    max_fingerprints=cls._instance.config.DB_QUERY_STATS_MAX_FINGERPRINTS,
+                    samples=cls._instance.config.DB_QUERY_STATS_SAMPLES,
+                    slow_query_ms=cls._instance.config.DB_SLOW_QUERY_MS
+                )
+                cls._instance.configure_logging(
+                    level=cls._instance.config.DB_LOG_LEVEL,
+                    sample_rate=cls._instance.config.DB_LOG_SAMPLE_RATE,
+                    param_max_chars=cls._instance.config.DB_LOG_PARAM_MAX_CHARS,
+                    max_params=cls._instance.config.DB_LOG_MAX_PARAMS
+                )
                 # 初始化连接池
                 cls._instance._init_connection_pool()
             return cls._instance
     
     def _init_connection_pool(self):
-        """初始化数据库连接池"""
-        try:
-            from pymysqlpool.pool import Pool
-            self.connection_pool = Pool(
-                host=self.config.MYSQL_HOST,
-                user=self.config.MYSQL_USER,
-                password=self.config.MYSQL_PASSWORD,
-                database=self.config.MYSQL_DB,
-                port=self.config.MYSQL_PORT,
-                cursorclass=DictCursor,
-                charset='utf8mb4',
-                autocommit=True,
-                max_size=10,  # 最大连接数
-                min_size=2    # 最小连接数
+        """初始化数据库连接池（连接在首次使用或warm_up时建立）"""
+        self.connection_pool = ConnectionPool(
+            self._create_single_connection,
+            min_size=self.config.DB_POOL_MIN_SIZE,
+            max_size=self.config.DB_POOL_MAX_SIZE,
+            max_wait=self.config.DB_POOL_MAX_WAIT,
+            ping_interval=self.config.DB_POOL_PING_INTERVAL,
+            recycle_seconds=self.config.DB_POOL_RECYCLE,
+            idle_timeout=self.config.DB_POOL_IDLE_TIMEOUT
+        )
+        logger.info(f"数据库连接池初始化成功（{self.config.DB_POOL_MIN_SIZE}~{self.config.DB_POOL_MAX_SIZE}个连接）")
+
+        for name in self.config.DB_REPLICA_HOSTS:
+            host, _, port = name.partition(':')
+            pool = ConnectionPool(
+                functools.partial(self._create_single_connection, host, int(port) if port else self.config.MYSQL_PORT),
+                min_size=self.config.DB_POOL_MIN_SIZE,
+                max_size=self.config.DB_POOL_MAX_SIZE,
+                max_wait=self.config.DB_POOL_MAX_WAIT,
+                ping_interval=self.config.DB_POOL_PING_INTERVAL,
+                recycle_seconds=self.config.DB_POOL_RECYCLE,
+                idle_timeout=self.config.DB_POOL_IDLE_TIMEOUT
             )
-            logger.info("数据库连接池初始化成功")
-        except ImportError:
-            logger.warning("pymysqlpool未安装，使用单连接模式")
-            self.connection_pool = None
-        except Exception as e:
-            logger.error(f"数据库连接池初始化失败: {e}")
-            self.connection_pool = None
+            self.replicas.append(_Replica(name, pool))
+        if self.replicas:
+            logger.info(f"只读副本: {', '.join(replica.name for replica in self.replicas)}")
     
     def get_connection(self):
-        """获取数据库连接"""
-        if self.connection_pool:
+        """获取数据库连接（用完后调用close()或以with语句使用，连接归还连接池）"""
+        return PooledConnection(self.connection_pool, self.connection_pool.acquire())
+
+    def connection(self):
+        """借出连接的上下文管理器：with db.connection() as conn: ..."""
+        return self.connection_pool.connection()
+
+    def pool_stats(self):
+        """连接池计数器（借出、等待、新建连接次数等），配置了只读副本时replicas中为各副本的计数器"""
+        stats = self.connection_pool.stats()
+        if self.replicas:
+            now = time.monotonic()
+            stats["replicas"] = {
+                replica.name: dict(replica.pool.stats(), down=replica.down_until > now)
+                for replica in self.replicas
+            }
+        return stats
+
+    def query_stats_snapshot(self, sort_by='total_ms', limit=None):
+        """按SQL指纹汇总的执行统计"""
+        return self.query_stats.snapshot(sort_by, limit)
+
+    def configure_logging(self, level=None, sample_rate=None, param_max_chars=None, max_params=None):
+        """设置SQL语句日志：INFO级别时按采样率以JSON记录语句指纹、截断后的参数、行数和耗时"""
+        if level is not None:
+            sql_logger.setLevel(level.upper() if isinstance(level, str) else level)
+        if sample_rate is not None:
+            self.log_sample_rate = sample_rate
+        if param_max_chars is not None:
+            self.log_param_max_chars = param_max_chars
+        if max_params is not None:
+            self.log_max_params = max_params
+
+    def init_app(self, app):
+        """注册Flask钩子：每个请求开启一个请求作用域，请求结束时归还连接；SQL语句日志使用应用所在环境的配置"""
+        self.configure_logging(
+            level=app.config.get('DB_LOG_LEVEL'),
+            sample_rate=app.config.get('DB_LOG_SAMPLE_RATE'),
+            param_max_chars=app.config.get('DB_LOG_PARAM_MAX_CHARS'),
+            max_params=app.config.get('DB_LOG_MAX_PARAMS')
+        )
+        app.before_request(self.begin_request_scope)
+        app.teardown_request(lambda exc: self.end_request_scope())
+
+    def begin_request_scope(self):
+        """开启请求作用域（已开启时不重复开启）"""
+        if getattr(self._local, 'scope', None) is None:
+            self._local.scope = _RequestScope()
+
+    def end_request_scope(self):
+        """结束请求作用域，未提交的事务回滚，连接归还连接池"""
+        scope = getattr(self._local, 'scope', None)
+        self._local.scope = None
+        if scope is None:
+            return
+        if scope.conn is not None:
+            self.connection_pool.release(scope.conn)
+        if scope.replica_conn is not None:
+            scope.replica.pool.release(scope.replica_conn)
+
+    @contextlib.contextmanager
+    def request_scope(self):
+        """请求作用域的上下文管理器，用于Flask请求之外（如后台线程）需要复用连接的场合"""
+        if getattr(self._local, 'scope', None) is not None:
+            yield
+            return
+        self.begin_request_scope()
+        try:
+            yield
+        finally:
+            self.end_request_scope()
+
+    @contextlib.contextmanager
+    def detached(self):
+        """
+        with db.detached(): ... 块内的调用不使用请求作用域固定的连接，每条语句临时借出连接、执行完立即归还。
+        用于长轮询、SSE等长时间占用请求但只偶尔查询的场合，避免整个等待期间占用一个连接
+        """
+        scope = getattr(self._local, 'scope', None)
+        self._local.scope = None
+        try:
+            yield
+        finally:
+            self._local.scope = scope
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        事务：with db.transaction(): ... 内的数据库调用使用同一个连接，正常结束时一起提交，出现异常时全部回滚。
+        嵌套使用时并入最外层事务
+        """
+        with self.request_scope():
+            scope = self._local.scope
+            if scope.transaction_depth:
+                scope.transaction_depth += 1
+                try:
+                    yield
+                finally:
+                    scope.transaction_depth -= 1
+                return
+
+            with self._use_connection() as conn:
+                conn.begin()
+            scope.transaction_depth = 1
+            try:
+                yield
+                with self._use_connection() as conn:
+                    conn.commit()
+            except BaseException:
+                if scope.conn is not None:
+                    try:
+                        scope.conn.rollback()
+                    except Exception as e:
+                        logger.error(f"事务回滚失败: {e}")
+                raise
+            finally:
+                scope.transaction_depth = 0
+                callbacks, scope.after_commit = scope.after_commit, []
+            self._run_callbacks(callbacks)
+
+    def after_commit(self, callback):
+        """
+        当前事务提交后调用callback（如更新进程内缓存），事务回滚时丢弃；不在事务中时立即调用
+        """
+        scope = getattr(self._local, 'scope', None)
+        if scope is None or not scope.transaction_depth:
+            self._run_callbacks([callback])
+        else:
+            scope.after_commit.append(callback)
+
+    @staticmethod
+    def _run_callbacks(callbacks):
+        # 数据已经提交，回调出错只记录日志
+        for callback in callbacks:
             try:
-                return self.connection_pool.get_connection()
+                callback()
             except Exception as e:
-                logger.error(f"从连接池获取连接失败: {e}")
-                # 回退到单连接模式
-                return self._create_single_connection()
+                logger.error(f"事务提交后的回调执行失败: {e}")
+
+    @contextlib.contextmanager
+    def primary(self):
+        """with db.primary(): ... 块内的查询都读主库（如刚由其他请求写入、不能容忍副本延迟的数据）"""
+        self._local.primary_depth = getattr(self._local, 'primary_depth', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.primary_depth -= 1
+
+    def _mark_written(self):
+        """记录当前请求（或线程）写入过数据，之后的查询读主库"""
+        scope = getattr(self._local, 'scope', None)
+        if scope is not None:
+            scope.wrote = True
         else:
-            return self._create_single_connection()
+            self._local.last_write_at = time.monotonic()
+
+    def _pick_replica(self, scope):
+        """选择执行查询的副本，需要读主库或没有可用副本时返回None"""
+        if not self.replicas or getattr(self._local, 'primary_depth', 0):
+            return None
+        if scope is not None:
+            if scope.wrote or scope.transaction_depth:
+                return None
+            if scope.replica_conn is not None:
+                return scope.replica
+        elif time.monotonic() - getattr(self._local, 'last_write_at', float('-inf')) < self.config.DB_REPLICA_STICKY_SECONDS:
+            return None
+
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            self._replica_index = (self._replica_index + 1) % len(self.replicas)
+            replica = self.replicas[self._replica_index]
+            if replica.down_until <= now:
+                return replica
+        return None
+
+    def _mark_replica_down(self, replica, error):
+        replica.down_until = time.monotonic() + self.config.DB_REPLICA_RETRY_SECONDS
+        logger.warning(f"只读副本 {replica.name} 不可用，{self.config.DB_REPLICA_RETRY_SECONDS}秒内查询改读主库: {error}")
+
+    def in_transaction(self):
+        """当前线程是否处于事务中"""
+        scope = getattr(self._local, 'scope', None)
+        return scope is not None and scope.transaction_depth > 0
+
+    @contextlib.contextmanager
+    def _use_connection(self):
+        """取得执行SQL用的连接：请求作用域内使用作用域固定的连接，否则临时从连接池借出"""
+        scope = getattr(self._local, 'scope', None)
+        if scope is None:
+            with self.connection() as conn:
+                yield conn
+            return
+
+        if scope.conn is None:
+            if scope.transaction_depth:
+                # 不能换用新连接继续执行，否则后续写操作会脱离事务单独提交
+                raise pymysql.err.InterfaceError("事务中的数据库连接已断开")
+            scope.conn = self.connection_pool.acquire()
+        try:
+            yield scope.conn
+        except Exception as e:
+            if is_connection_error(e):
+                # 连接已断开，作用域内后续的调用重新借出连接（进行中的事务无法继续）
+                self.connection_pool.release(scope.conn, discard=True)
+                scope.conn = None
+            raise
     
-    def _create_single_connection(self):
-        """创建单个数据库连接"""
+    @contextlib.contextmanager
+    def _use_read_connection(self, sql):
+        """取得执行查询用的连接：可以读副本时使用副本连接，否则与写操作使用同一个主库连接"""
+        if not is_replica_safe(sql):
+            # 通过execute_query执行的写语句
+            self._mark_written()
+        scope = getattr(self._local, 'scope', None)
+        replica = self._pick_replica(scope) if is_replica_safe(sql) else None
+        if replica is None:
+            with self._use_connection() as conn:
+                yield conn
+            return
+
+        conn = scope.replica_conn if scope is not None else None
+        if conn is None:
+            try:
+                conn = replica.pool.acquire()
+            except Exception as e:
+                if not (is_connection_error(e) or isinstance(e, PoolTimeoutError)):
+                    raise
+                self._mark_replica_down(replica, e)
+                with self._use_connection() as conn:
+                    yield conn
+                return
+            if scope is not None:
+                scope.replica, scope.replica_conn = replica, conn
+
+        discard = False
+        try:
+            yield conn
+        except Exception as e:
+            discard = is_connection_error(e)
+            if discard:
+                self._mark_replica_down(replica, e)
+            raise
+        finally:
+            if scope is None:
+                replica.pool.release(conn, discard)
+            elif discard:
+                replica.pool.release(conn, discard=True)
+                scope.replica, scope.replica_conn = None, None
+
+    @contextlib.contextmanager
+    def _timed(self, sql, params=None, operation='query'):
+        """记录语句执行耗时（包括提交）和返回/影响行数到SQL执行统计，并按采样率写语句日志"""
+        timing = _Timing()
+        started = time.perf_counter()
+        try:
+            yield timing
+        except BaseException:
+            self.query_stats.record(sql, (time.perf_counter() - started) * 1000, timing.rows, error=True)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.query_stats.record(sql, elapsed_ms, timing.rows)
+        if sql_logger.isEnabledFor(logging.INFO) and (self.log_sample_rate >= 1 or random.random() < self.log_sample_rate):
+            sql_logger.info(json.dumps({
+                "operation": operation,
+                "sql": fingerprint(sql),
+                "params": self._log_params(sql, params),
+                "rows": timing.rows,
+                "ms": round(elapsed_ms, 3),
+                "endpoint": current_endpoint()
+            }, ensure_ascii=False, default=str))
+
+    def _log_params(self, sql, params):
+        """日志中记录的参数（截断、隐藏敏感值）"""
+        return summarize_params(sql, params, self.log_param_max_chars, self.log_max_params)
+
+    def _create_single_connection(self, host=None, port=None):
+        """创建单个数据库连接（默认连接主库）"""
         try:
             connection = pymysql.connect(
-                host=self.config.MYSQL_HOST,
+                host=host or self.config.MYSQL_HOST,
                 user=self.config.MYSQL_USER,
                 password=self.config.MYSQL_PASSWORD,
                 database=self.config.MYSQL_DB,
-                port=self.config.MYSQL_PORT,
+                port=port or self.config.MYSQL_PORT,
                 cursorclass=DictCursor,
                 charset='utf8mb4',
                 autocommit=True
@@ -78,60 +773,98 @@ class DatabaseManager:
             raise
     
     def execute_query(self, sql, params=None):
-        """执行查询语句"""
+        """执行查询语句（配置了只读副本时默认读副本）"""
         try:
-            with self.get_connection() as conn:
-                with conn.cursor() as cursor:
+            with self._use_read_connection(sql) as conn:
+                with conn.cursor() as cursor, self._timed(sql, params) as timing:
                     cursor.execute(sql, params or ())
                     result = cursor.fetchall()
+                    timing.rows = len(result)
                     return result
         except Exception as e:
-            logger.error(f"查询执行失败: {e}\nSQL: {sql}\n参数: {params}")
+            logger.error(f"查询执行失败: {e}\nSQL: {sql}\n参数: {self._log_params(sql, params)}")
             raise
     
     def execute_update(self, sql, params=None):
         """执行更新语句"""
+        self._mark_written()
         try:
-            with self.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    logger.info(f"执行SQL: {sql} 参数: {params}")
-                    rows_affected = cursor.execute(sql, params or ())
-                    conn.commit()
-                    logger.info(f"影响行数: {rows_affected}")
+            with self._use_connection() as conn:
+                with conn.cursor() as cursor, self._timed(sql, params, 'update') as timing:
+                    rows_affected = timing.rows = cursor.execute(sql, params or ())
+                    if not self.in_transaction():
+                        conn.commit()
                     return rows_affected
         except Exception as e:
-            logger.error(f"更新执行失败: {e}\nSQL: {sql}\n参数: {params}")
+            logger.error(f"更新执行失败: {e}\nSQL: {sql}\n参数: {self._log_params(sql, params)}")
             raise
 
     def execute_insert(self, sql, params=None):
         """执行插入语句并返回最后插入的ID"""
+        self._mark_written()
         try:
-            with self.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    logger.info(f"执行SQL: {sql} 参数: {params}")
-                    cursor.execute(sql, params or ())
-                    conn.commit()
+            with self._use_connection() as conn:
+                with conn.cursor() as cursor, self._timed(sql, params, 'insert') as timing:
+                    timing.rows = cursor.execute(sql, params or ())
+                    if not self.in_transaction():
+                        conn.commit()
                     last_id = cursor.lastrowid
-                    logger.info(f"插入成功，最后插入ID: {last_id}")
                     return last_id
         except Exception as e:
-            logger.error(f"插入执行失败: {e}\nSQL: {sql}\n参数: {params}")
+            logger.error(f"插入执行失败: {e}\nSQL: {sql}\n参数: {self._log_params(sql, params)}")
             raise
 
     def execute_many_update(self, sql, params_list):
         """批量执行更新语句"""
+        self._mark_written()
         try:
-            with self.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    logger.info(f"批量执行SQL: {sql} 参数数量: {len(params_list)}")
-                    rows_affected = cursor.executemany(sql, params_list)
-                    conn.commit()
-                    logger.info(f"批量影响行数: {rows_affected}")
+            with self._use_connection() as conn:
+                with conn.cursor() as cursor, self._timed(sql, params_list, 'executemany') as timing:
+                    rows_affected = timing.rows = cursor.executemany(sql, params_list)
+                    if not self.in_transaction():
+                        conn.commit()
                     return rows_affected
         except Exception as e:
             logger.error(f"批量更新执行失败: {e}\nSQL: {sql}\n参数数量: {len(params_list)}")
             raise
-    
+
+    def execute_bulk_insert(self, table, columns, rows, max_rows=None, max_bytes=None, ignore=False):
+        """
+        批量插入：每max_rows行或参数累计约max_bytes字节拼成一条 INSERT ... VALUES (...), (...) 语句，
+        所有分块在同一个事务中执行（已在事务中时并入该事务）
+        :param table: 表名（由代码给出，不能来自用户输入）
+        :param columns: 列名列表
+        :param rows: 每行为与columns顺序一致的值序列
+        :param ignore: 使用 INSERT IGNORE，跳过与唯一键重复的行
+        :return: 插入的行数
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        max_rows = max_rows or self.config.DB_BULK_INSERT_ROWS
+        max_bytes = max_bytes or self.config.DB_BULK_INSERT_MAX_KB * 1024
+        placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        prefix = f"INSERT {'IGNORE ' if ignore else ''}INTO {table} ({', '.join(columns)}) VALUES "
+
+        def chunks():
+            chunk, size = [], 0
+            for row in rows:
+                row_size = sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row)
+                if chunk and (len(chunk) >= max_rows or size + row_size > max_bytes):
+                    yield chunk
+                    chunk, size = [], 0
+                chunk.append(row)
+                size += row_size
+            if chunk:
+                yield chunk
+
+        inserted = 0
+        with self.transaction():
+            for chunk in chunks():
+                params = [value for row in chunk for value in row]
+                inserted += self.execute_update(prefix + ', '.join([placeholder] * len(chunk)), params)
+        return inserted
+
     def test_connection(self):
         """测试数据库连接"""
         try:
@@ -227,6 +960,10 @@ def create_tables():
             progressing_questions_id INT NOT NULL,
             input TEXT,
             output TEXT,
+            input_hash CHAR(64) NULL COMMENT '输入保存为文件时的sha256，input列只保留预览',
+            input_size INT DEFAULT 0,
+            output_hash CHAR(64) NULL COMMENT '输出保存为文件时的sha256，output列只保留预览',
+            output_size INT DEFAULT 0,
             is_example BOOLEAN DEFAULT FALSE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (progressing_questions_id) REFERENCES progressing_questions(progressing_questions_id) ON DELETE CASCADE
@@ -253,8 +990,15 @@ def init_database():
         # 测试连接
         result = db.test_connection()
         if result['status'] == 'success':
-            # 连接成功后创建表
+            # 预先建立连接池的最小连接数
+            db.connection_pool.warm_up()
+            # 连接成功后创建表，再执行未执行的迁移
             if create_tables():
+                if db.config.DB_AUTO_MIGRATE:
+                    from migrations import run_migrations
+                    executed = run_migrations()
+                    if executed:
+                        logger.info(f"已执行数据库迁移: {executed}")
                 logger.info("数据库初始化成功")
                 return True
             else:
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本
+执行 migrations 目录下尚未执行的迁移（应用启动时也会自动执行，见配置 DB_AUTO_MIGRATE）
+
+用法:
+    python migrate.py            执行全部未执行的迁移
+    python migrate.py --status   查看各迁移的执行情况
+    python migrate.py --to 3     只执行到版本0003
+"""
+
+import argparse
+import sys
+import os
+
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from migrations import migration_status, run_migrations
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="执行数据库迁移")
+    parser.add_argument('--status', action='store_true', help="查看各迁移的执行情况")
+    parser.add_argument('--to', type=int, default=None, help="只执行到该版本号（含）")
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            for migration in migration_status():
+                mark = '✅' if migration['applied'] else '⏳'
+                print(f"{mark} {migration['version']:04d}_{migration['name']}")
+            sys.exit(0)
+
+        print("开始执行数据库迁移...")
+        executed = run_migrations(args.to)
+        if executed:
+            print(f"\n🎉 已执行 {len(executed)} 个迁移: {', '.join(f'{version:04d}' for version in executed)}")
+        else:
+            print("\n数据库已是最新版本，无需迁移")
+    except Exception as e:
+        print(f"\n💥 数据库迁移失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+密码重置表的 contact_type 由枚举改为VARCHAR，以支持 'telenum' 联系方式（原 fix_table_enums.py）。
+按旧结构建立的表（没有这些列）跳过
+"""
+
+from database import db
+from migrations import column_names
+
+
+def upgrade():
+    if not {'contact_type', 'user_role'} <= column_names('password_reset_tokens'):
+        return
+    db.execute_update("""
+        ALTER TABLE password_reset_tokens
+        MODIFY COLUMN contact_type VARCHAR(20) NOT NULL COMMENT '联系方式类型：email或telenum',
+        MODIFY COLUMN user_role ENUM('student','teacher','admin') NOT NULL
+    """)
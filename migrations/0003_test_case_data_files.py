@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+为 progressing_questions_test_cases 表增加测试数据文件的元数据列，
+并把已有的较大测试输入/输出移到测试数据文件存储中，数据库中只保留预览（原 migrate_test_data_to_files.py）。
+文件的哈希方式、目录结构、内联上限和预览长度按本迁移编写时的约定固定在这里，不调用 services.testcase_store，
+之后修改文件存储的实现不会改变本迁移在新环境中的执行结果。存储目录仍取配置 TEST_DATA_DIR
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+
+from config import Config
+from database import db
+from migrations import add_column
+
+logger = logging.getLogger(__name__)
+
+# 超过该字节数的数据移到文件中
+INLINE_MAX_BYTES = 64 * 1024
+# 移到文件中的数据在数据库中保留的预览字符数
+PREVIEW_CHARS = 1000
+
+NEW_COLUMNS = [
+    ("input_hash", "CHAR(64) NULL COMMENT '输入保存为文件时的sha256，input列只保留预览'"),
+    ("input_size", "INT DEFAULT 0"),
+    ("output_hash", "CHAR(64) NULL COMMENT '输出保存为文件时的sha256，output列只保留预览'"),
+    ("output_size", "INT DEFAULT 0"),
+]
+
+
+def write_data_file(data_dir, data):
+    """按sha256保存为 <存储目录>/<哈希前两位>/<哈希>（不压缩），已存在时跳过，返回 (哈希值, 字节数)"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(data_dir, digest[:2], digest)
+    if os.path.exists(path) or os.path.exists(path + '.gz'):
+        return digest, len(data)
+
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return digest, len(data)
+
+
+def prepare_values(data_dir, input_text, output_text):
+    """整理测试用例的输入/输出列的值，超过内联上限的数据写入文件"""
+    values = {}
+    for field, text in (('input', input_text or ''), ('output', output_text or '')):
+        data = text.encode('utf-8')
+        if len(data) > INLINE_MAX_BYTES:
+            digest, size = write_data_file(data_dir, data)
+            values[field] = text[:PREVIEW_CHARS]
+            values[f'{field}_hash'] = digest
+            values[f'{field}_size'] = size
+        else:
+            values[field] = text
+            values[f'{field}_hash'] = None
+            values[f'{field}_size'] = len(data)
+    return values
+
+
+def move_large_test_cases(data_dir):
+    """把超过内联上限的测试数据写入文件存储"""
+    rows = db.execute_query("""
+        SELECT id
+        FROM progressing_questions_test_cases
+        WHERE (input_hash IS NULL AND LENGTH(input) > %s)
+           OR (output_hash IS NULL AND LENGTH(output) > %s)
+        ORDER BY id
+    """, (INLINE_MAX_BYTES, INLINE_MAX_BYTES))
+
+    # 逐个读取，避免一次把所有大数据读入内存
+    for row in rows:
+        test_case = db.execute_query(
+            "SELECT input, output FROM progressing_questions_test_cases WHERE id = %s", (row['id'],)
+        )[0]
+        values = prepare_values(data_dir, test_case['input'], test_case['output'])
+        db.execute_update("""
+            UPDATE progressing_questions_test_cases
+            SET input = %s, output = %s, input_hash = %s, input_size = %s, output_hash = %s, output_size = %s
+            WHERE id = %s
+        """, (values['input'], values['output'], values['input_hash'], values['input_size'],
+              values['output_hash'], values['output_size'], row['id']))
+
+    # 未迁移的数据也补上字节数
+    db.execute_update("""
+        UPDATE progressing_questions_test_cases
+        SET input_size = IFNULL(LENGTH(input), 0)
+        WHERE input_hash IS NULL
+    """)
+    db.execute_update("""
+        UPDATE progressing_questions_test_cases
+        SET output_size = IFNULL(LENGTH(output), 0)
+        WHERE output_hash IS NULL
+    """)
+    return len(rows)
+
+
+def upgrade():
+    for name, definition in NEW_COLUMNS:
+        add_column('progressing_questions_test_cases', name, definition)
+    data_dir = Config.TEST_DATA_DIR
+    os.makedirs(data_dir, mode=0o700, exist_ok=True)
+    moved = move_large_test_cases(data_dir)
+    logger.info(f"已迁移 {moved} 个测试用例的数据到 {data_dir}")
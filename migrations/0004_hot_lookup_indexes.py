@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+为热点查询的过滤、连接列建立索引：学生答案按 学生+作业+题目 查找，班级成员按班级查找，
+作业按教师/班级查找，登录、找回密码按用户名、手机号查找等。已有可用索引的跳过。
+用户名上建立唯一索引前先检查已有数据，存在重复用户名时列出重复项并中止迁移，需要先手动合并或改名
+"""
+
+from database import db
+from migrations import add_index, table_exists
+
+# 报错时最多列出的重复用户名个数
+MAX_LISTED_DUPLICATES = 20
+
+# (表名, 索引名, 列, 是否唯一)
+INDEXES = [
+    ('student_answers', 'idx_student_homework_question', ('student_id', 'homework_id', 'question_id'), False),
+    ('student_answers', 'idx_homework_question', ('homework_id', 'question_id'), False),
+    ('student_classes', 'idx_class_id', ('class_id',), False),
+    ('student_classes', 'idx_student_class', ('student_id', 'class_id'), False),
+    ('homework_assignments', 'idx_teacher_id', ('teacher_id',), False),
+    ('homework_assignments', 'idx_class_id', ('class_id',), False),
+    ('homework_questions', 'idx_homework_id', ('homework_id',), False),
+    ('programming_submissions', 'idx_student_homework_question', ('student_id', 'homework_id', 'question_id'), False),
+    ('student_zip_submissions', 'idx_student_homework_question', ('student_id', 'homework_id', 'question_id'), False),
+    ('students', 'uk_username', ('username',), True),
+    ('students', 'idx_telenum', ('telenum',), False),
+    ('teachers', 'uk_username', ('username',), True),
+    ('teachers', 'idx_telenum', ('telenum',), False),
+    ('password_reset_tokens', 'idx_username_role', ('username', 'user_role'), False),
+]
+
+
+def find_duplicates(table, columns):
+    """表中这些列上重复的值 [(值..., 行数), ...]，最多返回MAX_LISTED_DUPLICATES个"""
+    column_list = ', '.join(columns)
+    rows = db.execute_query(f"""
+        SELECT {column_list}, COUNT(*) AS row_count
+        FROM {table}
+        GROUP BY {column_list}
+        HAVING COUNT(*) > 1
+        ORDER BY row_count DESC
+        LIMIT {MAX_LISTED_DUPLICATES}
+    """)
+    return [tuple(row[column] for column in columns) + (row['row_count'],) for row in rows]
+
+
+def check_unique(table, name, columns):
+    """建立唯一索引前检查重复数据，有重复时抛出RuntimeError并列出重复的值"""
+    if not table_exists(table):
+        return
+    duplicates = find_duplicates(table, columns)
+    if not duplicates:
+        return
+    listed = '; '.join(
+        f"{', '.join(str(value) for value in duplicate[:-1])}（{duplicate[-1]}行）" for duplicate in duplicates
+    )
+    raise RuntimeError(
+        f"无法在 {table}({', '.join(columns)}) 上建立唯一索引 {name}：存在重复数据（最多列出{MAX_LISTED_DUPLICATES}个）：{listed}。"
+        f"请先合并或修改重复的记录，可用 SELECT {', '.join(columns)}, COUNT(*) FROM {table} "
+        f"GROUP BY {', '.join(columns)} HAVING COUNT(*) > 1 查看全部重复项，处理后重新运行迁移"
+    )
+
+
+def upgrade():
+    # 先检查全部唯一索引，避免建了一半普通索引后才发现重复数据
+    for table, name, columns, unique in INDEXES:
+        if unique:
+            check_unique(table, name, columns)
+    for table, name, columns, unique in INDEXES:
+        add_index(table, name, columns, unique)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+创建按（学生, 作业）维护的作业提交汇总表，并根据已有的学生答案回填。
+回填按建表时的统计口径直接写成 INSERT ... SELECT，不调用 services.submission_summary
+"""
+
+import logging
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade():
+    db.execute_update("""
+        CREATE TABLE IF NOT EXISTS homework_submission_summary (
+            student_id INT NOT NULL,
+            homework_id INT NOT NULL,
+            teacher_id INT NULL COMMENT '作业所属教师（冗余，便于按教师读取）',
+            submitted_questions INT NOT NULL DEFAULT 0 COMMENT '已提交（含已批改）题目数',
+            completed_questions INT NOT NULL DEFAULT 0 COMMENT '已批改或自动判为正确的题目数',
+            graded_questions INT NOT NULL DEFAULT 0 COMMENT '已批改题目数',
+            pending_questions INT NOT NULL DEFAULT 0 COMMENT '待批改（已提交且未得分）题目数',
+            last_submit_time DATETIME NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (student_id, homework_id),
+            INDEX idx_teacher_last_submit (teacher_id, last_submit_time)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    rows = db.execute_update("""
+        INSERT INTO homework_submission_summary
+        (student_id, homework_id, teacher_id, submitted_questions, completed_questions,
+         graded_questions, pending_questions, last_submit_time)
+        SELECT sa.student_id, sa.homework_id, ha.teacher_id,
+               COUNT(CASE WHEN sa.status IN ('submitted', 'graded') THEN 1 END),
+               COUNT(CASE WHEN (sa.status = 'graded') OR (sa.status = 'submitted' AND sa.is_correct = 1) THEN 1 END),
+               COUNT(CASE WHEN sa.status = 'graded' THEN 1 END),
+               COUNT(CASE WHEN sa.status = 'submitted' AND (sa.score IS NULL OR sa.score = 0) THEN 1 END),
+               MAX(CASE WHEN sa.status IN ('submitted', 'graded') THEN sa.last_attempt_at END)
+        FROM student_answers sa
+        JOIN homework_assignments ha ON sa.homework_id = ha.id
+        GROUP BY sa.student_id, sa.homework_id, ha.teacher_id
+        ON DUPLICATE KEY UPDATE
+            teacher_id = VALUES(teacher_id),
+            submitted_questions = VALUES(submitted_questions),
+            completed_questions = VALUES(completed_questions),
+            graded_questions = VALUES(graded_questions),
+            pending_questions = VALUES(pending_questions),
+            last_submit_time = VALUES(last_submit_time)
+    """)
+    logger.info(f"作业提交汇总回填完成，共 {rows} 行")
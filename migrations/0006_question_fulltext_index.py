@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+为三张题目表的 (title, description) 建立 ngram 分词的 FULLTEXT 索引，用于题库搜索。
+ngram 分词会丢弃包含停用词（如 a、i、is）的词元，英文搜索词几乎都会受影响，
+因此建索引时关闭停用词（该设置在建索引时生效，之后的增删改沿用）
+"""
+
+import logging
+
+from database import db
+from migrations import table_exists, table_indexes
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = 'ft_title_description'
+TABLES = ['progressing_questions', 'choice_questions', 'judgment_questions']
+
+
+def upgrade():
+    # 迁移在同一个连接上执行，会话变量对本迁移的所有语句生效，结束后恢复原值
+    original = db.execute_query("SELECT @@SESSION.innodb_ft_enable_stopword AS value")[0]['value']
+    db.execute_update("SET SESSION innodb_ft_enable_stopword = OFF")
+    try:
+        for table in TABLES:
+            if not table_exists(table):
+                logger.warning(f"表 {table} 不存在，跳过全文索引")
+                continue
+            if INDEX_NAME in table_indexes(table):
+                continue
+            db.execute_update(
+                f"ALTER TABLE {table} ADD FULLTEXT INDEX {INDEX_NAME} (title, description) WITH PARSER ngram"
+            )
+    finally:
+        db.execute_update("SET SESSION innodb_ft_enable_stopword = %s", (original,))
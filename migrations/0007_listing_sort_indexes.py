@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+为列表的排序键建立索引，游标分页按索引顺序从游标处继续读取：
+题目按创建时间倒序（InnoDB二级索引自带主键，即 创建时间+ID），学生按 状态+创建时间 倒序。
+教师按用户名排序使用 0004 中的 uk_username
+"""
+
+from migrations import add_index
+
+# (表名, 索引名, 列, 是否唯一)
+INDEXES = [
+    ('progressing_questions', 'idx_created_at', ('created_at',), False),
+    ('choice_questions', 'idx_created_at', ('created_at',), False),
+    ('judgment_questions', 'idx_created_at', ('created_at',), False),
+    ('students', 'idx_status_created_at', ('status', 'created_at'), False),
+]
+
+
+def upgrade():
+    for table, name, columns, unique in INDEXES:
+        add_index(table, name, columns, unique)
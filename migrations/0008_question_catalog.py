@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+创建三张题目表的窄投影 question_catalog（题目列表、筛选、计数、标题查询使用），并从题目表回填。
+回填直接从三张题目表 INSERT ... SELECT，不调用 services.question_catalog
+"""
+
+import logging
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# 题目表 -> (题型, 主键列)
+QUESTION_TABLES = {
+    'progressing_questions': ('progressing', 'progressing_questions_id'),
+    'choice_questions': ('choice', 'choice_questions_id'),
+    'judgment_questions': ('judgment', 'judgment_questions_id'),
+}
+
+
+def upgrade():
+    db.execute_update("""
+        CREATE TABLE IF NOT EXISTS question_catalog (
+            question_type VARCHAR(20) NOT NULL COMMENT '题型：progressing/choice/judgment',
+            question_id INT NOT NULL COMMENT '题目表中的ID',
+            title VARCHAR(500) NOT NULL COMMENT '与题目表的列宽一致，严格模式下投影不会因超长失败',
+            language VARCHAR(50) NULL,
+            difficulty VARCHAR(20) NULL,
+            knowledge_points VARCHAR(500) NULL,
+            created_at DATETIME NULL,
+            PRIMARY KEY (question_type, question_id),
+            INDEX idx_question_id (question_id),
+            INDEX idx_created (created_at, question_type, question_id),
+            INDEX idx_type_created (question_type, created_at, question_id),
+            INDEX idx_language_created (language, created_at),
+            INDEX idx_difficulty_created (difficulty, created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    rows = 0
+    for table, (question_type, id_column) in QUESTION_TABLES.items():
+        rows += db.execute_update(f"""
+            INSERT INTO question_catalog
+            (question_type, question_id, title, language, difficulty, knowledge_points, created_at)
+            SELECT '{question_type}', {id_column}, title, language, difficulty, LEFT(knowledge_points, 500), created_at
+            FROM {table}
+            ON DUPLICATE KEY UPDATE
+                title = VALUES(title),
+                language = VALUES(language),
+                difficulty = VALUES(difficulty),
+                knowledge_points = VALUES(knowledge_points),
+                created_at = VALUES(created_at)
+        """)
+    logger.info(f"题目目录回填完成，共 {rows} 道题目")
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+创建知识点标签字典 knowledge_tags 和题目标签表 question_tags，并拆分已有题目的知识点文本回填。
+标签名使用二进制排序规则，大小写、全半角不同的知识点作为不同的标签保存（筛选时不区分大小写）。
+回填使用本迁移中的知识点拆分规则（建表时 services.question_tags 的规则），不调用该模块
+"""
+
+import logging
+import re
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+TAG_SEPARATORS = re.compile(r'[,，、;；]')
+TAG_MAX_CHARS = 50
+
+
+def parse_knowledge_points(text):
+    names = []
+    for part in TAG_SEPARATORS.split(text or ''):
+        name = ' '.join(part.split())[:TAG_MAX_CHARS]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def backfill_question_tags():
+    """拆分题目目录中已有的知识点文本，写入标签字典和题目标签"""
+    questions = db.execute_query("""
+        SELECT question_type, question_id, knowledge_points
+        FROM question_catalog
+        WHERE knowledge_points IS NOT NULL AND knowledge_points != ''
+    """)
+    parsed = [(question, parse_knowledge_points(question['knowledge_points'])) for question in questions]
+    names = sorted({name for _, question_names in parsed for name in question_names})
+    if not names:
+        return 0
+
+    db.execute_bulk_insert('knowledge_tags', ['name'], [(name,) for name in names], ignore=True)
+    tag_ids = {row['name']: row['tag_id'] for row in db.execute_query("SELECT tag_id, name FROM knowledge_tags")}
+    return db.execute_bulk_insert('question_tags', ['tag_id', 'question_type', 'question_id'], [
+        (tag_ids[name], question['question_type'], question['question_id'])
+        for question, question_names in parsed for name in question_names if name in tag_ids
+    ], ignore=True)
+
+
+def upgrade():
+    db.execute_update("""
+        CREATE TABLE IF NOT EXISTS knowledge_tags (
+            tag_id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uk_name (name)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    db.execute_update("""
+        CREATE TABLE IF NOT EXISTS question_tags (
+            tag_id INT NOT NULL,
+            question_type VARCHAR(20) NOT NULL COMMENT '题型：progressing/choice/judgment',
+            question_id INT NOT NULL,
+            PRIMARY KEY (tag_id, question_type, question_id),
+            INDEX idx_question (question_type, question_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    rows = backfill_question_tags()
+    logger.info(f"题目标签回填完成，共 {rows} 个标签")
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+创建判题任务表：判题服务在提交、开始和结束时写入任务状态，
+多进程部署时查询任务的请求落到其他进程上也能读到任务状态和最终结果
+"""
+
+from database import db
+
+
+def upgrade():
+    db.execute_update("""
+        CREATE TABLE IF NOT EXISTS judge_jobs (
+            job_id CHAR(32) PRIMARY KEY,
+            task VARCHAR(20) NOT NULL,
+            owner INT NULL COMMENT '提交任务的学生',
+            status VARCHAR(20) NOT NULL,
+            result MEDIUMTEXT NULL COMMENT '任务结果（JSON）',
+            events MEDIUMTEXT NULL COMMENT '测试用例进度事件（JSON），任务结束时写入',
+            error TEXT NULL,
+            created_at DATETIME NOT NULL,
+            finished_at DATETIME NULL,
+            INDEX idx_finished_at (finished_at),
+            INDEX idx_created_at (created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
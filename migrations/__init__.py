@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+数据库迁移模块
+本目录下以版本号开头的模块（如 0001_password_reset_tokens.py）为一个迁移，模块中定义 upgrade() 函数。
+运行时按版本号依次执行尚未执行的迁移，并把已执行的版本记录在 schema_migrations 表中。
+MySQL的DDL语句会隐式提交，迁移无法整体回滚，因此迁移中的操作都写成可重复执行的形式
+（列、索引已存在时跳过），执行到一半失败时修复问题后重新运行即可
+"""
+
+import importlib
+import logging
+import os
+import re
+import time
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATION_PATTERN = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+# 多个进程同时启动时只允许一个执行迁移
+MIGRATION_LOCK = 'oljudge_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 300
+
+
+def discover_migrations():
+    """按版本号排序的迁移列表 [(版本号, 名称, 模块名), ...]"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_PATTERN.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), f"{__name__}.{filename[:-3]}"))
+    migrations.sort()
+    return migrations
+
+
+def ensure_migrations_table():
+    db.execute_update("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL,
+            duration_ms INT DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def applied_versions():
+    """已执行的迁移版本号集合"""
+    return {row['version'] for row in db.execute_query("SELECT version FROM schema_migrations")}
+
+
+def migration_status():
+    """各迁移的执行情况 [{version, name, applied}, ...]"""
+    with db.request_scope(), db.primary():
+        ensure_migrations_table()
+        applied = applied_versions()
+    return [
+        {"version": version, "name": name, "applied": version in applied}
+        for version, name, _ in discover_migrations()
+    ]
+
+
+def run_migrations(target=None):
+    """
+    执行尚未执行的迁移
+    :param target: 只执行到该版本号（含），默认执行全部
+    :return: 本次执行的迁移版本号列表
+    """
+    executed = []
+    # 同一个连接上加锁、执行迁移，查询都读主库
+    with db.request_scope(), db.primary():
+        locked = db.execute_query("SELECT GET_LOCK(%s, %s) AS locked", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if not locked or not locked[0]['locked']:
+            raise RuntimeError("等待其他进程执行数据库迁移超时")
+        try:
+            ensure_migrations_table()
+            applied = applied_versions()
+            for version, name, module_name in discover_migrations():
+                if version in applied or (target is not None and version > target):
+                    continue
+                logger.info(f"执行数据库迁移 {version:04d}_{name}")
+                started = time.perf_counter()
+                importlib.import_module(module_name).upgrade()
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                db.execute_update(
+                    "INSERT INTO schema_migrations (version, name, applied_at, duration_ms) VALUES (%s, %s, NOW(), %s)",
+                    (version, name, duration_ms)
+                )
+                executed.append(version)
+        finally:
+            db.execute_query("SELECT RELEASE_LOCK(%s) AS released", (MIGRATION_LOCK,))
+    return executed
+
+
+# ---- 迁移中使用的工具函数（均可重复执行） ----
+
+def table_exists(table):
+    return bool(db.execute_query("""
+        SELECT 1 FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,)))
+
+
+def column_names(table):
+    return {row['COLUMN_NAME'] for row in db.execute_query("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))}
+
+
+def add_column(table, name, definition):
+    """增加列，已存在时跳过"""
+    if name in column_names(table):
+        return False
+    db.execute_update(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    return True
+
+
+def table_indexes(table):
+    """表上的索引 {索引名: (列名元组, 是否唯一)}"""
+    indexes = {}
+    for row in db.execute_query("""
+        SELECT INDEX_NAME, COLUMN_NAME, NON_UNIQUE
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,)):
+        columns, unique = indexes.get(row['INDEX_NAME'], ((), not row['NON_UNIQUE']))
+        indexes[row['INDEX_NAME']] = (columns + (row['COLUMN_NAME'],), unique)
+    return indexes
+
+
+def add_index(table, name, columns, unique=False):
+    """
+    创建索引。表或列不存在、同名索引已存在，或已有可以同样用于查找的索引（普通索引：以这些列开头的索引；
+    唯一索引：相同列上的唯一索引）时跳过
+    :return: 是否创建了索引
+    """
+    if not table_exists(table):
+        logger.warning(f"表 {table} 不存在，跳过索引 {name}")
+        return False
+    columns = tuple(columns)
+    missing = set(columns) - column_names(table)
+    if missing:
+        logger.warning(f"表 {table} 没有列 {', '.join(sorted(missing))}，跳过索引 {name}")
+        return False
+    existing = table_indexes(table)
+    if name in existing:
+        return False
+    for index_columns, index_unique in existing.values():
+        if unique and index_unique and index_columns == columns:
+            return False
+        if not unique and index_columns[:len(columns)] == columns:
+            return False
+    db.execute_update(
+        f"ALTER TABLE {table} ADD {'UNIQUE ' if unique else ''}INDEX {name} ({', '.join(columns)})"
+    )
+    return True
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+编译产物缓存模块
+按 源代码 + 编译器 + 编译参数 的哈希值缓存C++可执行文件和Java的.class目录，
+相同代码重复运行时直接复用编译结果；缓存保存在本地磁盘，超过容量上限时按最近使用时间淘汰。
+缓存目录只有判题账号可以访问，条目写入时记录编译产物的sha256，命中时校验，不一致的条目删除后重新编译
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from config import Config
+from services import sandbox
+
+logger = logging.getLogger(__name__)
+
+# 条目中记录编译产物sha256的文件
+DIGEST_FILE = '.sha256'
+
+
+class BuildCache:
+    """编译产物缓存类
+
+    每个缓存条目是缓存目录下以哈希值命名的子目录，目录的修改时间记录最近一次使用时间。
+    多个判题工作进程共享同一个缓存目录：写入时先在临时目录编译，再整体重命名为条目目录。
+    缓存总大小在进程内按写入的条目累加，超过上限时才扫描缓存目录淘汰条目（扫描结果同时校正累加值）
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, compile_timeout=10):
+        self.cache_dir = cache_dir or Config.BUILD_CACHE_DIR
+        self.max_bytes = max_bytes or Config.BUILD_CACHE_MAX_MB * 1024 * 1024
+        self.compile_timeout = compile_timeout
+        self.min_evict_age = 60  # 最近60秒内使用过的条目不淘汰，避免删除正在运行的程序
+        self._size = None  # 缓存总大小（字节），第一次写入时扫描得到
+        self._scan_at = self.max_bytes  # 总大小超过该值时扫描淘汰
+        self._lock = threading.Lock()
+        sandbox.ensure_private_dir(self.cache_dir)
+
+    def make_key(self, source, compiler, flags=()):
+        """计算缓存键"""
+        digest = hashlib.sha256()
+        for part in [source, compiler, *flags]:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def _artifact_files(entry_dir):
+        """条目中的编译产物文件（相对路径，已排序，不含校验文件）"""
+        files = []
+        for root, _, names in os.walk(entry_dir):
+            for name in names:
+                path = os.path.relpath(os.path.join(root, name), entry_dir)
+                if path != DIGEST_FILE:
+                    files.append(path)
+        return sorted(files)
+
+    @classmethod
+    def _digest(cls, entry_dir):
+        """编译产物的sha256（包含文件的相对路径和内容）"""
+        digest = hashlib.sha256()
+        for path in cls._artifact_files(entry_dir):
+            digest.update(path.encode('utf-8'))
+            digest.update(b'\0')
+            with open(os.path.join(entry_dir, path), 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def _entry_size(entry_dir):
+        return sum(
+            os.path.getsize(os.path.join(root, f))
+            for root, _, files in os.walk(entry_dir) for f in files
+        )
+
+    def get(self, key):
+        """查找缓存条目，命中且校验通过时刷新使用时间并返回条目目录"""
+        entry_dir = os.path.join(self.cache_dir, key)
+        if not os.path.isdir(entry_dir):
+            return None
+        try:
+            with open(os.path.join(entry_dir, DIGEST_FILE), 'r', encoding='ascii') as f:
+                expected = f.read().strip()
+            valid = self._digest(entry_dir) == expected
+        except OSError:
+            valid = False
+        if not valid:
+            logger.warning(f"编译缓存条目校验失败，删除后重新编译: {key}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        try:
+            os.utime(entry_dir)
+        except OSError:
+            return None
+        return entry_dir
+
+    def put(self, key, build_dir):
+        """把编译好的目录放入缓存，返回条目目录"""
+        with open(os.path.join(build_dir, DIGEST_FILE), 'w', encoding='ascii') as f:
+            f.write(self._digest(build_dir))
+        size = self._entry_size(build_dir)
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            os.rename(build_dir, entry_dir)
+        except OSError:
+            # 其他进程已经写入了相同的条目
+            shutil.rmtree(build_dir, ignore_errors=True)
+            if not os.path.isdir(entry_dir):
+                raise
+            return entry_dir
+
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+            need_scan = self._size is None or self._size > self._scan_at
+        if need_scan:
+            self._evict()
+        return entry_dir
+
+    def _evict(self):
+        """扫描缓存目录校正总大小，超过上限时按最近使用时间从旧到新淘汰条目"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = self._entry_size(path)
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                # 其他进程正在淘汰该条目
+                continue
+            total += size
+
+        if total > self.max_bytes:
+            now = time.time()
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if now - mtime < self.min_evict_age:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                logger.info(f"编译缓存淘汰条目: {os.path.basename(path)}")
+
+        with self._lock:
+            self._size = total
+            # 最近使用的条目不能淘汰、仍超过上限时，再写入容量的十分之一后才重新扫描
+            self._scan_at = max(self.max_bytes, total + self.max_bytes // 10)
+
+    def _new_build_dir(self):
+        """在缓存目录下创建临时编译目录（与条目目录同一文件系统，保证重命名是原子操作）"""
+        return tempfile.mkdtemp(prefix='.build-', dir=self.cache_dir)
+
+    def compile_cpp(self, source, gpp_path='g++', flags=()):
+        """
+        编译C++代码，命中缓存时不再重复编译
+        :return: (可执行文件路径, 编译错误信息)，编译失败时路径为None
+        """
+        key = self.make_key(source, gpp_path, flags)
+        entry_dir = self.get(key)
+        if entry_dir:
+            return os.path.join(entry_dir, 'main'), ''
+
+        build_dir = self._new_build_dir()
+        try:
+            source_file = os.path.join(build_dir, 'main.cpp')
+            with open(source_file, 'w', encoding='utf-8') as f:
+                f.write(source)
+
+            compile_process = subprocess.run(
+                [gpp_path, source_file, '-o', os.path.join(build_dir, 'main'), *flags],
+                text=True,
+                capture_output=True,
+                timeout=self.compile_timeout
+            )
+            if compile_process.returncode != 0:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                return None, compile_process.stderr
+
+            os.unlink(source_file)
+            entry_dir = self.put(key, build_dir)
+            return os.path.join(entry_dir, 'main'), ''
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+
+    def compile_java(self, source, class_name, javac_path='javac', flags=()):
+        """
+        编译Java代码，命中缓存时不再重复编译
+        :return: (.class所在目录, 编译错误信息)，编译失败时目录为None
+        """
+        key = self.make_key(source, javac_path, [class_name, *flags])
+        entry_dir = self.get(key)
+        if entry_dir:
+            return entry_dir, ''
+
+        build_dir = self._new_build_dir()
+        try:
+            source_file = os.path.join(build_dir, f'{class_name}.java')
+            with open(source_file, 'w', encoding='utf-8') as f:
+                f.write(source)
+
+            compile_process = subprocess.run(
+                [javac_path, *flags, source_file],
+                text=True,
+                capture_output=True,
+                timeout=self.compile_timeout
+            )
+            if compile_process.returncode != 0:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                return None, compile_process.stderr
+
+            os.unlink(source_file)
+            return self.put(key, build_dir), ''
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+
+
+# 全局编译缓存实例
+build_cache = BuildCache()
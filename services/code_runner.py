@@ -0,0 +1,536 @@
+# -*- coding: utf-8 -*-
+"""
+代码执行引擎
+编译、运行学生代码并逐个比对测试用例，供判题工作进程调用
+本模块不依赖Flask和数据库，可以在独立进程中导入
+"""
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import zipfile
+
+from services import jvm_pool, output_checker, parallel_runner, python_forkserver, sandbox, testcase_store
+from services.build_cache import build_cache
+
+logger = logging.getLogger(__name__)
+
+def _run_test_cases(test_cases, run_test_case, on_test_result, stop_on_failure):
+    """并行执行测试用例，因提前结束而未执行的用例记为跳过"""
+    test_results = parallel_runner.run_test_cases(
+        test_cases, run_test_case, on_test_result, stop_on_failure=stop_on_failure
+    )
+    for i, test_case in enumerate(test_cases):
+        if test_results[i] is None:
+            test_results[i] = {
+                "input": test_case['input'],
+                "expected_output": test_case['output'],
+                "actual_output": "",
+                "passed": False,
+                "error": "前面的测试用例未通过，已跳过",
+                "verdict": "SKIPPED"
+            }
+    return test_results
+
+def _set_verdict(test_result, process, checker):
+    """根据沙箱运行结论和输出比对结果记录测试用例的判定（AC/WA/TLE/MLE/OLE/RE），返回是否通过"""
+    if process.verdict == sandbox.VERDICT_OK:
+        output_matched = checker.finish()
+        test_result["verdict"] = "AC" if output_matched else "WA"
+        if not output_matched and getattr(checker, 'message', ''):
+            test_result["error"] = checker.message
+        return output_matched
+
+    test_result["verdict"] = process.verdict
+    message = sandbox.VERDICT_MESSAGES[process.verdict]
+    test_result["error"] = f"{message}: {test_result['error']}" if test_result["error"] else message
+    return False
+
+def _run_error(process):
+    """没有测试用例时的运行错误信息"""
+    if process.verdict == sandbox.VERDICT_RE:
+        return process.stderr or "执行失败"
+    return sandbox.VERDICT_MESSAGES[process.verdict]
+
+def execute_code(code, language, test_cases, gpp_path='g++', on_test_result=None, stop_on_failure=False,
+                 compare_mode=None):
+    """
+    执行代码并返回结果
+    :param on_test_result: 可选回调，每个测试用例执行完成后以 (序号, 测试结果) 调用，用于流式推送判题进度
+    :param stop_on_failure: 为True时遇到第一个未通过的测试用例后跳过其余用例（用于正式提交）
+    :param compare_mode: 输出比对模式（见output_checker），默认取配置JUDGE_COMPARE_MODE
+    """
+    start_time = time.time()
+    result = {
+        "status": "success",
+        "execution_time": 0,
+        "output": "",
+        "error": "",
+        "test_results": []
+    }
+
+    # 配置了运行账号时，学生进程使用的脚本/编译产物副本所在的临时目录
+    stage_dir = None
+    try:
+        if language == 'python':
+            # Python代码执行
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+                f.write(code)
+                temp_file = f.name
+
+            try:
+                script_file, stage_dir = sandbox.stage_for_run_user(temp_file)
+                # 如果有测试用例，使用测试用例执行
+                if test_cases:
+                    def run_test_case(i, test_case):
+                        test_result = {
+                            "input": test_case['input'],
+                            "expected_output": test_case['output'],
+                            "actual_output": "",
+                            "passed": False,
+                            "error": ""
+                        }
+
+                        checker = None
+                        try:
+                            # 由fork服务器派生子进程执行Python代码，输出边读取边比对
+                            with testcase_store.open_test_case(test_case) as (input_data, expected_output):
+                                checker = output_checker.create_checker(expected_output, compare_mode, input_data)
+                                process = python_forkserver.run_python(
+                                    script_file, input_data, sandbox.SandboxLimits(timeout=10), checker
+                                )
+
+                                test_result["actual_output"] = process.stdout.strip()
+                                test_result["error"] = process.stderr.strip()
+
+                                test_result["passed"] = _set_verdict(test_result, process, checker)
+
+                        except Exception as e:
+                            test_result["error"] = str(e)
+                        finally:
+                            if checker is not None:
+                                checker.close()
+
+                        return test_result
+
+                    result["test_results"] = _run_test_cases(test_cases, run_test_case, on_test_result, stop_on_failure)
+                    all_passed = all(test_result["passed"] for test_result in result["test_results"])
+                    result["status"] = "success" if all_passed else "partial"
+                else:
+                    # 没有测试用例，直接执行
+                    process = python_forkserver.run_python(script_file, limits=sandbox.SandboxLimits(timeout=10))
+
+                    if process.verdict == sandbox.VERDICT_OK:
+                        result["output"] = process.stdout
+                    else:
+                        result["error"] = _run_error(process)
+
+            finally:
+                # 清理临时文件
+                try:
+                    os.unlink(temp_file)
+                except:
+                    pass
+
+        elif language == 'cpp':
+            # C++代码执行，相同代码直接复用缓存的编译结果
+            executable_file, compile_stderr = build_cache.compile_cpp(code, gpp_path)
+
+            if executable_file is None:
+                result["status"] = "error"
+                # 处理不同的编译错误类型
+                stderr = compile_stderr.strip()
+                if not stderr:
+                    stderr = "编译失败，可能是语法错误或头文件缺失"
+
+                result["error"] = stderr
+
+                # 添加编译错误特殊处理
+                if "g++: command not found" in stderr or "系统找不到指定的文件" in stderr:
+                    result["error"] = f"编译器未找到: {stderr}\n\n💡 解决方案:\n1. 设置环境变量GPP_PATH指向g++.exe的完整路径\n2. 或者安装GCC编译器到标准位置\n3. 或者使用Python语言代替C++"
+                elif "undefined reference" in stderr:
+                    result["error"] = f"链接错误: {stderr}\n\n💡 调试建议:\n• 检查是否包含了所有必要的头文件\n• 确认函数名称和参数是否正确"
+                elif "expected" in stderr or "syntax error" in stderr.lower():
+                    result["error"] = f"语法错误: {stderr}\n\n💡 调试建议:\n• 检查语法格式是否正确\n• 确认分号、括号是否匹配\n• 查看变量声明是否完整"
+                elif "cannot open include file" in stderr.lower():
+                    result["error"] = f"头文件错误: {stderr}\n\n💡 调试建议:\n• 检查include语句的拼写\n• 确认系统已安装标准库"
+                else:
+                    result["error"] = f"编译错误: {stderr}"
+            else:
+                executable_file, stage_dir = sandbox.stage_for_run_user(executable_file)
+                # 如果有测试用例，使用测试用例执行
+                if test_cases:
+                    def run_test_case(i, test_case):
+                        test_result = {
+                            "input": test_case['input'],
+                            "expected_output": test_case['output'],
+                            "actual_output": "",
+                            "passed": False,
+                            "error": ""
+                        }
+
+                        checker = None
+                        try:
+                            # 在沙箱中执行编译后的程序，输出边读取边比对
+                            with testcase_store.open_test_case(test_case) as (input_data, expected_output):
+                                checker = output_checker.create_checker(expected_output, compare_mode, input_data)
+                                process = sandbox.run(
+                                    [executable_file], input_data, sandbox.SandboxLimits(timeout=10), checker=checker
+                                )
+
+                                test_result["actual_output"] = process.stdout.strip()
+                                test_result["error"] = process.stderr.strip()
+
+                                test_result["passed"] = _set_verdict(test_result, process, checker)
+
+                        except Exception as e:
+                            test_result["error"] = str(e)
+                        finally:
+                            if checker is not None:
+                                checker.close()
+
+                        return test_result
+
+                    result["test_results"] = _run_test_cases(test_cases, run_test_case, on_test_result, stop_on_failure)
+                    all_passed = all(test_result["passed"] for test_result in result["test_results"])
+                    result["status"] = "success" if all_passed else "partial"
+                else:
+                    # 没有测试用例，直接执行
+                    process = sandbox.run([executable_file], limits=sandbox.SandboxLimits(timeout=10))
+
+                    if process.verdict == sandbox.VERDICT_OK:
+                        result["output"] = process.stdout
+                    else:
+                        result["error"] = _run_error(process)
+
+        elif language == 'java':
+            # Java代码执行
+            # 提取类名（从类定义中提取）
+            class_name = None
+            class_pattern = r'public\s+class\s+(\w+)'
+            match = re.search(class_pattern, code)
+            if match:
+                class_name = match.group(1)
+            else:
+                result["status"] = "error"
+                result["error"] = "无法识别Java类名，请确保代码包含 public class ClassName"
+                # 为编译错误创建空的测试结果
+                if test_cases:
+                    result["test_results"] = []
+                    for test_case in test_cases:
+                        result["test_results"].append({
+                            "input": test_case['input'],
+                            "expected_output": test_case['output'],
+                            "actual_output": "",
+                            "passed": False,
+                            "error": result["error"]
+                        })
+                return result
+
+            # 移除BOM字符以避免编译错误
+            if code.startswith('\ufeff'):
+                code = code[1:]
+                logger.info(f"检测并移除了Java代码的BOM字符")
+
+            # 编译Java代码，相同代码直接复用缓存的.class目录
+            class_dir, compile_stderr = build_cache.compile_java(code, class_name)
+
+            if class_dir is None:
+                result["status"] = "error"
+                # 优化编译错误信息
+                stderr = compile_stderr.strip()
+                if not stderr:
+                    stderr = "编译失败，可能是语法错误或头文件缺失"
+
+                # 处理不同的编译错误类型
+                if "g++: command not found" in stderr or "系统找不到指定的文件" in stderr:
+                    result["error"] = f"编译器未找到\n解决方法:\n1. 检查JAVA_HOME环境变量设置\n2. 确认javac命令是否在PATH路径中\n3. 或者使用其他编程语言测试"
+                elif "expected" in stderr or "syntax error" in stderr.lower() or ";" in stderr.lower():
+                    result["error"] = f"语法错误\n调试建议:\n• 检查分号是否完整\n• 确认括号是否匹配\n• 验证变量名称是否正确\n\n错误详情:\n{stderr}"
+                elif "cannot find symbol" in stderr.lower():
+                    result["error"] = f"符号未找到\n调试建议:\n• 检查变量是否已声明\n• 确认方法名是否正确\n• 验证导入的包是否存在\n\n错误详情:\n{stderr}"
+                elif "class" in stderr.lower() and "is public" in stderr.lower():
+                    result["error"] = f"类名错误\n调试建议:\n• 确保类的声明为public class ClassName格式\n• 检查类名是否与文件名匹配\n\n错误详情:\n{stderr}"
+                else:
+                    result["error"] = f"编译错误\n{stderr}"
+
+                # 为编译错误创建测试结果，显示哪些测试用例无法执行
+                if test_cases:
+                    result["test_results"] = []
+                    for i, test_case in enumerate(test_cases):
+                        result["test_results"].append({
+                            "input": test_case['input'],
+                            "expected_output": test_case['output'],
+                            "actual_output": "",
+                            "passed": False,
+                            "error": "编译失败，无法执行测试用例"
+                        })
+                return result
+
+            class_dir, stage_dir = sandbox.stage_for_run_user(class_dir)
+            # 如果有测试用例，使用测试用例执行
+            if test_cases:
+                def run_test_case(i, test_case):
+                    test_result = {
+                        "input": test_case['input'],
+                        "expected_output": test_case['output'],
+                        "actual_output": "",
+                        "passed": False,
+                        "error": "",
+                        "test_case_index": i + 1
+                    }
+
+                    checker = None
+                    try:
+                        # 在常驻JVM中执行Java程序，输出交给比对器逐段比对
+                        with testcase_store.open_test_case(test_case) as (input_data, expected_output):
+                            checker = output_checker.create_checker(expected_output, compare_mode, input_data)
+                            process = jvm_pool.run_java(
+                                class_dir, class_name, input_data,
+                                sandbox.SandboxLimits(timeout=10, limit_address_space=False), checker=checker
+                            )
+                            test_result["passed"] = _set_verdict(test_result, process, checker)
+                            expected_length = len(expected_output)
+
+                        test_result["actual_output"] = process.stdout.strip()
+                        stderr_output = process.stderr.strip()
+                        actual = test_result["actual_output"]
+                        if not test_result["passed"] and process.verdict in (sandbox.VERDICT_OK, sandbox.VERDICT_RE):
+                            # 增强错误信息（比对失败被提前结束的进程返回码也非零，按输出不匹配处理）
+                            if process.verdict == sandbox.VERDICT_RE:
+                                if stderr_output:
+                                    test_result["error"] = f"运行时错误: {stderr_output}"
+                                else:
+                                    test_result["error"] = "程序执行失败，返回码非零"
+                            elif not getattr(checker, 'message', ''):
+                                test_result["error"] = "输出结果不匹配"
+                                # 显示具体的差异
+                                if len(actual) > 100 or expected_length > 100:
+                                    test_result["error"] += f"\n实际输出长度: {len(actual)} 字符\n期望输出长度: {expected_length} 字节"
+                                else:
+                                    # 突出显示差异的建议
+                                    test_result["error"] += "\n可能原因: 多余/缺少的空格、空行或换行符"
+
+                    except Exception as e:
+                        test_result["error"] = f"执行异常: {str(e)}"
+                    finally:
+                        if checker is not None:
+                            checker.close()
+
+                    return test_result
+
+                result["test_results"] = _run_test_cases(test_cases, run_test_case, on_test_result, stop_on_failure)
+                failed_tests_count = sum(1 for test_result in result["test_results"] if not test_result["passed"])
+                all_passed = failed_tests_count == 0
+                result["status"] = "success" if all_passed else ("error" if failed_tests_count == len(test_cases) else "partial")
+
+                # 添加失败测试用例的汇总信息
+                if not all_passed:
+                    result["error"] = f"部分测试用例失败 ({failed_tests_count}/{len(test_cases)} 个失败)\n请查看下方详细的测试用例结果"
+            else:
+                # 没有测试用例，直接执行
+                process = jvm_pool.run_java(class_dir, class_name, limits=sandbox.SandboxLimits(timeout=10, limit_address_space=False))
+
+                if process.verdict == sandbox.VERDICT_OK:
+                    result["output"] = process.stdout
+                else:
+                    result["error"] = _run_error(process)
+                    result["status"] = "error"
+        else:
+            result["status"] = "error"
+            result["error"] = f"不支持的编程语言: {language}"
+
+    except subprocess.TimeoutExpired:
+        result["status"] = "error"
+        result["error"] = "代码执行超时"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"执行错误: {str(e)}"
+    finally:
+        if stage_dir:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+
+    # 计算执行时间
+    result["execution_time"] = int((time.time() - start_time) * 1000)  # 毫秒
+
+    return result
+
+def _extract_zip_file(zip_file_path, extract_to):
+    """解压zip文件到指定目录"""
+    try:
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            zip_ref.extractall(extract_to)
+        return True, "解压成功"
+    except zipfile.BadZipFile:
+        return False, "无效的zip文件格式"
+    except Exception as e:
+        return False, f"解压失败: {str(e)}"
+
+def _find_code_files(extract_path, language):
+    """在解压目录中查找代码文件"""
+    code_files = []
+
+    # 定义不同语言的文件扩展名映射
+    language_extensions = {
+        'python': ['.py', '.PY'],
+        'cpp': ['.cpp', '.cc', '.cxx', '.c++', '.CPP', '.CC'],
+        'java': ['.java', '.JAVA']
+    }
+
+    try:
+        # 遍历所有文件
+        for root, dirs, files in os.walk(extract_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                _, ext = os.path.splitext(file)
+
+                # 检查文件扩展名是否匹配
+                if ext in language_extensions.get(language, []):
+                    # 获取文件的相对路径（相对于解压根目录）
+                    relative_path = os.path.relpath(file_path, extract_path)
+                    code_files.append({
+                        'path': file_path,
+                        'relative_path': relative_path,
+                        'filename': file,
+                        'extension': ext
+                    })
+
+        return code_files
+    except Exception as e:
+        logger.error(f"查找代码文件失败: {e}")
+        return []
+
+def _validate_code_files(code_files, language):
+    """验证找到的代码文件"""
+    if not code_files:
+        return False, "未找到任何代码文件"
+
+    if language == 'java':
+        # Java必须有且只有一个类文件作为主入口
+        main_classes = []
+        for file_info in code_files:
+            try:
+                with open(file_info['path'], 'r', encoding='utf-8') as f:
+                    content = f.read()
+                    # 查找public class声明
+                    match = re.search(r'public\s+class\s+(\w+)', content)
+                    if match:
+                        class_name = match.group(1)
+                        # 验证类名是否与文件名匹配
+                        expected_filename = f"{class_name}.java"
+                        if file_info['filename'] != expected_filename:
+                            return False, f"Java类名 {class_name} 与文件名 {file_info['filename']} 不匹配"
+                        main_classes.append(file_info)
+            except Exception as e:
+                return False, f"读取文件 {file_info['filename']} 失败: {str(e)}"
+
+        if len(main_classes) != 1:
+            return False, f"Java项目应有且只有一个public主类，找到 {len(main_classes)} 个"
+
+    return True, "代码文件验证通过"
+
+def _load_code_from_files(code_files, language):
+    """从代码文件中读取代码内容"""
+    try:
+        if language == 'java':
+            # Java只读取主类文件
+            for file_info in code_files:
+                with open(file_info['path'], 'r', encoding='utf-8') as f:
+                    content = f.read()
+                # 查找是否包含main方法，一定要是主类才读取
+                if 'public static void main' in content or 'void main(' in content:
+                    return content
+            return ""
+
+        elif language in ['python', 'cpp']:
+            # Python和C++可以有多个文件，这里读取第一个文件
+            # 实际项目中可能需要更复杂的处理，如处理多个文件
+            if code_files:
+                with open(code_files[0]['path'], 'r', encoding='utf-8') as f:
+                    return f.read()
+
+        return ""
+    except Exception as e:
+        logger.error(f"读取代码文件失败: {e}")
+        return ""
+
+
+def execute_zip_code(zip_file_path, language, test_cases, gpp_path='g++', on_test_result=None, stop_on_failure=False,
+                     compare_mode=None):
+    """从ZIP文件中提取代码并执行，返回执行结果"""
+
+    # 结果模板
+    result = {
+        "status": "error",
+        "execution_time": 0,
+        "output": "",
+        "error": "",
+        "test_results": [],
+        "extracted_code": "",
+        "files_found": [],
+        "validation_message": ""
+    }
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            # 1. 解压zip文件
+            extract_path = os.path.join(temp_dir, 'extracted')
+            os.makedirs(extract_path)
+            success, message = _extract_zip_file(zip_file_path, extract_path)
+
+            if not success:
+                result["error"] = message
+                return result
+
+            # 2. 查找代码文件
+            code_files = _find_code_files(extract_path, language)
+            result["files_found"] = [
+                {
+                    "filename": f["filename"],
+                    "path": f["relative_path"],
+                    "extension": f["extension"]
+                }
+                for f in code_files
+            ]
+
+            # 3. 验证代码文件
+            valid, message = _validate_code_files(code_files, language)
+            result["validation_message"] = message
+
+            if not valid:
+                result["error"] = message
+                result["status"] = "error"
+                return result
+
+            # 4. 读取代码内容
+            code_content = _load_code_from_files(code_files, language)
+            if not code_content:
+                result["error"] = "无法读取代码内容"
+                return result
+
+            result["extracted_code"] = code_content
+
+            # 5. 使用代码执行引擎运行代码
+            execution_result = execute_code(
+                code_content, language, test_cases, gpp_path, on_test_result, stop_on_failure, compare_mode
+            )
+
+            # 6. 合并结果
+            result.update({
+                "status": execution_result["status"],
+                "execution_time": execution_result["execution_time"],
+                "output": execution_result.get("output", ""),
+                "error": execution_result.get("error", ""),
+                "test_results": execution_result.get("test_results", [])
+            })
+
+            return result
+
+        except Exception as e:
+            logger.error(f"执行ZIP代码失败: {e}")
+            result["error"] = f"执行失败: {str(e)}"
+            return result
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+判题服务模块
+维护一组常驻的判题工作进程，Web请求只负责把评测任务放入本地队列并返回任务ID，
+编译和运行学生代码都在工作进程中完成，不再占用Flask请求线程。
+每个测试用例的判定结果以事件形式记录在任务上，供轮询和SSE接口逐条推送。
+任务状态同时写入数据库的 judge_jobs 表：多进程部署（如gunicorn多worker）时，查询请求落到其他进程上也能从数据库
+读到任务的状态和最终结果；逐个测试用例的进度事件只在任务完成时写入，实时进度仍需要查询请求落到提交任务的进程上
+"""
+
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from config import Config
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_FINISHED = 'finished'
+JOB_FAILED = 'failed'
+
+# 从数据库读取其他进程的任务时，轮询任务状态的间隔（秒）
+JOB_STORE_POLL_INTERVAL = 0.5
+# 清理数据库中过期任务的间隔（秒）
+JOB_STORE_PURGE_INTERVAL = 60
+
+# 项目根目录，工作进程以此为工作目录启动
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class JudgeWorkerError(Exception):
+    """工作进程通信失败（进程退出或返回了无法解析的数据）"""
+    pass
+
+
+class JudgeService:
+    """判题服务类
+
+    每个工作进程由一个调度线程负责：调度线程从本地队列取出任务，通过管道发给工作进程并等待结果。
+    任务登记表保存在当前进程内存中，并在提交、开始和结束时写入数据库；
+    查询的任务不在本进程中时从数据库读取（数据库不可用时只能查询本进程的任务）
+    """
+
+    def __init__(self, max_workers=None, job_ttl=None):
+        self.max_workers = max_workers or Config.JUDGE_WORKERS
+        self.job_ttl = job_ttl or Config.JUDGE_JOB_TTL  # 已完成任务的保留时间（秒）
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._dispatchers = []
+        self._lock = threading.Lock()
+        self._last_store_purge = 0
+
+    def _ensure_started(self):
+        """按需启动调度线程（首次提交任务时才创建，避免在导入阶段派生进程）"""
+        if self._dispatchers:
+            return
+        for index in range(self.max_workers):
+            thread = threading.Thread(target=self._dispatch_loop, name=f'judge-dispatcher-{index}', daemon=True)
+            thread.start()
+            self._dispatchers.append(thread)
+        logger.info(f"判题服务已启动，工作进程数: {self.max_workers}")
+
+    def _start_worker(self):
+        """启动一个常驻工作进程"""
+        return subprocess.Popen(
+            [sys.executable, '-m', 'services.judge_worker'],
+            cwd=PROJECT_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding='utf-8'
+        )
+
+    def _call_worker(self, worker, job, payload):
+        """把任务发给工作进程，记录进度事件并等待最终结果"""
+        try:
+            worker.stdin.write(json.dumps({'task': job['task'], 'payload': payload}) + '\n')
+            worker.stdin.flush()
+            while True:
+                line = worker.stdout.readline()
+                if not line:
+                    raise JudgeWorkerError("判题工作进程异常退出")
+                reply = json.loads(line)
+                if 'event' not in reply:
+                    break
+                self._add_event(job, reply)
+        except (OSError, ValueError) as e:
+            raise JudgeWorkerError(f"与判题工作进程通信失败: {e}")
+
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def _add_event(self, job, event):
+        """追加任务事件并唤醒等待中的请求"""
+        with job['changed']:
+            job['events'].append(event)
+            job['changed'].notify_all()
+
+    def _set_status(self, job, status):
+        """更新任务状态并唤醒等待中的请求，同时写入数据库"""
+        with job['changed']:
+            job['status'] = status
+            if status in (JOB_FINISHED, JOB_FAILED):
+                job['finished_at'] = time.time()
+            job['changed'].notify_all()
+
+        if status in (JOB_FINISHED, JOB_FAILED):
+            self._store("""
+                UPDATE judge_jobs SET status = %s, result = %s, events = %s, error = %s, finished_at = NOW()
+                WHERE job_id = %s
+            """, (status, json.dumps(job['result'], ensure_ascii=False, default=str),
+                  json.dumps(job['events'], ensure_ascii=False, default=str), job['error'], job['job_id']))
+        else:
+            self._store("UPDATE judge_jobs SET status = %s WHERE job_id = %s", (status, job['job_id']))
+
+    @staticmethod
+    def _store(sql, params):
+        """写入数据库中的任务登记表，失败只记录日志，不影响本进程内的评测和查询"""
+        try:
+            with db.detached():
+                db.execute_update(sql, params)
+        except Exception as e:
+            logger.warning(f"判题任务状态写入数据库失败: {e}")
+
+    def _dispatch_loop(self):
+        """调度线程主循环"""
+        worker = None
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+
+            self._set_status(job, JOB_RUNNING)
+            try:
+                if worker is None or worker.poll() is not None:
+                    worker = self._start_worker()
+
+                try:
+                    result = self._call_worker(worker, job, job.pop('payload'))
+                except JudgeWorkerError:
+                    # 工作进程状态不可信，直接替换
+                    worker.kill()
+                    worker = None
+                    raise
+
+                if job['on_complete']:
+                    callback_result = job['on_complete'](result)
+                    if callback_result is not None:
+                        result = callback_result
+                job['result'] = result
+                self._set_status(job, JOB_FINISHED)
+            except Exception as e:
+                logger.error(f"判题任务 {job_id} 执行失败: {e}")
+                job['error'] = str(e)
+                self._set_status(job, JOB_FAILED)
+
+        if worker is not None and worker.poll() is None:
+            worker.stdin.close()
+            worker.wait()
+
+    def submit(self, task, payload, owner=None, on_complete=None):
+        """
+        提交评测任务，立即返回任务ID
+        :param task: 任务类型（code/zip）
+        :param payload: 任务参数，必须可以被JSON序列化
+        :param owner: 任务所属用户，用于查询时校验权限
+        :param on_complete: 完成回调，在调度线程中以执行结果为参数调用，返回值（非None时）作为任务对外结果
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'task': task,
+            'payload': payload,
+            'owner': owner,
+            'status': JOB_QUEUED,
+            'result': None,
+            'error': '',
+            'created_at': time.time(),
+            'finished_at': None,
+            'on_complete': on_complete,
+            'events': [],
+            'changed': threading.Condition()
+        }
+
+        with self._lock:
+            self._purge_expired()
+            self._ensure_started()
+            self._jobs[job_id] = job
+
+        # 先登记到数据库再入队，保证之后的状态更新能找到这条记录
+        self._store("""
+            INSERT INTO judge_jobs (job_id, task, owner, status, created_at)
+            VALUES (%s, %s, %s, %s, NOW())
+        """, (job_id, task, owner, JOB_QUEUED))
+        self._queue.put(job_id)
+        self._purge_stored()
+        logger.info(f"判题任务已入队: {job_id} ({task})")
+        return job_id
+
+    def get_job(self, job_id, cursor=0, wait=0):
+        """
+        获取任务状态快照，任务不存在时返回None
+        :param cursor: 调用方已收到的事件数量，快照中只包含此后的新事件
+        :param wait: 没有新事件且任务未完成时最多等待的秒数（长轮询）
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return self._get_stored_job(job_id, cursor, wait)
+
+        with job['changed']:
+            if wait:
+                job['changed'].wait_for(
+                    lambda: len(job['events']) > cursor or job['status'] in (JOB_FINISHED, JOB_FAILED),
+                    timeout=wait
+                )
+            return {
+                'job_id': job['job_id'],
+                'task': job['task'],
+                'owner': job['owner'],
+                'status': job['status'],
+                'result': job['result'],
+                'error': job['error'],
+                'events': job['events'][cursor:],
+                'cursor': len(job['events'])
+            }
+
+    def _get_stored_job(self, job_id, cursor=0, wait=0):
+        """从数据库读取其他进程提交的任务，没有新事件且任务未完成时每隔一段时间重新读取，最多等待wait秒"""
+        deadline = time.monotonic() + wait
+        while True:
+            job = self._load_stored_job(job_id, cursor)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in (JOB_FINISHED, JOB_FAILED) or job['events'] or remaining <= 0:
+                return job
+            time.sleep(min(JOB_STORE_POLL_INTERVAL, remaining))
+
+    def _load_stored_job(self, job_id, cursor=0):
+        """读取数据库中的任务快照，任务不存在、已过期或数据库不可用时返回None"""
+        try:
+            # 任务状态由其他进程刚刚写入，读主库；每次读取临时借出连接，长轮询期间不占用连接
+            with db.detached(), db.primary():
+                rows = db.execute_query("""
+                    SELECT job_id, task, owner, status, result, events, error
+                    FROM judge_jobs
+                    WHERE job_id = %s AND (finished_at IS NULL OR finished_at > NOW() - INTERVAL %s SECOND)
+                """, (job_id, self.job_ttl))
+        except Exception as e:
+            logger.warning(f"从数据库读取判题任务失败: {e}")
+            return None
+        if not rows:
+            return None
+
+        row = rows[0]
+        events = json.loads(row['events']) if row['events'] else []
+        return {
+            'job_id': row['job_id'],
+            'task': row['task'],
+            'owner': row['owner'],
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'] or '',
+            'events': events[cursor:],
+            'cursor': len(events)
+        }
+
+    def _purge_expired(self):
+        """清理超过保留时间的已完成任务（调用方持有锁）"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and now - job['finished_at'] > self.job_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _purge_stored(self):
+        """每隔一段时间清理数据库中超过保留时间的任务"""
+        with self._lock:
+            now = time.time()
+            if now - self._last_store_purge < JOB_STORE_PURGE_INTERVAL:
+                return
+            self._last_store_purge = now
+        # 进程重启等原因一直没有完成的任务保留一天后清理
+        self._store("""
+            DELETE FROM judge_jobs
+            WHERE finished_at < NOW() - INTERVAL %s SECOND OR created_at < NOW() - INTERVAL 1 DAY
+        """, (self.job_ttl,))
+
+    def shutdown(self):
+        """停止调度线程并关闭工作进程"""
+        for _ in self._dispatchers:
+            self._queue.put(None)
+        for thread in self._dispatchers:
+            thread.join()
+        self._dispatchers = []
+
+
+# 全局判题服务实例
+judge_service = JudgeService()
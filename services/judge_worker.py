@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+判题工作进程
+由判题服务以 python -m services.judge_worker 方式启动并常驻，
+从标准输入逐行读取JSON格式的评测任务，执行过程中每完成一个测试用例写出一行进度事件，
+最后把结果按行写回标准输出
+"""
+
+import io
+import json
+import logging
+import os
+import sys
+
+from services import code_runner
+
+logger = logging.getLogger(__name__)
+
+
+def run_job(task, payload, on_test_result=None):
+    """根据任务类型调用代码执行引擎"""
+    if task == 'code':
+        return code_runner.execute_code(
+            payload['code'], payload['language'], payload['test_cases'], payload.get('gpp_path', 'g++'),
+            on_test_result, payload.get('stop_on_failure', False), payload.get('compare_mode')
+        )
+    elif task == 'zip':
+        # ZIP临时文件由请求线程创建，交给工作进程使用后负责删除
+        try:
+            return code_runner.execute_zip_code(
+                payload['zip_path'], payload['language'], payload['test_cases'], payload.get('gpp_path', 'g++'),
+                on_test_result, payload.get('stop_on_failure', False), payload.get('compare_mode')
+            )
+        finally:
+            try:
+                os.unlink(payload['zip_path'])
+            except OSError:
+                pass
+    raise ValueError(f"未知的判题任务类型: {task}")
+
+
+def main():
+    """工作进程主循环"""
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    # 标准输出专用于回传结果，其余打印内容一律重定向到标准错误，避免破坏通信协议
+    channel = io.open(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+
+    def emit_test_result(index, test_result):
+        channel.write(json.dumps({"event": "test_result", "index": index, "data": test_result}) + '\n')
+        channel.flush()
+
+    for line in requests:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            reply = {"result": run_job(request['task'], request['payload'], emit_test_result)}
+        except Exception as e:
+            logger.error(f"判题任务执行异常: {e}")
+            reply = {"error": str(e)}
+        channel.write(json.dumps(reply) + '\n')
+        channel.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+常驻JVM进程池
+预先启动若干运行 JudgeRunner 的JVM，每个测试用例在已启动的JVM中用独立的类加载器运行学生代码，
+省去每个用例300~600ms的JVM启动时间。JVM运行满一定次数、超时或出现任何异常时都会被回收，
+无法在常驻JVM中完成的运行（例如学生代码调用了System.exit）会退回到单独启动java进程执行。
+常驻JVM与单独运行的学生程序一样在沙箱中启动（rlimit、cgroup、seccomp、运行账号），
+工作目录是JVM独占的临时目录，每次运行结束后清空。
+JVM的标准输出指向 /dev/null，应答通过单独的管道返回，每次请求附带随机令牌，应答中的令牌不一致时视为通信失败，
+学生代码写 FileDescriptor.out 或打开应答管道都无法伪造判题结果。
+应答管道需要 /proc/self/fd，不支持的平台上始终单独启动java进程
+"""
+
+import logging
+import os
+import queue
+import secrets
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config
+from services import sandbox
+from services.build_cache import build_cache
+
+logger = logging.getLogger(__name__)
+
+RUNNER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jvm_runner', 'JudgeRunner.java')
+RUNNER_CLASS = 'JudgeRunner'
+
+JVM_POOL_SUPPORTED = sys.platform.startswith('linux')
+
+
+class JvmRunnerError(Exception):
+    """常驻JVM通信失败"""
+    pass
+
+
+def jvm_limits(max_runs=None):
+    """常驻JVM整个生命周期的沙箱限制：CPU时间按可运行次数累计，单次运行的超时由JudgeRunner判定"""
+    max_runs = max_runs or Config.JVM_MAX_RUNS
+    limits = sandbox.SandboxLimits(limit_address_space=False)
+    limits.timeout = limits.timeout * max_runs + 30  # 另留出JVM启动的时间
+    return limits
+
+
+class WarmJvm:
+    """一个常驻JVM进程"""
+
+    def __init__(self, java_path, runner_dir, limits=None):
+        limits = limits or jvm_limits()
+        self.run_dir = sandbox.prepare_run_dir(tempfile.mkdtemp(prefix='oljudge-jvm-'))
+        self.cgroup = sandbox.CgroupRun(limits)
+
+        def preexec():
+            self.cgroup.join()
+            sandbox.apply_limits(limits)
+
+        # 应答管道的写端只传给JVM（JudgeRunner按命令行参数中的描述符号打开），标准输出指向 /dev/null
+        self.channel = None
+        read_fd, write_fd = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                [java_path, f'-Xmx{limits.memory_mb}m', '-cp', runner_dir, RUNNER_CLASS, str(write_fd)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(write_fd,),
+                cwd=self.run_dir,
+                preexec_fn=preexec,
+                start_new_session=True
+            )
+        except BaseException:
+            os.close(read_fd)
+            self._cleanup()
+            raise
+        finally:
+            os.close(write_fd)
+        self.channel = os.fdopen(read_fd, 'rb')
+        self.runs = 0
+        if self.channel.readline() != b'READY\n':
+            self.kill()
+            raise JvmRunnerError("常驻JVM启动失败")
+
+    def run(self, class_dir, class_name, input_data, limits, checker=None):
+        """
+        在当前JVM中运行一次学生代码
+        :param checker: output_checker比对器，指定时标准输出分段交给它比对，结果的stdout只包含开头部分
+        :return: (sandbox.SandboxResult, 是否需要回收)
+        """
+        self.runs += 1
+        start = time.monotonic()
+        data = sandbox.as_bytes(input_data)
+        token = secrets.token_hex(16)
+        header = (
+            f"RUN\t{token}\t{class_dir}\t{class_name}\t{len(data)}\t"
+            f"{int(limits.timeout * 1000)}\t{limits.output_bytes}\n"
+        )
+
+        # JudgeRunner自己负责超时判定，这里的计时器只用于JVM失去响应时兜底
+        watchdog = threading.Timer(limits.timeout + 5, self.kill)
+        watchdog.start()
+        try:
+            self.process.stdin.write(header.encode('utf-8'))
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+            reply = self.channel.readline(4096).decode('utf-8').rstrip('\n')
+            if reply == f'TIMEOUT\t{token}':
+                elapsed_ms = int((time.monotonic() - start) * 1000)
+                return sandbox.SandboxResult(
+                    [class_name], -9, '', '', sandbox.VERDICT_TLE, elapsed_ms
+                ), True
+
+            parts = reply.split('\t')
+            if len(parts) != 7 or parts[0] != 'OK' or parts[1] != token:
+                raise JvmRunnerError(f"常驻JVM返回了无效的响应: {reply[:200]!r}")
+            returncode, out_len, err_len, recycle = (int(part) for part in parts[2:6])
+            # JudgeRunner在学生代码结束后才返回输出，读取和比对输出的时间不计入运行耗时
+            elapsed_ms = int((time.monotonic() - start) * 1000)
+            if checker is not None:
+                for chunk in self._read_chunks(out_len):
+                    checker.feed(chunk)
+                stdout = checker.preview
+            else:
+                stdout = self._read_exactly(out_len).decode('utf-8', errors='replace')
+            stderr = self._read_exactly(err_len).decode('utf-8', errors='replace')
+        except (OSError, ValueError) as e:
+            raise JvmRunnerError(f"与常驻JVM通信失败: {e}")
+        finally:
+            watchdog.cancel()
+
+        # 清空工作目录，学生程序写入的文件不会留给下一次运行；无法清空时回收JVM
+        if not self._clear_run_dir():
+            recycle = True
+
+        if parts[6] == 'OLE':
+            verdict = sandbox.VERDICT_OLE
+        elif parts[6] == 'MLE':
+            verdict = sandbox.VERDICT_MLE
+        else:
+            verdict = sandbox.VERDICT_RE if returncode != 0 else sandbox.VERDICT_OK
+        return sandbox.SandboxResult([class_name], returncode, stdout, stderr, verdict, elapsed_ms), bool(recycle)
+
+    def _clear_run_dir(self):
+        """删除工作目录中的全部文件，返回是否已清空"""
+        try:
+            for name in os.listdir(self.run_dir):
+                path = os.path.join(self.run_dir, name)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.unlink(path)
+            return not os.listdir(self.run_dir)
+        except OSError:
+            return False
+
+    def _read_exactly(self, size):
+        data = self.channel.read(size)
+        if len(data) != size:
+            raise JvmRunnerError("常驻JVM输出不完整")
+        return data
+
+    def _read_chunks(self, size, chunk_size=65536):
+        """分段读取指定字节数"""
+        while size > 0:
+            chunk = self._read_exactly(min(size, chunk_size))
+            size -= len(chunk)
+            yield chunk
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def kill(self):
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.cgroup.kill_all()
+        self.process.wait()
+        self._cleanup()
+
+    def _cleanup(self):
+        if self.run_dir is None:
+            return
+        if self.channel is not None:
+            self.channel.close()
+        self.cgroup.remove()
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+        self.run_dir = None
+
+
+class JvmPool:
+    """常驻JVM进程池类"""
+
+    def __init__(self, java_path='java', javac_path='javac', size=None, max_runs=None):
+        self.java_path = java_path
+        self.javac_path = javac_path
+        self.size = size or Config.JVM_POOL_SIZE
+        self.max_runs = max_runs or Config.JVM_MAX_RUNS
+        self._idle = queue.Queue()
+        self._total = 0
+        self._runner_dir = None
+        self._lock = threading.Lock()
+        self._compile_lock = threading.Lock()
+
+    def _get_runner_dir(self):
+        """编译JudgeRunner（借助编译缓存，只在第一次使用时编译）"""
+        with self._compile_lock:
+            if self._runner_dir is None:
+                with open(RUNNER_SOURCE, 'r', encoding='utf-8') as f:
+                    source = f.read()
+                runner_dir, compile_stderr = build_cache.compile_java(
+                    source, RUNNER_CLASS, javac_path=self.javac_path, flags=['-encoding', 'utf-8']
+                )
+                if runner_dir is None:
+                    raise JvmRunnerError(f"JudgeRunner编译失败: {compile_stderr}")
+                # 配置了运行账号时JVM无法读取编译缓存，使用只读副本（随进程池一直保留）
+                self._runner_dir, _ = sandbox.stage_for_run_user(runner_dir)
+            return self._runner_dir
+
+    def prestart(self):
+        """在后台把进程池启动到满员"""
+        with self._lock:
+            count = self.size - self._total
+            self._total += count
+        for _ in range(count):
+            threading.Thread(target=self._replace, daemon=True).start()
+
+    def _acquire(self):
+        """取出一个空闲JVM，没有空闲JVM且未达到上限时启动新的JVM"""
+        while True:
+            with self._lock:
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+                start_new = self._total < self.size
+                if start_new:
+                    self._total += 1
+
+            if start_new:
+                try:
+                    return WarmJvm(self.java_path, self._get_runner_dir(), jvm_limits(self.max_runs))
+                except Exception:
+                    with self._lock:
+                        self._total -= 1
+                    raise
+
+            # 等待其他请求归还JVM或后台补充完成（补充失败时会释放名额，需要重新检查）
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def _release(self, jvm, recycle):
+        """归还JVM，需要回收时销毁并在后台补充一个新的JVM"""
+        if not recycle and jvm.alive() and jvm.runs < self.max_runs:
+            self._idle.put(jvm)
+            return
+
+        jvm.kill()
+        threading.Thread(target=self._replace, daemon=True).start()
+
+    def _replace(self):
+        try:
+            self._idle.put(WarmJvm(self.java_path, self._get_runner_dir(), jvm_limits(self.max_runs)))
+        except Exception as e:
+            logger.error(f"补充常驻JVM失败: {e}")
+            with self._lock:
+                self._total -= 1
+
+    def run(self, class_dir, class_name, input_data='', limits=None, checker=None):
+        """
+        运行已编译的Java程序
+        :return: sandbox.SandboxResult
+        """
+        limits = limits or sandbox.SandboxLimits(limit_address_space=False)
+        try:
+            jvm = self._acquire()
+        except Exception as e:
+            logger.warning(f"常驻JVM不可用，改为单独启动java进程: {e}")
+            return run_cold(self.java_path, class_dir, class_name, input_data, limits, checker)
+
+        recycle = True
+        try:
+            result, recycle = jvm.run(class_dir, class_name, input_data, limits, checker)
+        except JvmRunnerError as e:
+            # 学生代码调用了System.exit或JVM崩溃，改为单独启动java进程重新运行
+            logger.info(f"常驻JVM运行失败，改为单独启动java进程: {e}")
+            if checker is not None:
+                checker.reset()
+            return run_cold(self.java_path, class_dir, class_name, input_data, limits, checker)
+        finally:
+            self._release(jvm, recycle)
+
+        return result
+
+
+def run_cold(java_path, class_dir, class_name, input_data='', limits=None, checker=None):
+    """单独启动java进程在沙箱中运行（堆内存用-Xmx限制）"""
+    limits = limits or sandbox.SandboxLimits(limit_address_space=False)
+    limits.limit_address_space = False
+    return sandbox.run(
+        [java_path, f'-Xmx{limits.memory_mb}m', '-cp', class_dir, class_name],
+        input_data, limits, checker=checker
+    )
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_jvm_pool(java_path='java', javac_path='javac'):
+    """按JDK路径获取（必要时创建）常驻JVM进程池"""
+    with _pools_lock:
+        key = (java_path, javac_path)
+        if key not in _pools:
+            _pools[key] = JvmPool(java_path, javac_path)
+            _pools[key].prestart()
+        return _pools[key]
+
+
+def run_java(class_dir, class_name, input_data='', limits=None, java_path='java', javac_path='javac', checker=None):
+    """运行已编译的Java程序，配置关闭常驻JVM时单独启动java进程"""
+    if not Config.JVM_POOL_ENABLED or not JVM_POOL_SUPPORTED:
+        return run_cold(java_path, class_dir, class_name, input_data, limits, checker)
+    return get_jvm_pool(java_path, javac_path).run(class_dir, class_name, input_data, limits, checker)
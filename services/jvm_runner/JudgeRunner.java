@@ -0,0 +1,222 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Paths;
+import java.util.Properties;
+
+/**
+ * 常驻JVM判题执行器
+ *
+ * 由 services/jvm_pool.py 启动，命令行参数是应答管道的文件描述符号。标准输出指向 /dev/null，
+ * 应答只写入这个单独的管道，学生代码写 FileDescriptor.out 无法伪造应答。启动完成后应答 READY，之后循环读取请求：
+ *   RUN\t<令牌>\t<class目录>\t<类名>\t<输入字节数>\t<超时毫秒>\t<输出字节上限>\n<输入内容>
+ * 每次请求用独立的类加载器加载学生代码并调用main方法，System.in/out/err 重定向到内存缓冲区，
+ * 运行结束后恢复学生代码修改过的系统属性，返回：
+ *   OK\t<令牌>\t<退出码>\t<输出字节数>\t<错误输出字节数>\t<是否需要回收>\t<OK|MLE|OLE>\n<输出内容><错误输出内容>
+ * 或在超时后返回 TIMEOUT\t<令牌> 并退出进程。令牌由 jvm_pool.py 每次随机生成，应答中的令牌不一致时视为通信失败
+ */
+public class JudgeRunner {
+
+    /** 标准错误只保留开头部分 */
+    private static final int STDERR_LIMIT = 64 * 1024;
+
+    /** 学生程序输出超过上限时抛出，终止学生代码的执行 */
+    private static class OutputLimitExceeded extends Error {
+        OutputLimitExceeded() {
+            super("输出超出限制", null, false, false);
+        }
+    }
+
+    /** 有容量上限的输出缓冲区 */
+    private static class LimitedOutputStream extends ByteArrayOutputStream {
+        private final int limit;
+        private final boolean failOnOverflow;
+        volatile boolean exceeded;
+
+        LimitedOutputStream(int limit, boolean failOnOverflow) {
+            this.limit = limit;
+            this.failOnOverflow = failOnOverflow;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            write(new byte[]{(byte) b}, 0, 1);
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            if (count + len > limit) {
+                exceeded = true;
+                super.write(b, off, Math.max(0, limit - count));
+                if (failOnOverflow) {
+                    throw new OutputLimitExceeded();
+                }
+                return;
+            }
+            super.write(b, off, len);
+        }
+    }
+
+    public static void main(String[] args) throws Exception {
+        DataInputStream requests = new DataInputStream(new BufferedInputStream(new FileInputStream(FileDescriptor.in)));
+        OutputStream channel = new BufferedOutputStream(new FileOutputStream("/proc/self/fd/" + Integer.parseInt(args[0])));
+        PrintStream originalErr = System.err;
+
+        writeLine(channel, "READY");
+        channel.flush();
+
+        while (true) {
+            String header = readLine(requests);
+            if (header == null) {
+                return;
+            }
+            String[] parts = header.split("\t");
+            if (parts.length != 7 || !parts[0].equals("RUN")) {
+                originalErr.println("无效的请求: " + header);
+                return;
+            }
+
+            byte[] input = new byte[Integer.parseInt(parts[4])];
+            requests.readFully(input);
+            run(channel, parts[1], parts[2], parts[3], input, Long.parseLong(parts[5]), Integer.parseInt(parts[6]));
+        }
+    }
+
+    private static void run(OutputStream channel, String token, String classDir, String className, byte[] input,
+                            long timeoutMillis, int outputLimit) throws Exception {
+        LimitedOutputStream out = new LimitedOutputStream(outputLimit, true);
+        LimitedOutputStream err = new LimitedOutputStream(STDERR_LIMIT, false);
+        PrintStream outStream = new PrintStream(out, true, "UTF-8");
+        PrintStream errStream = new PrintStream(err, true, "UTF-8");
+        InputStream originalIn = System.in;
+        PrintStream originalOut = System.out;
+        PrintStream originalErr = System.err;
+        Properties originalProperties = (Properties) System.getProperties().clone();
+        int[] exitCode = {0};
+        boolean[] outOfMemory = {false};
+
+        URLClassLoader loader = new URLClassLoader(
+                new URL[]{Paths.get(classDir).toUri().toURL()}, ClassLoader.getPlatformClassLoader());
+        ThreadGroup group = new ThreadGroup("student-" + className);
+        Thread mainThread = new Thread(group, () -> {
+            try {
+                Class<?> mainClass = Class.forName(className, true, loader);
+                Method mainMethod = mainClass.getMethod("main", String[].class);
+                mainMethod.invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                exitCode[0] = 1;
+                if (e.getCause() instanceof OutputLimitExceeded) {
+                    return;
+                }
+                outOfMemory[0] = e.getCause() instanceof OutOfMemoryError;
+                errStream.print("Exception in thread \"main\" ");
+                e.getCause().printStackTrace(errStream);
+            } catch (OutputLimitExceeded e) {
+                exitCode[0] = 1;
+            } catch (Throwable e) {
+                outOfMemory[0] = e instanceof OutOfMemoryError;
+                errStream.print("Error: ");
+                e.printStackTrace(errStream);
+                exitCode[0] = 1;
+            }
+        }, "main");
+        mainThread.setContextClassLoader(loader);
+
+        System.setIn(new ByteArrayInputStream(input));
+        System.setOut(outStream);
+        System.setErr(errStream);
+        long deadline = System.currentTimeMillis() + timeoutMillis;
+        boolean finished;
+        boolean recycle = false;
+        try {
+            mainThread.start();
+            finished = joinUntil(mainThread, deadline);
+            // 与普通JVM一致：等待学生代码创建的非守护线程全部结束
+            Thread[] threads = new Thread[group.activeCount() + 8];
+            int count = group.enumerate(threads);
+            for (int i = 0; finished && i < count; i++) {
+                if (!threads[i].isDaemon()) {
+                    finished = joinUntil(threads[i], deadline);
+                }
+                recycle = true;
+            }
+        } finally {
+            try {
+                System.out.flush();
+            } catch (OutputLimitExceeded ignored) {
+                // 超出部分已丢弃
+            }
+            System.setIn(originalIn);
+            System.setOut(originalOut);
+            System.setErr(originalErr);
+            System.setProperties(originalProperties);
+        }
+
+        if (!finished) {
+            // 无法安全地停止学生线程，直接退出进程，由进程池启动新的JVM
+            writeLine(channel, "TIMEOUT\t" + token);
+            channel.flush();
+            System.exit(0);
+        }
+
+        try {
+            loader.close();
+        } catch (Exception ignored) {
+            recycle = true;
+        }
+
+        String status = "OK";
+        if (out.exceeded) {
+            status = "OLE";
+        } else if (outOfMemory[0]) {
+            // 堆内存耗尽后JVM状态不可信，回收
+            status = "MLE";
+            recycle = true;
+        }
+
+        byte[] outBytes = out.toByteArray();
+        byte[] errBytes = err.toByteArray();
+        writeLine(channel, "OK\t" + token + "\t" + exitCode[0] + "\t" + outBytes.length + "\t" + errBytes.length + "\t"
+                + (recycle ? 1 : 0) + "\t" + status);
+        channel.write(outBytes);
+        channel.write(errBytes);
+        channel.flush();
+    }
+
+    private static boolean joinUntil(Thread thread, long deadline) throws InterruptedException {
+        long remaining = deadline - System.currentTimeMillis();
+        if (remaining > 0) {
+            thread.join(remaining);
+        }
+        return !thread.isAlive();
+    }
+
+    private static String readLine(InputStream in) throws Exception {
+        ByteArrayOutputStream line = new ByteArrayOutputStream();
+        int b;
+        while ((b = in.read()) != '\n') {
+            if (b == -1) {
+                return line.size() == 0 ? null : line.toString("UTF-8");
+            }
+            line.write(b);
+        }
+        return line.toString("UTF-8");
+    }
+
+    private static void writeLine(OutputStream channel, String line) throws Exception {
+        channel.write((line + "\n").getBytes(StandardCharsets.UTF_8));
+    }
+}
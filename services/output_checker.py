@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+输出比对模块
+学生程序的标准输出按块流式送入比对器，与期望输出逐字节或逐词比较，发现第一处不一致后立即判定失败，
+调用方可以据此提前结束学生程序；比对过程中只保留开头一小段输出用于页面展示，不会把全部输出读入内存。
+每块输出整体切片比较或用 bytes.split() 拆分后按列表比较，不在Python中逐字节循环；
+比对耗费的时间记在 busy_seconds 中，调用方计算墙钟超时时扣除（读取线程比对期间学生程序可能因管道写满而等待）
+支持的比对模式：
+    exact       精确比对（忽略首尾空白，与原先 strip() 后比较一致）
+    whitespace  忽略空白差异，逐词比较
+    float       逐词比较，数值按误差容限比较
+    checker     调用自定义检查程序（testlib约定：checker <输入文件> <输出文件> <答案文件>，退出码0表示通过）
+"""
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+from config import Config
+from services import sandbox
+
+logger = logging.getLogger(__name__)
+
+COMPARE_EXACT = 'exact'
+COMPARE_WHITESPACE = 'whitespace'
+COMPARE_FLOAT = 'float'
+COMPARE_CHECKER = 'checker'
+
+WHITESPACE = b' \t\n\r\x0b\x0c'
+TOKEN_PATTERN = re.compile(rb'[^ \t\n\r\x0b\x0c]+')
+WHITESPACE_PATTERN = re.compile(rb'[ \t\n\r\x0b\x0c]')
+
+# 逐词比对时每次从期望输出中切分的字节数
+EXPECTED_BLOCK = 64 * 1024
+
+# 保留用于展示的输出长度
+PREVIEW_BYTES = 64 * 1024
+
+
+class OutputChecker:
+    """比对器基类"""
+
+    def reset(self):
+        """清除已送入的输出，重新开始比对（退回其他方式重新运行时调用）"""
+        self.failed = False
+        self.busy_seconds = 0.0  # 比对已耗费的时间
+        self._preview = []
+        self._preview_size = 0
+
+    def feed(self, chunk):
+        """送入一段输出，返回是否仍可能通过（返回False时调用方可以停止读取）"""
+        started = time.perf_counter()
+        if self._preview_size < PREVIEW_BYTES:
+            self._preview.append(chunk[:PREVIEW_BYTES - self._preview_size])
+            self._preview_size += len(self._preview[-1])
+        if not self.failed:
+            self._feed(chunk)
+        self.busy_seconds += time.perf_counter() - started
+        return not self.failed
+
+    def _feed(self, chunk):
+        raise NotImplementedError
+
+    def finish(self):
+        """输出结束，返回是否通过"""
+        if not self.failed:
+            self.failed = not self._finish()
+        return not self.failed
+
+    def _finish(self):
+        raise NotImplementedError
+
+    @property
+    def preview(self):
+        """输出开头部分（用于展示）"""
+        return b''.join(self._preview).decode('utf-8', errors='replace')
+
+    def close(self):
+        """释放比对器占用的资源"""
+        pass
+
+
+class ExactChecker(OutputChecker):
+    """精确比对：忽略输出首尾空白，其余内容必须与期望输出完全一致
+
+    每段输出去掉末尾空白后整体与期望输出的对应位置比较，末尾的空白先暂存，
+    遇到后续非空白字符时再比较；输出结束时暂存的空白视为结尾空白被忽略。
+    期望输出可以是mmap，只按位置切片比较，不复制整个内容
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        start, end = 0, len(expected)
+        while start < end and expected[start] in WHITESPACE:
+            start += 1
+        while end > start and expected[end - 1] in WHITESPACE:
+            end -= 1
+        self._start, self._end = start, end
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self._pos = self._start
+        self._started = False
+        self._pending = bytearray()
+        self._pending_overflow = False
+
+    def _compare(self, data):
+        """与期望输出当前位置的内容比较，一致时前移"""
+        end = self._pos + len(data)
+        if end > self._end or self.expected[self._pos:end] != data:
+            self.failed = True
+            return False
+        self._pos = end
+        return True
+
+    def _feed(self, chunk):
+        if not self._started:
+            chunk = chunk.lstrip(WHITESPACE)
+            if not chunk:
+                return
+            self._started = True
+
+        body = chunk.rstrip(WHITESPACE)
+        if body:
+            # 暂存的空白后面还有内容，不是结尾空白
+            if self._pending_overflow:
+                self.failed = True
+                return
+            if self._pending and not self._compare(bytes(self._pending)):
+                return
+            self._pending.clear()
+            if not self._compare(body):
+                return
+
+        tail = len(chunk) - len(body)
+        if tail:
+            # 暂存的空白超过期望输出剩余长度时，只可能是结尾空白
+            if len(self._pending) + tail > self._end - self._pos:
+                self._pending_overflow = True
+            else:
+                self._pending += chunk[len(body):]
+
+    def _finish(self):
+        return self._pos == self._end
+
+
+class TokenChecker(OutputChecker):
+    """逐词比对：忽略空白差异；指定误差容限时，两个词都是数值则按容限比较
+
+    每段输出用 bytes.split() 拆分后与同样个数的期望词按列表比较，期望输出按块切分，不预先拆分整个文件；
+    输出末尾不完整的词留到下一段
+    """
+
+    def __init__(self, expected, float_tolerance=None):
+        self.expected = expected
+        self.float_tolerance = float_tolerance
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self._expected_pos = 0      # 期望输出中尚未切分的位置
+        self._expected_tokens = []  # 已切分、尚未比较的期望词
+        self._partial = b''
+
+    def _fill_expected(self, count):
+        """切分期望输出，直到缓存的期望词不少于count个或期望输出已切分完"""
+        length = len(self.expected)
+        while len(self._expected_tokens) < count and self._expected_pos < length:
+            end = min(self._expected_pos + EXPECTED_BLOCK, length)
+            if end < length:
+                # 在空白处切开，保证块内最后一个词是完整的
+                match = WHITESPACE_PATTERN.search(self.expected, end)
+                end = match.start() if match else length
+            self._expected_tokens += self.expected[self._expected_pos:end].split()
+            self._expected_pos = end
+
+    def _take_expected(self, count):
+        self._fill_expected(count)
+        tokens = self._expected_tokens[:count]
+        del self._expected_tokens[:count]
+        return tokens
+
+    def _feed(self, chunk):
+        data = self._partial + chunk if self._partial else chunk
+        tokens = data.split()
+        self._partial = b''
+        if tokens and data[-1] not in WHITESPACE:
+            self._partial = tokens.pop()
+            # 词的长度已超过期望的词，不可能匹配（浮点模式下数值写法可能不同，放宽到64字节）
+            self._fill_expected(len(tokens) + 1)
+            next_expected = self._expected_tokens[len(tokens)] if len(self._expected_tokens) > len(tokens) else b''
+            if len(self._partial) > max(len(next_expected), 64 if self.float_tolerance is not None else 0):
+                self.failed = True
+                return
+        if tokens and not self._match(tokens):
+            self.failed = True
+
+    def _match(self, tokens):
+        expected = self._take_expected(len(tokens))
+        if tokens == expected:
+            return True
+        if self.float_tolerance is None or len(tokens) != len(expected):
+            return False
+        return all(token == expected_token or self._close(token, expected_token)
+                   for token, expected_token in zip(tokens, expected))
+
+    def _close(self, token, expected):
+        try:
+            actual_value, expected_value = float(token), float(expected)
+        except ValueError:
+            return False
+        diff = abs(actual_value - expected_value)
+        return diff <= self.float_tolerance or diff <= self.float_tolerance * abs(expected_value)
+
+    def _finish(self):
+        if self._partial and not self._match([self._partial]):
+            return False
+        return not self._expected_tokens and TOKEN_PATTERN.search(self.expected, self._expected_pos) is None
+
+
+class ProgramChecker(OutputChecker):
+    """调用自定义检查程序判定，输出先写入临时文件，不保存在内存中"""
+
+    def __init__(self, expected, checker_path, input_data=''):
+        self.checker_path = checker_path
+        self._dir = tempfile.mkdtemp(prefix='oljudge-check-')
+        self._input_file = os.path.join(self._dir, 'input.txt')
+        self._answer_file = os.path.join(self._dir, 'answer.txt')
+        self._output_file = os.path.join(self._dir, 'output.txt')
+        with open(self._input_file, 'wb') as f:
+            f.write(sandbox.as_bytes(input_data))
+        with open(self._answer_file, 'wb') as f:
+            f.write(expected)
+        self._output = None
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        if self._output is not None:
+            self._output.close()
+        self._output = open(self._output_file, 'wb')
+        self.message = ''
+
+    def _feed(self, chunk):
+        self._output.write(chunk)
+
+    def _finish(self):
+        self._output.close()
+        try:
+            process = subprocess.run(
+                [self.checker_path, self._input_file, self._output_file, self._answer_file],
+                capture_output=True,
+                text=True,
+                timeout=Config.JUDGE_CHECKER_TIMEOUT
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.error(f"自定义检查程序运行失败: {e}")
+            self.message = f"检查程序运行失败: {e}"
+            return False
+        self.message = (process.stderr or process.stdout).strip()
+        return process.returncode == 0
+
+    def close(self):
+        if not self._output.closed:
+            self._output.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def create_checker(expected, mode=None, input_data='', checker_path=None, float_tolerance=None):
+    """
+    按比对模式创建比对器
+    :param expected: 期望输出（字符串或bytes、mmap等字节对象）
+    :param mode: 比对模式，默认取配置JUDGE_COMPARE_MODE
+    :param input_data: 测试输入（自定义检查程序需要）
+    """
+    mode = mode or Config.JUDGE_COMPARE_MODE
+    expected = sandbox.as_bytes(expected)
+    if mode == COMPARE_WHITESPACE:
+        return TokenChecker(expected)
+    if mode == COMPARE_FLOAT:
+        tolerance = float_tolerance if float_tolerance is not None else Config.JUDGE_FLOAT_TOLERANCE
+        return TokenChecker(expected, tolerance)
+    if mode == COMPARE_CHECKER:
+        checker_path = checker_path or Config.JUDGE_CHECKER_PATH
+        if not checker_path:
+            raise ValueError("未配置自定义检查程序（JUDGE_CHECKER_PATH）")
+        return ProgramChecker(expected, checker_path, input_data)
+    return ExactChecker(expected)
+
+
+def compare(actual, expected, mode=None, input_data=''):
+    """比对已经得到的完整输出（字符串），返回是否通过"""
+    checker = create_checker(expected, mode, input_data)
+    try:
+        checker.feed((actual or '').encode('utf-8'))
+        return checker.finish()
+    finally:
+        checker.close()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+测试用例并行执行模块
+同一次评测的多个测试用例在线程中并行运行（实际负载在子进程中，线程只负责等待），
+单次评测的并发数和整台机器的CPU核预算分别受配置限制，结果按测试用例原有顺序返回
+"""
+
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class CoreBudget:
+    """跨进程的CPU核预算
+
+    每个核对应锁目录下的一个槽位文件，运行测试用例前必须锁住其中一个槽位。
+    所有判题工作进程和Web进程共享同一个锁目录，因此同时运行的测试用例总数不会超过预算；
+    进程异常退出时操作系统会自动释放它持有的文件锁
+    """
+
+    def __init__(self, slots=None, lock_dir=None):
+        self.slots = slots or Config.JUDGE_CORE_BUDGET
+        self.lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), 'oljudge_core_slots')
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _try_lock(self, index):
+        """尝试锁住指定槽位，成功时返回文件描述符"""
+        fd = os.open(os.path.join(self.lock_dir, f'slot-{index}.lock'), os.O_RDWR | os.O_CREAT)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return fd
+        except OSError:
+            os.close(fd)
+            return None
+
+    def _unlock(self, fd):
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def slot(self):
+        """占用一个CPU核槽位，没有空闲槽位时等待"""
+        fd = None
+        while fd is None:
+            # 从随机位置开始尝试，减少多个进程争抢同一个槽位
+            start = random.randrange(self.slots)
+            for offset in range(self.slots):
+                fd = self._try_lock((start + offset) % self.slots)
+                if fd is not None:
+                    break
+            else:
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            self._unlock(fd)
+
+
+# 全局CPU核预算实例
+core_budget = CoreBudget()
+
+
+def run_test_cases(test_cases, run_one, on_test_result=None, max_parallel=None, stop_on_failure=False):
+    """
+    并行执行测试用例
+    :param run_one: 执行单个测试用例的函数，以 (序号, 测试用例) 调用，返回包含passed字段的测试结果（可以为None表示跳过）
+    :param on_test_result: 可选回调，每个测试用例完成后以 (序号, 测试结果) 调用，调用之间互斥
+    :param max_parallel: 本次评测的最大并发数，默认取配置JUDGE_TEST_CONCURRENCY
+    :param stop_on_failure: 为True时出现第一个未通过的用例后不再启动新的用例
+    :return: 与test_cases顺序一致的结果列表，因提前结束而未执行的用例对应None
+    """
+    results = [None] * len(test_cases)
+    if not test_cases:
+        return results
+
+    max_parallel = min(max_parallel or Config.JUDGE_TEST_CONCURRENCY, len(test_cases))
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = iter(range(len(test_cases)))
+    errors = []
+
+    def next_index():
+        with lock:
+            if stop.is_set():
+                return None
+            return next(pending, None)
+
+    def worker():
+        while True:
+            # 先占到CPU核再领取用例，保证用例按顺序启动
+            try:
+                with core_budget.slot():
+                    i = next_index()
+                    if i is None:
+                        return
+                    test_result = run_one(i, test_cases[i])
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+                return
+
+            results[i] = test_result
+            if test_result is None:
+                continue
+            with lock:
+                if on_test_result:
+                    on_test_result(i, test_result)
+                if stop_on_failure and not test_result.get('passed'):
+                    stop.set()
+
+    if max_parallel == 1:
+        worker()
+    else:
+        threads = [
+            threading.Thread(target=worker, name=f'test-case-runner-{index}', daemon=True)
+            for index in range(max_parallel)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
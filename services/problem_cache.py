@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+编程题缓存模块
+在进程内按 progressing_questions_id 缓存编程题基本信息和测试用例，学生运行、提交代码时不必每次查询数据库。
+缓存容量有上限，超出时淘汰最久未使用的题目；题目被编辑、删除或重新导入时由相应的接口主动失效，
+另设有效期兜底，多进程部署时其他进程中的缓存最迟在有效期后刷新。
+每个题目记有失效代数，失效时加一；查询数据库期间题目被失效的，查到的旧数据不写入缓存
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from config import Config
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+class ProblemCache:
+    """编程题LRU缓存类"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or Config.PROBLEM_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else Config.PROBLEM_CACHE_TTL
+        self._entries = collections.OrderedDict()
+        self._generations = {}  # 题目ID -> 失效次数（只记录失效过的题目）
+        self._epoch = 0         # clear()次数
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, problem_id):
+        """
+        获取编程题信息和测试用例
+        :return: {"problem": {progressing_questions_id, title}, "test_cases": [...]}，题目不存在或ID无效时返回None
+        """
+        try:
+            problem_id = int(problem_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            entry = self._entries.get(problem_id)
+            if entry is not None and time.monotonic() - entry['loaded_at'] < self.ttl:
+                self._entries.move_to_end(problem_id)
+                self.hits += 1
+                return self._copy(entry)
+            self.misses += 1
+            generation = self._generation(problem_id)
+
+        entry = self._load(problem_id)
+        if entry is None:
+            return None
+
+        with self._lock:
+            # 查询期间题目被修改（已失效）时不缓存本次查到的数据，下次查询重新读取
+            if self._generation(problem_id) == generation:
+                self._entries[problem_id] = entry
+                self._entries.move_to_end(problem_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return self._copy(entry)
+
+    def _generation(self, problem_id):
+        """题目当前的失效代数（调用方持有锁）"""
+        return self._epoch, self._generations.get(problem_id, 0)
+
+    @staticmethod
+    def _load(problem_id):
+        # 缓存失效后的第一次读取通常发生在修改题目之后的另一个请求中，不受写后读主库的保护，
+        # 读副本可能把修改前的测试用例重新缓存整个有效期，因此始终读主库
+        with db.primary():
+            problem = db.execute_query("""
+                SELECT pq.progressing_questions_id, pq.title
+                FROM progressing_questions pq
+                WHERE pq.progressing_questions_id = %s
+            """, (problem_id,))
+            if not problem:
+                return None
+
+            # 保存为文件的数据只缓存哈希值，由判题进程直接映射文件读取
+            test_cases = db.execute_query("""
+                SELECT input, output, input_hash, output_hash, is_example
+                FROM progressing_questions_test_cases
+                WHERE progressing_questions_id = %s
+                ORDER BY id
+            """, (problem_id,))
+        return {'problem': problem[0], 'test_cases': list(test_cases), 'loaded_at': time.monotonic()}
+
+    @staticmethod
+    def _copy(entry):
+        """返回副本，调用方修改结果不会影响缓存"""
+        return {
+            'problem': dict(entry['problem']),
+            'test_cases': [dict(test_case) for test_case in entry['test_cases']]
+        }
+
+    def invalidate(self, problem_id):
+        """题目被修改或删除后使缓存失效"""
+        try:
+            problem_id = int(problem_id)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._entries.pop(problem_id, None)
+            self._generations[problem_id] = self._generations.get(problem_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def stats(self):
+        """缓存命中统计"""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# 全局编程题缓存实例
+problem_cache = ProblemCache()
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Python代码fork服务器
+判题工作进程启动一个预先导入常用模块的单线程fork服务器（python -m services.python_forkserver），
+每个测试用例由服务器fork出干净的子进程运行学生代码，省去每次启动解释器和导入模块的时间。
+学生进程的标准输入输出通过Unix域套接字传递的管道直接连接到判题工作进程，
+子进程按沙箱限制设置资源上限并在独立的临时目录中运行，由监督进程负责墙钟超时。
+不支持fork的平台（Windows）自动退回到每个测试用例单独启动python进程
+"""
+
+import builtins
+import io
+import json
+import logging
+import os
+import select
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from config import Config
+from services import sandbox
+
+logger = logging.getLogger(__name__)
+
+# fork服务器启动时预先导入的模块，学生代码再导入时直接复用
+PRELOAD_MODULES = [
+    'math', 're', 'collections', 'itertools', 'functools', 'heapq', 'bisect', 'string',
+    'random', 'decimal', 'fractions', 'array', 'copy', 'operator', 'statistics', 'typing', 'datetime',
+]
+
+# 单次写入管道的字节数，不超过PIPE_BUF时写入不会阻塞
+_PIPE_BUF = getattr(select, 'PIPE_BUF', 512)
+
+# 当前平台是否支持fork服务器
+FORKSERVER_SUPPORTED = hasattr(os, 'fork') and hasattr(socket, 'send_fds')
+
+
+class ForkServerError(Exception):
+    """fork服务器不可用或通信失败"""
+    pass
+
+
+# ----------------------------------------------------------------------
+# 服务器端（在fork服务器进程中运行）
+# ----------------------------------------------------------------------
+
+def _run_script(request, fds):
+    """学生代码进程：接管标准输入输出，设置资源限制后执行脚本（不会返回）"""
+    returncode = 1
+    try:
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        for fd in fds:
+            if fd > 2:
+                os.close(fd)
+
+        os.chdir(request['cwd'])
+        if request.get('cgroup'):
+            sandbox.join_cgroup(request['cgroup'])
+        sandbox.apply_limits(sandbox.SandboxLimits(**request['limits']))
+
+        sys.stdin = io.open(0, 'r', encoding='utf-8', closefd=False)
+        sys.stdout = io.open(1, 'w', encoding='utf-8', closefd=False)
+        sys.stderr = io.open(2, 'w', encoding='utf-8', closefd=False)
+        sys.argv = [request['script']]
+        # fork出的子进程会继承服务器的随机数状态，需要重新播种
+        sys.modules['random'].seed()
+
+        with open(request['script'], 'r', encoding='utf-8') as f:
+            source = f.read()
+        code = compile(source, request['script'], 'exec')
+        exec(code, {'__name__': '__main__', '__file__': request['script'], '__builtins__': builtins})
+        returncode = 0
+    except SystemExit as e:
+        if e.code is None:
+            returncode = 0
+        elif isinstance(e.code, int):
+            returncode = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            returncode = 1
+    except BaseException as e:
+        # 跳过本函数所在的栈帧，使错误信息与直接运行python一致
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        returncode = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(returncode)
+
+
+def _supervise(conn, request, fds):
+    """监督进程：fork学生代码进程，负责墙钟超时并把退出状态写回套接字（不会返回）"""
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            # 学生进程自成一个进程组，超时时连同它派生的进程一起结束
+            os.setsid()
+            _run_script(request, fds)
+        for fd in fds:
+            os.close(fd)
+
+        timed_out = False
+
+        def kill():
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+        def on_timeout(signum, frame):
+            nonlocal timed_out
+            timed_out = True
+            kill()
+
+        def watch_client():
+            # 客户端发送 E<毫秒数> 时把墙钟超时顺延（客户端比对输出耗费的时间），
+            # 比对失败后发送其他内容，要求提前结束学生进程
+            try:
+                for line in conn.makefile('rb'):
+                    if not line.startswith(b'E'):
+                        kill()
+                        return
+                    remaining, _ = signal.getitimer(signal.ITIMER_REAL)
+                    if remaining > 0:
+                        signal.setitimer(signal.ITIMER_REAL, remaining + int(line[1:]) / 1000)
+            except (OSError, ValueError):
+                pass
+
+        watcher = threading.Thread(target=watch_client, daemon=True)
+        watcher.start()
+        signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, request['limits']['timeout'])
+        _, status, usage = os.wait4(pid, 0)
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+        reply = {
+            'returncode': os.waitstatus_to_exitcode(status),
+            'timed_out': timed_out,
+            'memory_kb': usage.ru_maxrss
+        }
+        conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+        # 等客户端关闭连接后再退出：套接字中还有未读取的顺延通知时直接退出会重置连接，客户端收不到结果
+        conn.shutdown(socket.SHUT_WR)
+        watcher.join(timeout=5)
+    finally:
+        os._exit(0)
+
+
+def serve(socket_path):
+    """fork服务器主循环，标准输入关闭（判题工作进程退出）时结束"""
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+    # 监督进程由系统自动回收
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(sys.stdin, selectors.EVENT_READ)
+
+    sys.stdout.write('READY\n')
+    sys.stdout.flush()
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is sys.stdin:
+                if not os.read(sys.stdin.fileno(), 1):
+                    listener.close()
+                    os.unlink(socket_path)
+                    os.rmdir(os.path.dirname(socket_path))
+                    return
+                continue
+
+            conn, _ = listener.accept()
+            fds = []
+            try:
+                message, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+                request = json.loads(message)
+                if len(fds) != 3:
+                    raise ValueError("需要传入3个文件描述符")
+                if os.fork() == 0:
+                    listener.close()
+                    _supervise(conn, request, fds)
+            except Exception as e:
+                sys.stderr.write(f"fork服务器处理请求失败: {e}\n")
+            finally:
+                conn.close()
+                for fd in fds:
+                    os.close(fd)
+
+
+# ----------------------------------------------------------------------
+# 客户端（在判题工作进程中运行）
+# ----------------------------------------------------------------------
+
+class PythonForkServer:
+    """fork服务器客户端，负责按需启动服务器并通过它运行学生代码"""
+
+    def __init__(self):
+        self._process = None
+        self._socket_path = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        """启动（或重启已退出的）fork服务器"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+
+            self._socket_path = os.path.join(tempfile.mkdtemp(prefix='oljudge-forkserver-'), 'server.sock')
+            self._process = subprocess.Popen(
+                [sys.executable, '-m', 'services.python_forkserver', self._socket_path],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            if self._process.stdout.readline() != b'READY\n':
+                self._process.kill()
+                self._process.wait()
+                raise ForkServerError("fork服务器启动失败")
+            logger.info(f"Python fork服务器已启动: {self._socket_path}")
+
+    def run(self, script_path, input_data='', limits=None, checker=None):
+        """
+        在沙箱限制下运行Python脚本
+        :param checker: output_checker比对器，参见sandbox.run
+        :return: sandbox.SandboxResult
+        """
+        limits = limits or sandbox.SandboxLimits()
+        self._ensure_started()
+
+        start = time.monotonic()
+        run_dir = sandbox.prepare_run_dir(tempfile.mkdtemp(prefix='oljudge-run-'))
+        cgroup = sandbox.CgroupRun(limits)
+        in_r, in_w = os.pipe()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                conn.connect(self._socket_path)
+                request = {
+                    'script': script_path,
+                    'cwd': run_dir,
+                    'cgroup': cgroup.path,
+                    'limits': {
+                        'timeout': limits.timeout,
+                        'memory_mb': limits.memory_mb,
+                        'max_processes': limits.max_processes,
+                        'output_bytes': limits.output_bytes
+                    }
+                }
+                socket.send_fds(conn, [json.dumps(request).encode('utf-8')], [in_r, out_w, err_w])
+            except OSError as e:
+                for fd in (in_w, out_r, err_r):
+                    os.close(fd)
+                raise ForkServerError(f"连接fork服务器失败: {e}")
+            finally:
+                for fd in (in_r, out_w, err_w):
+                    os.close(fd)
+
+            stdout, stderr, output_exceeded, output_mismatch, status = self._communicate(
+                conn, in_w, out_r, err_r, sandbox.as_bytes(input_data), limits, checker
+            )
+            if status is None:
+                raise ForkServerError("fork服务器没有返回运行结果")
+
+            stdout = checker.preview if checker is not None else stdout.decode('utf-8', errors='replace')
+            stderr = stderr.decode('utf-8', errors='replace')
+            memory_kb = max(status['memory_kb'], cgroup.memory_peak_kb())
+            verdict = sandbox.classify(
+                status['returncode'], stderr, limits,
+                timed_out=status['timed_out'],
+                output_exceeded=output_exceeded,
+                oom_killed=cgroup.oom_killed(),
+                memory_kb=memory_kb,
+                output_mismatch=output_mismatch
+            )
+            busy_seconds = checker.busy_seconds if checker is not None else 0
+            return sandbox.SandboxResult(
+                [sys.executable, script_path], status['returncode'], stdout, stderr,
+                verdict, max(0, int((time.monotonic() - start - busy_seconds) * 1000)), memory_kb
+            )
+        finally:
+            conn.close()
+            cgroup.remove()
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _communicate(self, conn, in_w, out_r, err_r, input_bytes, limits, checker=None):
+        """写入标准输入、读取输出和退出状态，与subprocess的communicate类似
+
+        标准输出超过上限或比对失败后立即关闭读端，学生进程再写入时会因管道断开而结束；
+        指定checker时标准输出交给checker比对而不保存
+        """
+        outputs = {out_r: [], err_r: []}
+        sizes = {out_r: 0, err_r: 0}
+        caps = {out_r: limits.output_bytes, err_r: sandbox.STDERR_LIMIT}
+        output_exceeded = False
+        output_mismatch = False
+        status_data = []
+        # 墙钟超时由监督进程负责，这里只为服务器失去响应兜底；比对输出的时间通知监督进程顺延超时
+        deadline = time.monotonic() + limits.timeout + 5
+        reported_ms = 0
+
+        with selectors.DefaultSelector() as selector:
+            if input_bytes:
+                selector.register(in_w, selectors.EVENT_WRITE)
+            else:
+                os.close(in_w)
+            selector.register(out_r, selectors.EVENT_READ)
+            selector.register(err_r, selectors.EVENT_READ)
+            selector.register(conn, selectors.EVENT_READ)
+
+            offset = 0
+            while selector.get_map():
+                checker_ms = int(checker.busy_seconds * 1000) if checker is not None else 0
+                if checker_ms > reported_ms and not output_mismatch:
+                    try:
+                        conn.sendall(b'E%d\n' % (checker_ms - reported_ms))
+                    except OSError:
+                        pass
+                    reported_ms = checker_ms
+                remaining = deadline + checker_ms / 1000 - time.monotonic()
+                if remaining <= 0:
+                    for key in list(selector.get_map().values()):
+                        selector.unregister(key.fileobj)
+                        if key.fileobj is not conn:
+                            os.close(key.fileobj)
+                    return b''.join(outputs[out_r]), b''.join(outputs[err_r]), output_exceeded, output_mismatch, None
+
+                for key, _ in selector.select(remaining):
+                    if key.fileobj == in_w:
+                        try:
+                            offset += os.write(in_w, input_bytes[offset:offset + _PIPE_BUF])
+                        except BrokenPipeError:
+                            offset = len(input_bytes)
+                        if offset >= len(input_bytes):
+                            selector.unregister(in_w)
+                            os.close(in_w)
+                    elif key.fileobj is conn:
+                        chunk = conn.recv(4096)
+                        if chunk:
+                            status_data.append(chunk)
+                        else:
+                            selector.unregister(conn)
+                    else:
+                        fd = key.fileobj
+                        chunk = os.read(fd, 65536)
+                        if chunk and sizes[fd] < caps[fd]:
+                            if fd == out_r and checker is not None:
+                                output_mismatch = not checker.feed(chunk[:caps[fd] - sizes[fd]])
+                            else:
+                                outputs[fd].append(chunk[:caps[fd] - sizes[fd]])
+                        sizes[fd] += len(chunk)
+                        if fd == out_r and sizes[fd] > caps[fd]:
+                            output_exceeded = True
+                            chunk = b''
+                        if output_mismatch and fd == out_r:
+                            # 比对已失败，通知监督进程结束学生进程
+                            try:
+                                conn.sendall(b'K\n')
+                            except OSError:
+                                pass
+                            chunk = b''
+                        if not chunk:
+                            selector.unregister(fd)
+                            os.close(fd)
+
+        status = json.loads(b''.join(status_data)) if status_data else None
+        return b''.join(outputs[out_r]), b''.join(outputs[err_r]), output_exceeded, output_mismatch, status
+
+    def shutdown(self):
+        """关闭fork服务器"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.stdin.close()
+                self._process.wait()
+
+
+# 全局fork服务器客户端实例（每个判题工作进程各自启动自己的fork服务器）
+forkserver = PythonForkServer()
+
+
+def run_python(script_path, input_data='', limits=None, checker=None):
+    """在沙箱中运行Python脚本，平台不支持或配置关闭fork服务器时单独启动python进程"""
+    if FORKSERVER_SUPPORTED and Config.PYTHON_FORKSERVER_ENABLED:
+        try:
+            return forkserver.run(script_path, input_data, limits, checker)
+        except ForkServerError as e:
+            logger.warning(f"fork服务器不可用，改为单独启动python进程: {e}")
+            if checker is not None:
+                checker.reset()
+
+    return sandbox.run(['python', script_path], input_data, limits, checker=checker)
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1])
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+题目目录模块
+question_catalog 表是三张题目表的窄投影（题型、ID、标题、语言、难度、知识点、创建时间），不含描述等TEXT列，
+题目列表、筛选、计数和按ID查标题只需读取这一张带索引的表，不必 UNION 三张宽表或三路 LEFT JOIN。
+写入题目表的代码（题库增删改、AI生成题目导入）在同一个事务中调用 sync_question / remove_question 维护目录，
+rebuild_catalog 根据题目表全量重建（迁移时回填，或目录与题目表不一致时修复）。
+写入钩子同时把目录行的变化登记到题库统计缓存（services.question_stats），并维护知识点标签（services.question_tags）
+"""
+
+import logging
+
+from database import db
+from services.question_stats import question_stats
+from services.question_tags import remove_question_tags, sync_question_tags
+
+logger = logging.getLogger(__name__)
+
+# 题型 -> (题目表, 主键列)
+QUESTION_TABLES = {
+    'progressing': ('progressing_questions', 'progressing_questions_id'),
+    'choice': ('choice_questions', 'choice_questions_id'),
+    'judgment': ('judgment_questions', 'judgment_questions_id'),
+}
+
+# 同一个ID在多张题目表中都存在时，按此顺序确定题型（编程题 > 选择题 > 判断题）
+TYPE_PRIORITY = ['progressing', 'choice', 'judgment']
+
+# 知识点在目录中最多保存的字符数（题目表中为TEXT）
+KNOWLEDGE_POINTS_MAX_CHARS = 500
+
+UPSERT_COLUMNS = """
+    INSERT INTO question_catalog
+    (question_type, question_id, title, language, difficulty, knowledge_points, created_at)
+"""
+
+ON_DUPLICATE_UPDATE = """
+    ON DUPLICATE KEY UPDATE
+        title = VALUES(title),
+        language = VALUES(language),
+        difficulty = VALUES(difficulty),
+        knowledge_points = VALUES(knowledge_points),
+        created_at = VALUES(created_at)
+"""
+
+
+def _projection_sql(question_type):
+    """从题目表读取目录列的查询"""
+    table, id_column = QUESTION_TABLES[question_type]
+    return f"""
+        SELECT '{question_type}', {id_column}, title, language, difficulty,
+               LEFT(knowledge_points, {KNOWLEDGE_POINTS_MAX_CHARS}), created_at
+        FROM {table}
+    """
+
+
+def _catalog_row(question_type, question_id):
+    rows = db.execute_query(
+        """
+            SELECT question_type, language, difficulty, knowledge_points
+            FROM question_catalog WHERE question_type = %s AND question_id = %s
+        """,
+        (question_type, question_id)
+    )
+    return rows[0] if rows else None
+
+
+def sync_question(question_type, question_id):
+    """题目新增或修改后，从题目表重新投影这道题（在写入题目的事务中调用）"""
+    id_column = QUESTION_TABLES[question_type][1]
+    old = _catalog_row(question_type, question_id)
+    db.execute_update(
+        UPSERT_COLUMNS + _projection_sql(question_type) + f" WHERE {id_column} = %s" + ON_DUPLICATE_UPDATE,
+        (question_id,)
+    )
+    new = _catalog_row(question_type, question_id)
+    question_stats.record_change(old, new)
+    # 知识点有变化时重建这道题的标签
+    if new is None:
+        remove_question_tags(question_type, question_id)
+    elif old is None or old['knowledge_points'] != new['knowledge_points']:
+        sync_question_tags(question_type, question_id, new['knowledge_points'])
+
+
+def remove_question(question_type, question_id):
+    """题目删除后移除目录行（在删除题目的事务中调用）"""
+    old = _catalog_row(question_type, question_id)
+    db.execute_update(
+        "DELETE FROM question_catalog WHERE question_type = %s AND question_id = %s",
+        (question_type, question_id)
+    )
+    remove_question_tags(question_type, question_id)
+    question_stats.record_change(old, None)
+
+
+def rebuild_catalog():
+    """根据三张题目表全量重建目录"""
+    with db.transaction():
+        db.execute_update("DELETE FROM question_catalog")
+        rows = 0
+        for question_type in QUESTION_TABLES:
+            rows += db.execute_update(UPSERT_COLUMNS + _projection_sql(question_type) + ON_DUPLICATE_UPDATE)
+    question_stats.invalidate()
+    logger.info(f"题目目录重建完成，共 {rows} 道题目")
+    return rows
+
+
+def question_types_by_id(question_ids):
+    """
+    按ID查找题目所在的题型（同一个ID可能在多张题目表中存在）
+    :return: {题目ID: [题型, ...]}，题型按 TYPE_PRIORITY 排序，不存在的ID不在结果中
+    """
+    if not question_ids:
+        return {}
+    rows = db.execute_query(
+        "SELECT question_id, question_type FROM question_catalog WHERE question_id IN %s",
+        (tuple(question_ids),)
+    )
+    types = {}
+    for row in sorted(rows, key=lambda row: TYPE_PRIORITY.index(row['question_type'])):
+        types.setdefault(row['question_id'], []).append(row['question_type'])
+    return types
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+题库全文检索模块
+三张题目表的 (title, description) 上建有 ngram 分词的 FULLTEXT 索引（迁移 0006），
+文本按连续的N个字符切分（中文无需分词），搜索词按短语检索即可匹配标题或描述中任意位置的子串，
+索引由MySQL随题目的增删改自动维护，不需要像 LIKE '%...%' 那样逐行扫描全表。
+搜索词中有短于N个字符的部分时无法用索引检索，退回 LIKE 匹配
+"""
+
+from config import Config
+
+# FULLTEXT 索引的列（MATCH 的列必须与索引完全一致）
+SEARCH_COLUMNS = ('title', 'description')
+
+
+def _phrase(keyword):
+    """转换为布尔模式的短语检索（去掉搜索词中的双引号，避免提前结束短语）"""
+    return '"' + keyword.replace('"', ' ').strip() + '"'
+
+
+def can_use_fulltext(keyword):
+    """搜索词中每个词都不短于 ngram 长度时才能用索引检索"""
+    words = keyword.replace('"', ' ').split()
+    return bool(words) and all(len(word) >= Config.QUESTION_SEARCH_NGRAM_SIZE for word in words)
+
+
+def search_condition(keyword, alias=''):
+    """
+    题目标题或描述包含搜索词的查询条件
+    :param keyword: 搜索词
+    :param alias: 题目表的别名（如 'pq.'）
+    :return: (条件SQL, 参数列表)
+    """
+    keyword = ' '.join(keyword.split())
+    title, description = (f"{alias}{column}" for column in SEARCH_COLUMNS)
+    if can_use_fulltext(keyword):
+        return f"MATCH({title}, {description}) AGAINST (%s IN BOOLEAN MODE)", [_phrase(keyword)]
+    like_param = f'%{keyword}%'
+    return f"({title} LIKE %s OR {description} LIKE %s)", [like_param, like_param]
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+题库统计缓存模块
+在进程内保存题库按题型、语言、难度的计数，教师首页的统计卡片不必每次对三张题目表计数和分组。
+计数第一次使用时从 question_catalog 分组统计（走目录上的索引），之后题目的新增、修改、删除
+在事务提交后增量更新（由 question_catalog 的写入钩子调用）；另设有效期兜底重新统计，
+多进程部署时其他进程写入的题目、以及绕过接口直接修改数据库造成的偏差最迟在有效期后修正。
+管理员可通过接口立即重建。
+
+仪表盘的用户数量（教师、学生、管理员）写入位置分散，只按有效期缓存
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from config import Config
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# 统计维度 -> 目录中的列
+DIMENSIONS = {
+    'type': 'question_type',
+    'language': 'language',
+    'difficulty': 'difficulty',
+}
+
+QUESTION_TYPES = ['progressing', 'choice', 'judgment']
+
+
+class QuestionStatsCache:
+    """题库统计计数缓存类"""
+
+    def __init__(self, ttl=None, dashboard_ttl=None):
+        self.ttl = ttl if ttl is not None else Config.QUESTION_STATS_TTL
+        self.dashboard_ttl = dashboard_ttl if dashboard_ttl is not None else Config.DASHBOARD_STATS_TTL
+        self._lock = threading.Lock()
+        self._counters = None  # {维度: Counter(值 -> 题目数)}
+        self._loaded_at = 0
+        self._dashboard = None
+        self._dashboard_loaded_at = 0
+        self.hits = 0
+        self.recomputes = 0
+
+    @staticmethod
+    def _count_catalog():
+        """从题目目录分组统计各维度的题目数（空值不计入语言、难度统计）"""
+        rows = db.execute_query("""
+            SELECT 'type' as dimension, question_type as value, COUNT(*) as count
+            FROM question_catalog GROUP BY question_type
+            UNION ALL
+            SELECT 'language', language, COUNT(*)
+            FROM question_catalog WHERE language IS NOT NULL AND language != '' GROUP BY language
+            UNION ALL
+            SELECT 'difficulty', difficulty, COUNT(*)
+            FROM question_catalog WHERE difficulty IS NOT NULL AND difficulty != '' GROUP BY difficulty
+        """)
+        counters = {dimension: collections.Counter() for dimension in DIMENSIONS}
+        for row in rows:
+            counters[row['dimension']][row['value']] = int(row['count'])
+        return counters
+
+    def get(self):
+        """
+        题库统计（格式与 /api/question-bank/stats 的 data 相同）
+        :return: {total_problems, progressing_count, choice_count, judgment_count, language_stats, difficulty_stats}
+        """
+        with self._lock:
+            if self._counters is not None and time.monotonic() - self._loaded_at < self.ttl:
+                self.hits += 1
+                return self._format()
+        return self.rebuild()
+
+    def rebuild(self):
+        """重新统计并替换缓存的计数"""
+        counters = self._count_catalog()
+        with self._lock:
+            self._counters = counters
+            self._loaded_at = time.monotonic()
+            self.recomputes += 1
+            return self._format()
+
+    def _format(self):
+        types = self._counters['type']
+
+        def ranked(dimension):
+            items = sorted(self._counters[dimension].items(), key=lambda item: -item[1])
+            return [{DIMENSIONS[dimension]: value, "count": count} for value, count in items]
+
+        return {
+            "total_problems": sum(types[question_type] for question_type in QUESTION_TYPES),
+            "progressing_count": types['progressing'],
+            "choice_count": types['choice'],
+            "judgment_count": types['judgment'],
+            "language_stats": ranked('language'),
+            "difficulty_stats": ranked('difficulty')
+        }
+
+    def record_change(self, old, new):
+        """
+        题目写入后登记计数变化，事务提交后才更新（回滚时不变）
+        :param old: 修改前的目录行，新增时为None
+        :param new: 修改后的目录行，删除时为None
+        """
+        db.after_commit(lambda: self._apply_change(old, new))
+
+    def _apply_change(self, old, new):
+        with self._lock:
+            if self._counters is None:
+                return
+            for row, delta in ((old, -1), (new, 1)):
+                if not row:
+                    continue
+                for dimension, column in DIMENSIONS.items():
+                    value = row.get(column)
+                    if not value:
+                        continue
+                    counter = self._counters[dimension]
+                    counter[value] += delta
+                    if counter[value] <= 0:
+                        del counter[value]
+
+    def dashboard(self):
+        """仪表盘用户数量：{teachers_count, students_count, admins_count, total_users}"""
+        with self._lock:
+            if self._dashboard is not None and time.monotonic() - self._dashboard_loaded_at < self.dashboard_ttl:
+                return dict(self._dashboard)
+
+        counts = db.execute_query("""
+            SELECT
+                (SELECT COUNT(*) FROM teachers) as teachers_count,
+                (SELECT COUNT(*) FROM students) as students_count,
+                (SELECT COUNT(*) FROM admins) as admins_count
+        """)[0]
+        dashboard = {key: int(value) for key, value in counts.items()}
+        dashboard['total_users'] = dashboard['teachers_count'] + dashboard['students_count'] + dashboard['admins_count']
+        with self._lock:
+            self._dashboard = dashboard
+            self._dashboard_loaded_at = time.monotonic()
+        return dict(dashboard)
+
+    def invalidate(self):
+        """清空缓存，下次使用时重新统计"""
+        with self._lock:
+            self._counters = None
+            self._dashboard = None
+
+    def stats(self):
+        """缓存状态"""
+        with self._lock:
+            return {
+                "loaded": self._counters is not None,
+                "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._counters is not None else None,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "recomputes": self.recomputes
+            }
+
+
+# 全局题库统计缓存实例
+question_stats = QuestionStatsCache()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+知识点标签模块
+题目的 knowledge_points 是自由文本（多个知识点用逗号、顿号等分隔），按 LIKE '%...%' 筛选需要扫描全部题目，
+也无法低成本地统计每个知识点有多少道题。这里把知识点拆分为标签：knowledge_tags 为标签字典，
+question_tags 记录 (标签, 题型, 题目ID)，按知识点筛选题目和分面计数都走 question_tags 的索引。
+题目写入时由 question_catalog 的写入钩子调用 sync_question_tags，
+rebuild_question_tags 根据题目目录全量重建（迁移时回填已有题目）
+"""
+
+import logging
+import re
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# 知识点之间的分隔符：中英文逗号、顿号、中英文分号
+TAG_SEPARATORS = re.compile(r'[,，、;；]')
+
+# 标签名最多保存的字符数
+TAG_MAX_CHARS = 50
+
+QUESTION_TAG_COLUMNS = ['tag_id', 'question_type', 'question_id']
+
+
+def parse_knowledge_points(text):
+    """把知识点文本拆分为标签名列表（合并多余空白，去掉空项和重复项，保持原顺序）"""
+    names = []
+    for part in TAG_SEPARATORS.split(text or ''):
+        name = ' '.join(part.split())[:TAG_MAX_CHARS]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _tag_ids(names):
+    """标签名 -> 标签ID，字典中还没有的标签先插入"""
+    if not names:
+        return {}
+    db.execute_bulk_insert('knowledge_tags', ['name'], [(name,) for name in names], ignore=True)
+    rows = db.execute_query("SELECT tag_id, name FROM knowledge_tags WHERE name IN %s", (tuple(names),))
+    return {row['name']: row['tag_id'] for row in rows}
+
+
+def sync_question_tags(question_type, question_id, knowledge_points):
+    """按题目当前的知识点文本重建这道题的标签（在写入题目的事务中调用）"""
+    remove_question_tags(question_type, question_id)
+    names = parse_knowledge_points(knowledge_points)
+    tag_ids = _tag_ids(names)
+    db.execute_bulk_insert('question_tags', QUESTION_TAG_COLUMNS, [
+        (tag_ids[name], question_type, question_id) for name in names if name in tag_ids
+    ])
+
+
+def remove_question_tags(question_type, question_id):
+    """删除这道题的标签（标签字典中的标签保留）"""
+    db.execute_update(
+        "DELETE FROM question_tags WHERE question_type = %s AND question_id = %s",
+        (question_type, question_id)
+    )
+
+
+def rebuild_question_tags():
+    """根据题目目录中的知识点全量重建题目标签"""
+    with db.transaction():
+        db.execute_update("DELETE FROM question_tags")
+        questions = db.execute_query("""
+            SELECT question_type, question_id, knowledge_points
+            FROM question_catalog
+            WHERE knowledge_points IS NOT NULL AND knowledge_points != ''
+        """)
+        parsed = [(question, parse_knowledge_points(question['knowledge_points'])) for question in questions]
+        tag_ids = _tag_ids(sorted({name for _, names in parsed for name in names}))
+        rows = db.execute_bulk_insert('question_tags', QUESTION_TAG_COLUMNS, [
+            (tag_ids[name], question['question_type'], question['question_id'])
+            for question, names in parsed for name in names if name in tag_ids
+        ])
+    logger.info(f"题目标签重建完成，{len(parsed)} 道题目，共 {rows} 个标签")
+    return rows
+
+
+def tag_filter_condition(keyword, alias='qc'):
+    """
+    知识点包含关键字的题目：先在标签字典（规模很小）中匹配标签名，再按 question_tags 的索引找到题目
+    :param alias: 题目目录表的别名
+    :return: (条件SQL, 参数列表)
+    """
+    return (
+        f"({alias}.question_type, {alias}.question_id) IN ("
+        "SELECT qt.question_type, qt.question_id FROM question_tags qt "
+        "JOIN knowledge_tags kt ON kt.tag_id = qt.tag_id "
+        "WHERE kt.name COLLATE utf8mb4_general_ci LIKE %s)",
+        [f'%{keyword}%']
+    )
+
+
+def tag_facets(conditions=None, params=None, limit=None):
+    """
+    各知识点标签的题目数（按题目数倒序）
+    :param conditions: 题目目录（别名qc）上的筛选条件，只统计符合条件的题目
+    :param limit: 最多返回的标签数
+    :return: [{name, count}, ...]
+    """
+    sql = """
+        SELECT kt.name, COUNT(*) as count
+        FROM question_tags qt
+        JOIN knowledge_tags kt ON kt.tag_id = qt.tag_id
+    """
+    params = list(params or [])
+    if conditions:
+        sql += " JOIN question_catalog qc ON qc.question_type = qt.question_type AND qc.question_id = qt.question_id"
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " GROUP BY kt.tag_id, kt.name ORDER BY count DESC, kt.name"
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return db.execute_query(sql, params)
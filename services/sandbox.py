@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+判题沙箱模块
+为学生程序设置CPU时间、内存、进程数和输出字节数上限，在独立的临时目录中运行，
+并给出 OK/TLE/MLE/OLE/RE 运行结论。
+资源限制优先使用 cgroups v2（需在配置中指定已委派的cgroup目录），同时总是设置rlimit；
+安装了libseccomp的Python绑定时，额外用seccomp禁止网络、调试和挂载等系统调用。
+判题服务以root运行并配置了运行账号（SANDBOX_RUN_USER）时，学生程序切换到该账号运行，
+无法读写判题账号私有的目录（编译缓存、测试数据），需要执行的编译产物复制为运行账号只读的副本
+"""
+
+import contextlib
+import logging
+import os
+import shutil
+import signal
+import stat
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+from config import Config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import seccomp
+except ImportError:
+    seccomp = None
+
+try:
+    import pwd
+except ImportError:  # Windows
+    pwd = None
+
+logger = logging.getLogger(__name__)
+
+# 运行结论
+VERDICT_OK = 'OK'
+VERDICT_TLE = 'TLE'  # 超出时间限制
+VERDICT_MLE = 'MLE'  # 超出内存限制
+VERDICT_OLE = 'OLE'  # 输出超出限制
+VERDICT_RE = 'RE'    # 运行时错误
+
+VERDICT_MESSAGES = {
+    VERDICT_TLE: "超出时间限制",
+    VERDICT_MLE: "超出内存限制",
+    VERDICT_OLE: "输出超出限制",
+    VERDICT_RE: "运行时错误",
+}
+
+# 标准错误只保留开头部分，用于展示错误信息
+STDERR_LIMIT = 64 * 1024
+
+# 学生程序禁止使用的系统调用
+BLOCKED_SYSCALLS = [
+    'socket', 'connect', 'bind', 'listen', 'accept', 'accept4', 'ptrace', 'mount', 'umount2',
+    'chroot', 'pivot_root', 'setns', 'unshare', 'reboot', 'kexec_load', 'init_module', 'delete_module',
+]
+
+
+class SandboxLimits:
+    """沙箱资源限制，未指定的项使用配置中的默认值"""
+
+    def __init__(self, timeout=10, memory_mb=None, max_processes=None, output_bytes=None, limit_address_space=True):
+        self.timeout = timeout  # 墙钟时间上限（秒），CPU时间上限取相同值
+        self.memory_mb = memory_mb if memory_mb is not None else Config.SANDBOX_MEMORY_MB
+        self.max_processes = max_processes if max_processes is not None else Config.SANDBOX_MAX_PROCESSES
+        self.output_bytes = output_bytes if output_bytes is not None else Config.SANDBOX_OUTPUT_LIMIT_KB * 1024
+        # JVM启动时会预留远大于实际使用量的虚拟地址空间，运行Java时不能限制地址空间
+        self.limit_address_space = limit_address_space
+
+
+class SandboxResult(subprocess.CompletedProcess):
+    """沙箱运行结果，在CompletedProcess基础上增加运行结论、耗时和内存峰值"""
+
+    def __init__(self, args, returncode, stdout='', stderr='', verdict=VERDICT_OK, time_ms=0, memory_kb=0):
+        super().__init__(args, returncode, stdout, stderr)
+        self.verdict = verdict
+        self.time_ms = time_ms
+        self.memory_kb = memory_kb
+
+
+def apply_limits(limits):
+    """在子进程中设置rlimit和seccomp过滤（fork之后、执行学生代码之前调用）"""
+    if resource is not None:
+        cpu_seconds = int(limits.timeout) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        # 输出写入文件时同样受输出上限约束
+        resource.setrlimit(resource.RLIMIT_FSIZE, (limits.output_bytes, limits.output_bytes))
+        if limits.memory_mb and limits.limit_address_space:
+            memory_bytes = limits.memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        if limits.max_processes and Config.SANDBOX_LIMIT_NPROC:
+            # RLIMIT_NPROC按用户统计，只适合以专用判题账号运行的部署
+            resource.setrlimit(resource.RLIMIT_NPROC, (limits.max_processes, limits.max_processes))
+
+    run_ids = run_user_ids()
+    if run_ids is not None:
+        uid, gid = run_ids
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+
+    if seccomp is not None:
+        syscall_filter = seccomp.SyscallFilter(defaction=seccomp.ALLOW)
+        for name in BLOCKED_SYSCALLS:
+            try:
+                syscall_filter.add_rule(seccomp.ERRNO(1), name)  # EPERM
+            except Exception:
+                pass
+        syscall_filter.load()
+
+
+_run_user_ids = None
+
+
+def run_user_ids():
+    """运行学生程序的账号 (uid, gid)，未配置SANDBOX_RUN_USER时为None"""
+    global _run_user_ids
+    if not Config.SANDBOX_RUN_USER or pwd is None:
+        return None
+    if _run_user_ids is None:
+        entry = pwd.getpwnam(Config.SANDBOX_RUN_USER)
+        _run_user_ids = (entry.pw_uid, entry.pw_gid)
+    return _run_user_ids
+
+
+def ensure_private_dir(path):
+    """创建只有判题账号可以访问的目录（0700）；已存在的目录属于其他账号时拒绝使用，权限过宽时收紧"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'geteuid'):
+        return path
+    info = os.stat(path)
+    if info.st_uid != os.geteuid():
+        raise PermissionError(f"目录不属于判题账号，拒绝使用: {path}")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        logger.warning(f"目录权限过宽，已改为0700: {path}")
+        os.chmod(path, 0o700)
+    return path
+
+
+def prepare_run_dir(path):
+    """配置了运行账号时把学生程序的工作目录交给运行账号"""
+    run_ids = run_user_ids()
+    if run_ids is not None:
+        os.chown(path, *run_ids)
+    return path
+
+
+def stage_for_run_user(path):
+    """
+    配置了运行账号时，把判题账号私有目录中的文件或目录复制为运行账号只读的副本
+    :return: (学生进程使用的路径, 副本所在的临时目录)，未配置运行账号时原样返回路径，临时目录为None
+    """
+    if run_user_ids() is None:
+        return path, None
+    stage_dir = tempfile.mkdtemp(prefix='oljudge-stage-')
+    try:
+        os.chmod(stage_dir, 0o755)
+        target = os.path.join(stage_dir, os.path.basename(path.rstrip(os.sep)))
+        if os.path.isdir(path):
+            shutil.copytree(path, target)
+        else:
+            shutil.copy2(path, target)
+        # 副本属于判题账号，运行账号只能读取和执行
+        for root, dirs, files in os.walk(stage_dir):
+            os.chmod(root, 0o755)
+            for name in files:
+                file_path = os.path.join(root, name)
+                os.chmod(file_path, 0o755 if os.stat(file_path).st_mode & stat.S_IXUSR else 0o644)
+        return target, stage_dir
+    except BaseException:
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        raise
+
+
+@contextlib.contextmanager
+def run_user_copy(path):
+    """stage_for_run_user 的上下文管理器形式，退出时删除副本"""
+    staged_path, stage_dir = stage_for_run_user(path)
+    try:
+        yield staged_path
+    finally:
+        if stage_dir:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+
+
+def join_cgroup(path):
+    """把当前进程加入指定的cgroup（在子进程中调用）"""
+    with open(os.path.join(path, 'cgroup.procs'), 'w') as f:
+        f.write(str(os.getpid()))
+
+
+class CgroupRun:
+    """一次运行对应的cgroups v2子组，未配置SANDBOX_CGROUP_ROOT或不可写时不生效"""
+
+    def __init__(self, limits):
+        self.path = None
+        root = Config.SANDBOX_CGROUP_ROOT
+        if not root or not os.access(root, os.W_OK):
+            return
+
+        path = os.path.join(root, f'run-{uuid.uuid4().hex}')
+        try:
+            os.mkdir(path)
+            if limits.memory_mb:
+                self._write(path, 'memory.max', str(limits.memory_mb * 1024 * 1024))
+                self._write(path, 'memory.swap.max', '0')
+            if limits.max_processes:
+                self._write(path, 'pids.max', str(limits.max_processes))
+            self.path = path
+        except OSError as e:
+            logger.warning(f"创建cgroup失败，仅使用rlimit限制资源: {e}")
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _write(path, name, value):
+        with open(os.path.join(path, name), 'w') as f:
+            f.write(value)
+
+    def _read_value(self, name, key=None):
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                for line in f:
+                    parts = line.split()
+                    if key is None:
+                        return int(parts[0])
+                    if parts and parts[0] == key:
+                        return int(parts[1])
+        except (OSError, ValueError, IndexError):
+            pass
+        return 0
+
+    def join(self):
+        """把当前进程加入cgroup（在子进程中调用）"""
+        if self.path:
+            join_cgroup(self.path)
+
+    def oom_killed(self):
+        return bool(self.path) and self._read_value('memory.events', 'oom_kill') > 0
+
+    def memory_peak_kb(self):
+        return self._read_value('memory.peak') // 1024 if self.path else 0
+
+    def kill_all(self):
+        """结束cgroup中残留的进程"""
+        if self.path and os.path.exists(os.path.join(self.path, 'cgroup.kill')):
+            try:
+                self._write(self.path, 'cgroup.kill', '1')
+            except OSError:
+                pass
+
+    def remove(self):
+        if not self.path:
+            return
+        for _ in range(50):
+            try:
+                os.rmdir(self.path)
+                return
+            except OSError:
+                time.sleep(0.01)
+        logger.warning(f"删除cgroup失败: {self.path}")
+
+
+def _read_capped(stream, limit, chunks, on_exceeded=None, on_chunk=None):
+    """读取管道直到结束，超过上限的部分丢弃（超过时调用on_exceeded）
+
+    指定on_chunk时每段输出交给on_chunk处理而不保存，on_chunk返回False时停止读取
+    """
+    total = 0
+    while True:
+        chunk = stream.read1(65536) if hasattr(stream, 'read1') else stream.read(65536)
+        if not chunk:
+            break
+        if total < limit:
+            if on_chunk is not None:
+                if not on_chunk(chunk[:limit - total]):
+                    break
+            else:
+                chunks.append(chunk[:limit - total])
+        total += len(chunk)
+        if total > limit and on_exceeded:
+            on_exceeded()
+            on_exceeded = None
+    stream.close()
+
+
+def as_bytes(data):
+    """把标准输入/期望输出统一为字节对象（字符串按UTF-8编码，bytes、mmap等原样返回）"""
+    if data is None:
+        return b''
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return data
+
+
+def _write_input(stream, data):
+    try:
+        if data:
+            stream.write(data)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+def classify(returncode, stderr, limits, timed_out=False, output_exceeded=False, oom_killed=False, memory_kb=0,
+             output_mismatch=False):
+    """根据退出状态判断运行结论
+
+    output_mismatch表示输出比对已经失败、学生进程是被提前结束的，此时按正常运行处理，由比对结果判为答案错误
+    """
+    if output_mismatch:
+        return VERDICT_OK
+    if timed_out or (resource is not None and returncode == -signal.SIGXCPU):
+        return VERDICT_TLE
+    if output_exceeded or (resource is not None and returncode == -signal.SIGXFSZ):
+        return VERDICT_OLE
+    if returncode != 0:
+        if oom_killed or (limits.memory_mb and memory_kb >= limits.memory_mb * 1024):
+            return VERDICT_MLE
+        if 'MemoryError' in stderr or 'std::bad_alloc' in stderr or 'OutOfMemoryError' in stderr:
+            return VERDICT_MLE
+        return VERDICT_RE
+    return VERDICT_OK
+
+
+def run(cmd, input_data='', limits=None, cwd=None, checker=None):
+    """
+    在沙箱中运行命令
+    :param cmd: 命令及参数列表
+    :param input_data: 标准输入内容（字符串或bytes、mmap等字节对象）
+    :param limits: SandboxLimits，默认使用配置中的限制
+    :param cwd: 工作目录，默认为本次运行新建的临时目录（运行结束后删除）
+    :param checker: output_checker比对器，指定时标准输出边读取边比对，结果的stdout只包含开头部分，
+                    比对失败时立即结束进程；比对耗费的时间不计入墙钟超时和运行耗时
+    :return: SandboxResult
+    """
+    limits = limits or SandboxLimits()
+    run_dir = cwd or prepare_run_dir(tempfile.mkdtemp(prefix='oljudge-run-'))
+    cgroup = CgroupRun(limits)
+
+    def preexec():
+        cgroup.join()
+        apply_limits(limits)
+
+    stdout_chunks, stderr_chunks = [], []
+    output_exceeded = threading.Event()
+    output_mismatch = threading.Event()
+    timed_out = False
+    start = time.monotonic()
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=run_dir,
+            preexec_fn=preexec if resource is not None else None,
+            start_new_session=resource is not None
+        )
+
+        def kill():
+            try:
+                if resource is not None:
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except OSError:
+                pass
+            cgroup.kill_all()
+
+        def on_output_exceeded():
+            output_exceeded.set()
+            kill()
+
+        def on_stdout(chunk):
+            if checker.feed(chunk):
+                return True
+            output_mismatch.set()
+            kill()
+            return False
+
+        threads = [
+            threading.Thread(target=_write_input, args=(process.stdin, as_bytes(input_data)), daemon=True),
+            threading.Thread(
+                target=_read_capped,
+                args=(process.stdout, limits.output_bytes, stdout_chunks, on_output_exceeded,
+                      on_stdout if checker is not None else None),
+                daemon=True
+            ),
+            threading.Thread(target=_read_capped, args=(process.stderr, STDERR_LIMIT, stderr_chunks), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        def checker_seconds():
+            return checker.busy_seconds if checker is not None else 0
+
+        # 后台线程阻塞等待进程退出，这里只需等到截止时间（比对耗时会推迟截止时间，醒来后重新计算）
+        exit_status = {}
+        exited = threading.Event()
+
+        def wait_exit():
+            try:
+                exit_status['returncode'], exit_status['memory_kb'] = _wait(process)
+            finally:
+                exited.set()
+
+        threading.Thread(target=wait_exit, daemon=True).start()
+
+        deadline = start + limits.timeout
+        while True:
+            remaining = deadline + checker_seconds() - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                kill()
+                exited.wait()
+                break
+            if exited.wait(remaining):
+                break
+        returncode, memory_kb = exit_status.get('returncode'), exit_status.get('memory_kb', 0)
+
+        # 进程退出后回收子孙进程，避免它们继续占用输出管道
+        kill()
+        for thread in threads:
+            thread.join(timeout=1)
+        elapsed_ms = max(0, int((time.monotonic() - start - checker_seconds()) * 1000))
+
+        if checker is not None:
+            stdout = checker.preview
+        else:
+            stdout = b''.join(stdout_chunks).decode('utf-8', errors='replace')
+        stderr = b''.join(stderr_chunks).decode('utf-8', errors='replace')
+        memory_kb = max(memory_kb, cgroup.memory_peak_kb())
+        verdict = classify(
+            returncode, stderr, limits,
+            timed_out=timed_out,
+            output_exceeded=output_exceeded.is_set(),
+            oom_killed=cgroup.oom_killed(),
+            memory_kb=memory_kb,
+            output_mismatch=output_mismatch.is_set()
+        )
+        return SandboxResult(cmd, returncode, stdout, stderr, verdict, elapsed_ms, memory_kb)
+    finally:
+        cgroup.remove()
+        if cwd is None:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def _wait(process):
+    """阻塞等待进程退出，返回 (退出码, 内存峰值KB)；不支持wait4的平台取不到内存峰值，返回0"""
+    if resource is None:
+        return process.wait(), 0
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, usage.ru_maxrss
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+作业提交汇总模块
+homework_submission_summary 表按（学生, 作业）保存已提交、已完成、已批改、待批改的题目数和最后提交时间，
+并冗余作业所属教师，教师的待批改列表只需读取自己的汇总行，不再对 student_answers 做全表聚合。
+写入学生答案的接口（学生提交、ZIP提交、教师评分）在同一个事务中调用 refresh_submission_summary，
+按该学生在该作业中的答题记录重新计算这一行（走 student_answers(student_id, homework_id, ...) 索引）
+"""
+
+import logging
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# 汇总列的计算方式（与原待批改列表的统计口径一致）
+SUMMARY_COLUMNS = """
+    COUNT(CASE WHEN sa.status IN ('submitted', 'graded') THEN 1 END),
+    COUNT(CASE WHEN (sa.status = 'graded') OR (sa.status = 'submitted' AND sa.is_correct = 1) THEN 1 END),
+    COUNT(CASE WHEN sa.status = 'graded' THEN 1 END),
+    COUNT(CASE WHEN sa.status = 'submitted' AND (sa.score IS NULL OR sa.score = 0) THEN 1 END),
+    MAX(CASE WHEN sa.status IN ('submitted', 'graded') THEN sa.last_attempt_at END)
+"""
+
+UPSERT_COLUMNS = """
+    INSERT INTO homework_submission_summary
+    (student_id, homework_id, teacher_id, submitted_questions, completed_questions,
+     graded_questions, pending_questions, last_submit_time)
+"""
+
+ON_DUPLICATE_UPDATE = """
+    ON DUPLICATE KEY UPDATE
+        teacher_id = VALUES(teacher_id),
+        submitted_questions = VALUES(submitted_questions),
+        completed_questions = VALUES(completed_questions),
+        graded_questions = VALUES(graded_questions),
+        pending_questions = VALUES(pending_questions),
+        last_submit_time = VALUES(last_submit_time)
+"""
+
+
+def refresh_submission_summary(student_id, homework_id):
+    """重新计算某个学生在某个作业中的汇总行（在写入学生答案的事务中调用）"""
+    db.execute_update(UPSERT_COLUMNS + f"""
+        SELECT %s, ha.id, ha.teacher_id, {SUMMARY_COLUMNS}
+        FROM homework_assignments ha
+        LEFT JOIN student_answers sa ON sa.homework_id = ha.id AND sa.student_id = %s
+        WHERE ha.id = %s
+        GROUP BY ha.id, ha.teacher_id
+    """ + ON_DUPLICATE_UPDATE, (student_id, student_id, homework_id))
+
+
+def rebuild_submission_summary():
+    """根据全部学生答案重建汇总表（迁移时回填，或汇总数据与答案不一致时修复）"""
+    with db.transaction():
+        db.execute_update("DELETE FROM homework_submission_summary")
+        rows = db.execute_update(UPSERT_COLUMNS + f"""
+            SELECT sa.student_id, sa.homework_id, ha.teacher_id, {SUMMARY_COLUMNS}
+            FROM student_answers sa
+            JOIN homework_assignments ha ON sa.homework_id = ha.id
+            GROUP BY sa.student_id, sa.homework_id, ha.teacher_id
+        """ + ON_DUPLICATE_UPDATE)
+    logger.info(f"作业提交汇总重建完成，共 {rows} 行")
+    return rows
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+测试数据文件存储模块
+较大的测试输入/输出不再保存在 progressing_questions_test_cases 的TEXT列中，而是按内容的sha256哈希值
+保存为本地磁盘上的文件（可选gzip压缩），数据库只保存哈希值、字节数和开头一小段预览。
+判题时未压缩的数据文件通过mmap映射后直接写入学生进程的标准输入、交给输出比对器，不经过数据库连接，
+也不在Python中生成完整的字符串。存储目录只有判题账号可以访问，学生程序（以运行账号运行时）无法读取期望输出
+"""
+
+import contextlib
+import gzip
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+
+from config import Config
+from services import sandbox
+
+logger = logging.getLogger(__name__)
+
+# 保存为文件的测试数据在数据库中保留的预览字符数
+PREVIEW_CHARS = 1000
+
+# 测试用例中保存为文件的字段
+DATA_FIELDS = ('input', 'output')
+
+
+class TestCaseStore:
+    """测试数据文件存储类
+
+    数据文件保存在 <存储目录>/<哈希前两位>/<哈希>（压缩时加.gz后缀），内容相同的数据只保存一份。
+    文件写入后不再修改：先写入同目录下的临时文件，再重命名为最终文件名
+    """
+
+    def __init__(self, data_dir=None, inline_max_bytes=None, compress=None):
+        self.data_dir = data_dir or Config.TEST_DATA_DIR
+        self.inline_max_bytes = inline_max_bytes if inline_max_bytes is not None else Config.TEST_DATA_INLINE_MAX_KB * 1024
+        self.compress = compress if compress is not None else Config.TEST_DATA_COMPRESS
+        sandbox.ensure_private_dir(self.data_dir)
+
+    def _path(self, digest, compressed=False):
+        return os.path.join(self.data_dir, digest[:2], digest + ('.gz' if compressed else ''))
+
+    def put(self, data):
+        """保存数据，返回 (哈希值, 字节数)"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if self.find(digest):
+            return digest, len(data)
+
+        path = self._path(digest, self.compress)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(data) if self.compress else data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        return digest, len(data)
+
+    def find(self, digest):
+        """查找数据文件，返回 (路径, 是否压缩)，不存在时返回None"""
+        for compressed in (False, True):
+            path = self._path(digest, compressed)
+            if os.path.exists(path):
+                return path, compressed
+        return None
+
+    @contextlib.contextmanager
+    def open(self, digest):
+        """打开数据，得到可以切片、写入管道的字节对象（未压缩的文件为mmap，退出时解除映射）"""
+        found = self.find(digest)
+        if found is None:
+            raise FileNotFoundError(f"测试数据文件不存在: {digest}")
+        path, compressed = found
+        if compressed:
+            with gzip.open(path, 'rb') as f:
+                yield f.read()
+            return
+
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b''
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+    def read_text(self, digest):
+        """读取完整数据（用于编辑题目时回显）"""
+        with self.open(digest) as data:
+            return bytes(data).decode('utf-8', errors='replace')
+
+
+# 全局测试数据存储实例
+testcase_store = TestCaseStore()
+
+
+def prepare_test_case(input_text, output_text):
+    """
+    把测试用例的输入/输出整理为数据库列的值，超过内联上限的数据写入文件
+    :return: dict，包含 input、output、input_hash、input_size、output_hash、output_size
+    """
+    row = {}
+    for field, text in zip(DATA_FIELDS, (input_text or '', output_text or '')):
+        data = text.encode('utf-8')
+        if len(data) > testcase_store.inline_max_bytes:
+            digest, size = testcase_store.put(data)
+            row[field] = text[:PREVIEW_CHARS]
+            row[f'{field}_hash'] = digest
+            row[f'{field}_size'] = size
+        else:
+            row[field] = text
+            row[f'{field}_hash'] = None
+            row[f'{field}_size'] = len(data)
+    return row
+
+
+def resolve_test_cases(test_cases):
+    """把保存为文件的测试数据读回到 input/output 字段中（原地修改并返回）"""
+    for test_case in test_cases:
+        for field in DATA_FIELDS:
+            digest = test_case.pop(f'{field}_hash', None)
+            if digest:
+                test_case[field] = testcase_store.read_text(digest)
+    return test_cases
+
+
+@contextlib.contextmanager
+def open_test_case(test_case):
+    """打开测试用例的输入和期望输出，得到 (输入, 期望输出) 两个字节对象"""
+    with contextlib.ExitStack() as stack:
+        values = []
+        for field in DATA_FIELDS:
+            digest = test_case.get(f'{field}_hash')
+            if digest:
+                values.append(stack.enter_context(testcase_store.open(digest)))
+            else:
+                values.append((test_case.get(field) or '').encode('utf-8'))
+        yield tuple(values)
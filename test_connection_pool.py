@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+数据库连接池与事务测试
+用模拟连接代替MySQL：连接用完后等待超时、断开的连接丢弃后释放名额、超龄连接重建、空闲连接ping检查，
+嵌套事务整体回滚、回滚时不调用after_commit回调，SQL执行统计和分块批量插入
+"""
+import sys
+import threading
+import time
+sys.path.append('.')
+
+import pymysql
+
+from database import ConnectionPool, PoolTimeoutError, QueryStats, db
+from utils.fake_connection import FakeConnectionFactory, fake_database
+
+
+def test_exhausted_pool_times_out():
+    """连接全部借出后，等待超过max_wait秒抛出PoolTimeoutError"""
+    factory = FakeConnectionFactory('db')
+    pool = ConnectionPool(factory, min_size=0, max_size=2, max_wait=0.2)
+    first, second = pool.acquire(), pool.acquire()
+    started = time.monotonic()
+    try:
+        pool.acquire()
+    except PoolTimeoutError:
+        elapsed = time.monotonic() - started
+    else:
+        raise AssertionError("连接池已满时应当等待超时")
+    assert 0.15 <= elapsed < 1, elapsed
+    stats = pool.stats()
+    assert stats['timeouts'] == 1 and stats['waits'] == 1 and stats['size'] == 2
+
+    # 归还后可以再次借出，不新建连接
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(second)
+    assert len(factory.created) == 2
+
+
+def test_waiter_gets_released_connection():
+    """等待中的请求在其他请求归还连接后立即取得该连接"""
+    pool = ConnectionPool(FakeConnectionFactory('db'), min_size=0, max_size=1, max_wait=5)
+    conn = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.1)
+    assert not got
+    pool.release(conn)
+    waiter.join(timeout=2)
+    assert got == [conn]
+
+
+def test_discarded_connection_frees_slot():
+    """执行时连接断开，退出connection()时丢弃该连接并释放名额，等待的请求可以新建连接"""
+    factory = FakeConnectionFactory('db')
+    pool = ConnectionPool(factory, min_size=0, max_size=1, max_wait=5)
+    got = []
+    try:
+        with pool.connection() as conn:
+            waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+            waiter.start()
+            conn.broken = True
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+    except pymysql.err.OperationalError:
+        pass
+    else:
+        raise AssertionError("断开的连接执行语句应当出错")
+    waiter.join(timeout=2)
+
+    assert not factory.created[0].open
+    assert got and got[0] is factory.created[1]
+    stats = pool.stats()
+    assert stats['discards'] == 1 and stats['size'] == 1 and stats['creations'] == 2
+
+
+def test_non_connection_error_keeps_connection():
+    """SQL错误（非连接错误）不丢弃连接"""
+    factory = FakeConnectionFactory('db')
+    pool = ConnectionPool(factory, min_size=0, max_size=1)
+    try:
+        with pool.connection():
+            raise pymysql.err.ProgrammingError(1064, 'You have an error in your SQL syntax')
+    except pymysql.err.ProgrammingError:
+        pass
+    assert pool.acquire() is factory.created[0]
+    assert pool.stats()['discards'] == 0
+
+
+def test_recycle_after_max_age():
+    """存活超过recycle_seconds的连接借出时关闭并重建"""
+    factory = FakeConnectionFactory('db')
+    pool = ConnectionPool(factory, min_size=0, max_size=1, recycle_seconds=0.05)
+    old = pool.acquire()
+    pool.release(old)
+    assert pool.acquire() is old
+    pool.release(old)
+
+    time.sleep(0.1)
+    new = pool.acquire()
+    assert new is not old and not old.open
+    assert pool.stats()['discards'] == 1 and pool.stats()['size'] == 1
+
+
+def test_ping_idle_connection():
+    """空闲超过ping_interval的连接借出前ping检查，已断开的丢弃后重新借出"""
+    factory = FakeConnectionFactory('db')
+    pool = ConnectionPool(factory, min_size=0, max_size=2, ping_interval=0.05)
+    conn = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.1)
+    conn.broken = True
+    fresh = pool.acquire()
+    assert fresh is not conn and conn.pings == 1 and not conn.open
+
+
+def test_release_rolls_back_open_transaction():
+    """归还时回滚调用方遗留的事务并恢复自动提交"""
+    pool = ConnectionPool(FakeConnectionFactory('db'), min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.autocommit(False)
+    conn.begin()
+    pool.release(conn)
+    assert conn.rollbacks == 1 and conn.get_autocommit()
+    assert pool.acquire() is conn
+
+
+def test_nested_transaction_rollback():
+    """嵌套事务并入最外层：内层出错传到外层时整体回滚，只开始、回滚一次，不提交"""
+    with fake_database() as (primary, _):
+        try:
+            with db.transaction():
+                db.execute_update("UPDATE students SET status = %s WHERE student_id = %s", ('active', 1))
+                with db.transaction():
+                    db.execute_update("UPDATE teachers SET status = %s WHERE teacher_id = %s", ('active', 1))
+                    raise ValueError("内层失败")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("异常应当传出事务")
+        conn = primary.created[0]
+        assert conn.rollbacks == 1 and conn.commits == 0
+        assert len(conn.statements) == 2
+        assert not db.in_transaction()
+
+
+def test_nested_transaction_commits_once():
+    """嵌套事务正常结束时只在最外层提交一次"""
+    with fake_database() as (primary, _):
+        with db.transaction():
+            db.execute_update("UPDATE students SET status = %s", ('active',))
+            with db.transaction():
+                db.execute_update("UPDATE teachers SET status = %s", ('active',))
+            assert db.in_transaction()
+        conn = primary.created[0]
+        assert conn.commits == 1 and conn.rollbacks == 0
+
+
+def test_after_commit_callbacks():
+    """after_commit回调在提交后执行，回滚时丢弃，不在事务中时立即执行"""
+    with fake_database():
+        calls = []
+        try:
+            with db.transaction():
+                db.after_commit(lambda: calls.append('rolled back'))
+                with db.transaction():
+                    db.after_commit(lambda: calls.append('nested rolled back'))
+                raise ValueError("回滚")
+        except ValueError:
+            pass
+        assert calls == []
+
+        with db.transaction():
+            db.after_commit(lambda: calls.append('committed'))
+            assert calls == []
+        assert calls == ['committed']
+
+        db.after_commit(lambda: calls.append('immediate'))
+        assert calls == ['committed', 'immediate']
+
+        # 下一个事务不会再次执行已经丢弃或执行过的回调
+        with db.transaction():
+            pass
+        assert calls == ['committed', 'immediate']
+
+
+def test_query_stats():
+    """参数不同的同一条语句按指纹合并统计，超过指纹上限的并入<其他>"""
+    stats = QueryStats(max_fingerprints=2, slow_query_ms=10 ** 9)
+    stats.record("SELECT * FROM students WHERE student_id = 1", 2.0, rows=1)
+    stats.record("SELECT * FROM students WHERE student_id = 2", 4.0, rows=1)
+    stats.record("SELECT * FROM students WHERE student_id IN (1, 2, 3)", 1.0, rows=3, error=True)
+    stats.record("SELECT * FROM teachers", 1.0)
+    entries = {entry['fingerprint']: entry for entry in stats.snapshot()}
+
+    entry = entries['SELECT * FROM students WHERE student_id = ?']
+    assert entry['count'] == 2 and entry['rows'] == 2 and entry['max_ms'] == 4.0 and entry['avg_ms'] == 3.0
+    assert entries['SELECT * FROM students WHERE student_id IN (...)']['errors'] == 1
+    assert entries['<其他>']['count'] == 1
+    assert stats.snapshot(sort_by='count')[0]['count'] == 2
+
+
+def test_bulk_insert_chunks_in_one_transaction():
+    """批量插入按行数分块拼成多行INSERT，所有分块在同一个事务中提交"""
+    with fake_database() as (primary, _):
+        rows = [(1, f'input{i}', f'output{i}') for i in range(5)]
+        db.execute_bulk_insert('progressing_questions_test_cases',
+                               ['progressing_questions_id', 'input', 'output'], rows, max_rows=2)
+        conn = primary.created[0]
+        inserts = [sql for sql in conn.statements if sql.startswith('INSERT')]
+        assert len(inserts) == 3
+        assert inserts[0].count('(%s, %s, %s)') == 2 and inserts[-1].count('(%s, %s, %s)') == 1
+        assert conn.commits == 1
+
+        db.execute_bulk_insert('question_tags', ['name'], [('数组',)], ignore=True)
+        assert conn.statements[-1].startswith('INSERT IGNORE INTO question_tags')
+
+
+if __name__ == '__main__':
+    print("测试开始...")
+    test_exhausted_pool_times_out()
+    test_waiter_gets_released_connection()
+    test_discarded_connection_frees_slot()
+    test_non_connection_error_keeps_connection()
+    test_recycle_after_max_age()
+    test_ping_idle_connection()
+    test_release_rolls_back_open_transaction()
+    test_nested_transaction_rollback()
+    test_nested_transaction_commits_once()
+    test_after_commit_callbacks()
+    test_query_stats()
+    test_bulk_insert_chunks_in_one_transaction()
+    print("测试完成")
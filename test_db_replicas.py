@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+读写分离路由测试
+用模拟连接代替主库和只读副本，检查查询发往哪个库：只读语句轮流读各副本，请求作用域内固定一个副本，
+写入之后、事务中、primary()块内读主库，副本不可用时改读主库，编程题缓存始终读主库
+"""
+import sys
+import time
+sys.path.append('.')
+
+from database import db, is_replica_safe
+from services.problem_cache import ProblemCache
+from utils.fake_connection import fake_database
+
+
+def test_is_replica_safe():
+    """只读且不依赖当前连接状态的语句才能读副本"""
+    assert is_replica_safe("SELECT * FROM students")
+    assert is_replica_safe("  select 1")
+    assert is_replica_safe("WITH t AS (SELECT 1) SELECT * FROM t")
+    assert is_replica_safe("SHOW TABLES")
+    assert not is_replica_safe("UPDATE students SET email = %s")
+    assert not is_replica_safe("INSERT INTO students (username) VALUES (%s)")
+    assert not is_replica_safe("SELECT id FROM students WHERE id = %s FOR UPDATE")
+    assert not is_replica_safe("SELECT id FROM students LOCK IN SHARE MODE")
+    assert not is_replica_safe("SELECT LAST_INSERT_ID()")
+    assert not is_replica_safe("SELECT GET_LOCK('migrations', 10)")
+
+
+def test_round_robin():
+    """请求作用域之外的查询轮流发往各副本，不读主库"""
+    with fake_database(replicas=2) as (primary, replicas):
+        for _ in range(4):
+            db.execute_query("SELECT 1")
+        assert not primary.statements
+        assert [len(replica.statements) for replica in replicas] == [2, 2]
+
+
+def test_request_scope_pins_replica():
+    """请求作用域内的查询固定使用同一个副本连接"""
+    with fake_database(replicas=2) as (primary, replicas):
+        with db.request_scope():
+            names = {db.execute_query("SELECT 1")[0]['conn'] for _ in range(3)}
+        assert len(names) == 1 and not primary.statements
+        assert sum(len(replica.created) for replica in replicas) == 1
+
+
+def test_read_after_write_in_scope():
+    """请求作用域内写入过数据后，查询改读主库"""
+    with fake_database(replicas=1) as (primary, replicas):
+        with db.request_scope():
+            assert db.execute_query("SELECT 1")[0]['conn'].startswith('replica')
+            db.execute_update("UPDATE students SET email = %s", ('a@example.com',))
+            assert db.execute_query("SELECT 2")[0]['conn'].startswith('primary')
+        assert replicas[0].statements == ['SELECT 1']
+
+
+def test_transaction_and_primary_block():
+    """事务中和primary()块内的查询读主库"""
+    with fake_database(replicas=1) as (primary, replicas):
+        with db.transaction():
+            assert db.execute_query("SELECT 1")[0]['conn'].startswith('primary')
+        with db.primary():
+            assert db.execute_query("SELECT 2")[0]['conn'].startswith('primary')
+            with db.primary():
+                assert db.execute_query("SELECT 3")[0]['conn'].startswith('primary')
+            assert db.execute_query("SELECT 4")[0]['conn'].startswith('primary')
+        assert db.execute_query("SELECT 5")[0]['conn'].startswith('replica')
+        assert replicas[0].statements == ['SELECT 5']
+
+
+def test_sticky_after_write():
+    """请求作用域之外写入后，DB_REPLICA_STICKY_SECONDS秒内该线程的查询读主库"""
+    with fake_database(replicas=1) as (primary, replicas):
+        db.execute_update("UPDATE students SET email = %s", ('a@example.com',))
+        assert db.execute_query("SELECT 1")[0]['conn'].startswith('primary')
+        # 模拟写入发生在粘滞时间之前
+        db._local.last_write_at = time.monotonic() - db.config.DB_REPLICA_STICKY_SECONDS - 1
+        assert db.execute_query("SELECT 2")[0]['conn'].startswith('replica')
+
+
+def test_replica_down_falls_back_to_primary():
+    """副本连接失败时改读主库，重试间隔内不再尝试该副本"""
+    with fake_database(replicas=1) as (primary, replicas):
+        replicas[0].fail = True
+        assert db.execute_query("SELECT 1")[0]['conn'].startswith('primary')
+        replicas[0].fail = False
+        assert db.execute_query("SELECT 2")[0]['conn'].startswith('primary')
+        assert not replicas[0].created
+
+        db.replicas[0].down_until = 0
+        assert db.execute_query("SELECT 3")[0]['conn'].startswith('replica')
+
+
+def test_problem_cache_reads_primary():
+    """编程题缓存的读取不走副本，避免副本延迟时缓存修改前的测试用例"""
+    with fake_database(replicas=2) as (primary, replicas):
+        ProblemCache(max_entries=10, ttl=300).get(1)
+        assert len(primary.statements) == 2
+        assert not any(replica.statements for replica in replicas)
+
+
+if __name__ == '__main__':
+    print("测试开始...")
+    test_is_replica_safe()
+    test_round_robin()
+    test_request_scope_pins_replica()
+    test_read_after_write_in_scope()
+    test_transaction_and_primary_block()
+    test_sticky_after_write()
+    test_replica_down_falls_back_to_primary()
+    test_problem_cache_reads_primary()
+    print("测试完成")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+输出比对器测试
+各比对模式的判定结果必须与整体比较（strip()后相等、按空白拆分后相等）一致，且与输出被切成多少段无关；
+几MB的正确输出在比对器和沙箱中都不能因为比对耗时被判为超时
+"""
+import sys
+import os
+import mmap
+import tempfile
+import time
+sys.path.append('.')
+
+from services import output_checker, python_forkserver, sandbox
+
+CASES = [
+    ('1 2 3', '1 2 3'),
+    ('1 2 3\n', '  1 2 3  \n\n'),
+    ('1 2 3', '1  2 3'),
+    ('1\n2\n3', '1\r\n2\r\n3\r\n'),
+    ('1 2 3', '1 2'),
+    ('1 2', '1 2 3'),
+    ('12', '1 2'),
+    ('abc', 'abd'),
+    ('', ''),
+    ('', '   \n'),
+    ('', 'x'),
+    ('x', ''),
+    ('hello world', 'hello world '),
+    ('a\n\nb', 'a\nb'),
+]
+
+
+def feed_in_chunks(checker, actual, size):
+    data = actual.encode('utf-8')
+    for start in range(0, len(data), size):
+        if not checker.feed(data[start:start + size]):
+            break
+    return checker.finish()
+
+
+def check_all_chunk_sizes(mode, expected, actual, want):
+    for size in range(1, max(len(actual), 1) + 1):
+        checker = output_checker.create_checker(expected, mode)
+        got = feed_in_chunks(checker, actual, size)
+        assert got == want, f"{mode} 期望{expected!r} 输出{actual!r} 分段{size}: {got} != {want}"
+
+
+def test_exact_mode():
+    """exact：与 strip() 后相等一致，与分段方式无关"""
+    for expected, actual in CASES:
+        check_all_chunk_sizes('exact', expected, actual, expected.strip() == actual.strip())
+
+
+def test_whitespace_mode():
+    """whitespace：与按空白拆分后相等一致，与分段方式无关"""
+    for expected, actual in CASES:
+        check_all_chunk_sizes('whitespace', expected, actual, expected.split() == actual.split())
+
+
+def test_float_mode():
+    """float：数值按误差容限比较，非数值的词必须完全一致"""
+    cases = [
+        ('3.14159 2', '3.141592 2', True),
+        ('3.14159 2', '3.2 2', False),
+        ('1e9', '1000000000.0000001', True),
+        ('0.5 abc', '0.5 abd', False),
+        ('0.5', '0.5 0.5', False),
+        ('1.0\n2.0', '1\n2', True),
+    ]
+    for expected, actual, want in cases:
+        for size in range(1, len(actual) + 1):
+            checker = output_checker.create_checker(expected, 'float', float_tolerance=1e-6)
+            assert feed_in_chunks(checker, actual, size) == want, (expected, actual, size)
+
+
+def test_mmap_expected():
+    """期望输出为mmap时按位置切片比较"""
+    with tempfile.TemporaryFile() as f:
+        f.write(b'\n 1 2\n3 \n')
+        f.flush()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as expected:
+            for mode in ('exact', 'whitespace'):
+                checker = output_checker.create_checker(expected, mode)
+                assert feed_in_chunks(checker, '1 2\n3\n', 2), mode
+                checker = output_checker.create_checker(expected, mode)
+                assert not feed_in_chunks(checker, '1 2\n4\n', 2), mode
+
+
+def large_output(lines=1200000):
+    return ''.join(f'{i} {i * 0.5}\n' for i in range(lines))
+
+
+def test_large_output_speed():
+    """约10MB的正确输出按64KB分段比对，各模式都应在1秒内完成"""
+    text = large_output()
+    data = text.encode('utf-8')
+    for mode in ('exact', 'whitespace', 'float'):
+        checker = output_checker.create_checker(data, mode, float_tolerance=1e-6)
+        started = time.perf_counter()
+        for start in range(0, len(data), 65536):
+            assert checker.feed(data[start:start + 65536]), mode
+        assert checker.finish(), mode
+        elapsed = time.perf_counter() - started
+        print(f"{mode:>10} 比对 {len(data) / 1024 / 1024:.1f}MB: {elapsed:.3f}s")
+        assert elapsed < 1, f"{mode} 比对耗时 {elapsed:.3f}s"
+
+
+def test_sandbox_large_output():
+    """沙箱和fork服务器中输出几MB的正确程序应判为通过，不因比对耗时超时"""
+    if sandbox.resource is None:
+        print("当前平台不支持沙箱，跳过")
+        return
+    lines = 600000
+    expected = large_output(lines)
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write(f"import sys\nsys.stdout.write(''.join(f'{{i}} {{i * 0.5}}\\n' for i in range({lines})))\n")
+        script = f.name
+    try:
+        limits = sandbox.SandboxLimits(timeout=5, memory_mb=0)
+        runners = [('sandbox', lambda checker: sandbox.run([sys.executable, script], '', limits, checker=checker))]
+        if python_forkserver.FORKSERVER_SUPPORTED:
+            runners.append(('forkserver', lambda checker: python_forkserver.forkserver.run(script, '', limits, checker)))
+        for name, run in runners:
+            for mode in ('exact', 'whitespace'):
+                checker = output_checker.create_checker(expected, mode)
+                result = run(checker)
+                assert result.verdict == sandbox.VERDICT_OK, (name, mode, result.verdict, result.stderr)
+                assert checker.finish(), (name, mode)
+                print(f"{name:>10} {mode:>10}: {result.time_ms}ms, 比对 {checker.busy_seconds * 1000:.0f}ms")
+    finally:
+        os.unlink(script)
+        python_forkserver.forkserver.shutdown()
+
+
+if __name__ == '__main__':
+    print("测试开始...")
+    test_exact_mode()
+    test_whitespace_mode()
+    test_float_mode()
+    test_mmap_expected()
+    test_large_output_speed()
+    test_sandbox_large_output()
+    print("测试完成")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+游标分页工具测试
+游标编码后再解析必须得到原来的排序键（含datetime），格式错误、排序键个数不对的游标一律报 CursorError
+"""
+import sys
+import base64
+import datetime
+sys.path.append('.')
+
+from utils.pagination import CursorError, decode_cursor, encode_cursor, page_result
+
+CONVERTERS = (datetime.datetime.fromisoformat, str, int)
+
+
+def expect_cursor_error(token, converters=CONVERTERS):
+    try:
+        decode_cursor(token, converters)
+    except CursorError:
+        return
+    raise AssertionError(f"游标 {token!r} 应当无效")
+
+
+def test_round_trip():
+    """datetime、中文字符串、整数编码后解析不变，游标只包含URL安全字符"""
+    keys = [
+        (datetime.datetime(2024, 5, 1, 8, 30, 15), 'progressing', 42),
+        (datetime.datetime(2024, 5, 1, 8, 30, 15, 123456), '选择题', 0),
+        (datetime.datetime(1999, 12, 31), '', 2 ** 40),
+    ]
+    for key in keys:
+        token = encode_cursor(*key)
+        assert decode_cursor(token, CONVERTERS) == key, (key, token)
+        assert '=' not in token and '+' not in token and '/' not in token, token
+
+
+def test_malformed_cursor():
+    """不是base64、不是JSON、不是列表或值无法转换的游标都无效"""
+    expect_cursor_error('')
+    expect_cursor_error('!!!')
+    expect_cursor_error(base64.urlsafe_b64encode(b'not json').decode('ascii'))
+    expect_cursor_error(base64.urlsafe_b64encode(b'{"a": 1}').decode('ascii'))
+    expect_cursor_error(base64.urlsafe_b64encode(b'\xff\xfe').decode('ascii'))
+    expect_cursor_error(encode_cursor('not a date', 'choice', 1))
+    expect_cursor_error(encode_cursor(datetime.datetime(2024, 1, 1), 'choice', 'abc'))
+    expect_cursor_error(encode_cursor(datetime.datetime(2024, 1, 1), 'choice', None))
+
+
+def test_wrong_length_cursor():
+    """排序键个数与接口的排序键不一致的游标无效（如把其他列表的游标传给本接口）"""
+    now = datetime.datetime(2024, 1, 1)
+    expect_cursor_error(encode_cursor(now, 1))
+    expect_cursor_error(encode_cursor(now, 'choice', 1, 2))
+    expect_cursor_error(encode_cursor())
+    assert decode_cursor(encode_cursor('teacher1', 7), (str, int)) == ('teacher1', 7)
+
+
+def test_page_result():
+    """多读的一行决定是否有下一页，下一页游标取本页最后一行"""
+    rows = [{'id': i} for i in range(6)]
+    page, info = page_result(rows, 5, lambda row: (row['id'],))
+    assert len(page) == 5 and info['has_more']
+    assert decode_cursor(info['next_cursor'], (int,)) == (4,)
+
+    page, info = page_result(rows[:5], 5, lambda row: (row['id'],))
+    assert len(page) == 5 and not info['has_more'] and info['next_cursor'] is None
+
+    page, info = page_result([], 5, lambda row: (row['id'],))
+    assert page == [] and not info['has_more'] and info['next_cursor'] is None
+
+
+if __name__ == '__main__':
+    print("测试开始...")
+    test_round_trip()
+    test_malformed_cursor()
+    test_wrong_length_cursor()
+    test_page_result()
+    print("测试完成")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+接口SQL查询次数回归测试
+用合成数据代替数据库返回结果，统计接口在不同数据量下执行的查询次数，
+查询次数必须与数据量（班级人数、作业数、题目数）无关，避免逐行查询的N+1问题
+"""
+import sys
+import time
+import datetime
+sys.path.append('.')
+
+from flask import Flask
+
+from api.students import students_bp
+from api.teachers import teachers_bp
+from utils.query_counter import QueryCounter
+
+SIZES = [3, 30, 300]
+QUESTIONS_PER_HOMEWORK = 5
+QUESTION_TYPES = ['progressing', 'choice', 'judgment']
+
+
+def fake_rows(sql, params, size):
+    """按SQL涉及的表返回合成数据，size为班级人数/作业数/题目数"""
+    now = datetime.datetime.now()
+    params = tuple(params or ())
+
+    # 作业提交情况（教师）
+    if 'FROM homework_assignments ha' in sql and 'JOIN courses co' in sql:
+        return [{'id': 1, 'title': '作业1', 'class_id': 1, 'class_name': '一班', 'course_name': 'Python'}]
+    if 'FROM student_classes sc' in sql and 'JOIN students s' in sql:
+        return [{'student_id': i, 'username': f'student{i}', 'email': f's{i}@example.com'}
+                for i in range(1, size + 1)]
+
+    # 待批改作业（教师）
+    if 'FROM homework_submission_summary ss' in sql:
+        return [{'student_id': i, 'homework_id': 1, 'student_name': f'student{i}', 'student_email': f's{i}@example.com',
+                 'assignment_name': '作业1', 'class_name': '一班', 'last_submit_time': now,
+                 'submitted_questions': QUESTIONS_PER_HOMEWORK, 'completed_questions': i % 2,
+                 'pending_questions': i % 2, 'total_questions': QUESTIONS_PER_HOMEWORK}
+                for i in range(1, size + 1)]
+
+    # 学生作业列表
+    if 'FROM homework_assignments ha' in sql and 'ha.course_id = %s' in sql:
+        return [{'id': i, 'title': f'作业{i}', 'description': '', 'deadline': now, 'created_at': now,
+                 'submission_count': i % 2}
+                for i in range(1, size + 1)]
+
+    # 学生作业提交详情（教师）
+    if 'SELECT ha.id FROM homework_assignments ha' in sql:
+        return [{'id': 1}]
+    if 'JOIN students s ON s.student_id = %s' in sql:
+        return [{'assignment_name': '作业1', 'student_name': 'student1', 'student_email': 's1@example.com',
+                 'class_id': 1, 'class_name': '一班'}]
+    if 'FROM homework_questions hq' in sql:
+        return [{'question_id': i, 'question_type': QUESTION_TYPES[i % 3]} for i in range(1, size + 1)]
+    for q_type in QUESTION_TYPES:
+        if f'FROM {q_type}_questions' in sql:
+            correct = 'A' if q_type == 'choice' else 1
+            return [{'id': q_id, 'title': f'题目{q_id}', 'description': '', 'solution_idea': '',
+                     'correct_answer': correct, 'options': '{"A": "1"}', 'created_at': now}
+                    for q_id in params]
+    if 'FROM student_answers sa' in sql and 'sa.answer_text' in sql:
+        question_ids = [params[2]] if 'sa.question_id = %s' in sql else range(1, size + 1)
+        return [{'question_id': q_id, 'status': 'graded', 'score': 10, 'is_correct': 1, 'answer_text': None,
+                 'choice_answer': 'A', 'judgment_answer': 1, 'teacher_comment': None,
+                 'last_attempt_at': now, 'graded_at': now}
+                for q_id in question_ids]
+    if 'FROM programming_submissions' in sql:
+        question_ids = [params[2]] if 'question_id = %s' in sql else range(1, size + 1)
+        return [{'question_id': q_id, 'submission_code': 'print(1)', 'run_status': 'success',
+                 'execution_time': 5, 'memory_usage': None, 'compile_error': None,
+                 'runtime_error': None, 'test_results': None}
+                for q_id in question_ids]
+
+    # 作业提交情况中的答题记录
+    if 'FROM student_answers sa' in sql:
+        students = [params[0]] if 'sa.student_id = %s' in sql else range(1, size + 1)
+        return [{'student_id': i, 'question_id': q, 'question_type': 'choice', 'status': 'graded',
+                 'score': 10, 'is_correct': 1, 'submit_time': now, 'teacher_comment': None,
+                 'question_title': f'题目{q}'}
+                for i in students for q in range(1, QUESTIONS_PER_HOMEWORK + 1)]
+    return []
+
+
+def create_test_app():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(teachers_bp)
+    app.register_blueprint(students_bp)
+    return app
+
+
+def run_benchmark(app, url, size, identity='teacher'):
+    """请求接口，返回 (查询次数, 耗时毫秒, 响应JSON)"""
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['identity'] = identity
+            session['user_id'] = 1
+        with QueryCounter(lambda sql, params: fake_rows(sql, params, size)) as counter:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+    return counter.count, elapsed_ms, response.get_json()
+
+
+def check_constant_queries(name, url, identity, check_response):
+    app = create_test_app()
+    counts = []
+    for size in SIZES:
+        count, elapsed_ms, data = run_benchmark(app, url, size, identity)
+        assert data['success'], data
+        check_response(data['data'], size)
+        print(f"{name} 数据量 {size:>4}: 查询 {count} 次, 耗时 {elapsed_ms:.1f}ms")
+        counts.append(count)
+    assert len(set(counts)) == 1, f"{name} 查询次数随数据量变化: {counts}"
+
+
+def test_assignment_submissions_constant_queries():
+    """作业提交情况：查询次数与班级人数无关，响应结构不变"""
+    def check(data, size):
+        submissions = data['submissions']
+        assert len(submissions) == size
+        assert len(submissions[0]['answers']) == QUESTIONS_PER_HOMEWORK
+        assert submissions[0]['total_score'] == 10 * QUESTIONS_PER_HOMEWORK
+        assert data['class_stats']['total_students'] == size
+
+    check_constant_queries('作业提交情况', '/api/teacher/assignment/1/submissions', 'teacher', check)
+
+
+def test_student_assignments_constant_queries():
+    """学生作业列表：查询次数与作业数无关"""
+    def check(data, size):
+        assert len(data) == size
+        assert data[0]['status'] == 'completed' and 'submission_count' not in data[0]
+        if size > 1:
+            assert data[1]['status'] == 'pending'
+
+    check_constant_queries('学生作业列表', '/api/student/assignments?course_id=1', 'student', check)
+
+
+def test_student_assignment_submissions_constant_queries():
+    """学生作业提交详情：查询次数与题目数无关"""
+    def check(data, size):
+        submissions = data['submissions']
+        assert len(submissions) == size
+        programming = [submission for submission in submissions if submission['question_type'] == 'progressing']
+        assert all(submission['code'] == 'print(1)' for submission in programming)
+        assert all(submission['is_graded'] for submission in submissions)
+
+    check_constant_queries('学生作业提交详情', '/api/teacher/assignment/1/1/submissions', 'teacher', check)
+
+
+def test_pending_submissions_constant_queries():
+    """待批改作业：只读取汇总表，查询次数与提交数无关"""
+    def check(data, size):
+        assert len(data) == size
+        assert data[0]['completion_status'] == 'completed' and data[0]['status'] == '待批改'
+        if size > 1:
+            assert data[1]['status'] == '已完成'
+
+    check_constant_queries('待批改作业', '/api/teacher/submissions/pending', 'teacher', check)
+
+
+if __name__ == '__main__':
+    print("测试开始...")
+    test_assignment_submissions_constant_queries()
+    test_student_assignments_constant_queries()
+    test_student_assignment_submissions_constant_queries()
+    test_pending_submissions_constant_queries()
+    print("测试完成")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+知识点标签拆分测试
+知识点文本按中英文逗号、顿号、中英文分号拆分，合并多余空白，去掉空项和重复项并保持原顺序，标签名最多50个字符
+"""
+import sys
+sys.path.append('.')
+
+from services.question_tags import TAG_MAX_CHARS, parse_knowledge_points
+
+
+def test_mixed_separators():
+    """各种分隔符混用"""
+    assert parse_knowledge_points('数组,链表，栈、队列;哈希表；树') == ['数组', '链表', '栈', '队列', '哈希表', '树']
+    assert parse_knowledge_points('动态规划') == ['动态规划']
+
+
+def test_whitespace_and_empty():
+    """合并标签内的空白，去掉首尾空白和空项"""
+    assert parse_knowledge_points('  binary   search ,\t two\npointers ') == ['binary search', 'two pointers']
+    assert parse_knowledge_points(',，、 ;；') == []
+    assert parse_knowledge_points('') == []
+    assert parse_knowledge_points(None) == []
+
+
+def test_dedup_keeps_order():
+    """重复的标签只保留第一次出现的位置；大小写不同视为不同标签"""
+    assert parse_knowledge_points('排序，查找,排序、 查找 ;递归') == ['排序', '查找', '递归']
+    assert parse_knowledge_points('DP, dp, DP') == ['DP', 'dp']
+
+
+def test_truncation():
+    """超过50个字符的标签截断，截断后相同的标签合并"""
+    long_name = '很长的知识点' * 20
+    names = parse_knowledge_points(f'{long_name},{long_name}x,短')
+    assert names == [long_name[:TAG_MAX_CHARS], '短']
+    assert len(names[0]) == TAG_MAX_CHARS == 50
+
+
+if __name__ == '__main__':
+    print("测试开始...")
+    test_mixed_separators()
+    test_whitespace_and_empty()
+    test_dedup_keeps_order()
+    test_truncation()
+    print("测试完成")
@@ -1,7 +1,30 @@
 # -*- coding: utf-8 -*-
 from database import db
+from services.problem_cache import problem_cache
+from services.question_catalog import sync_question
+from services.testcase_store import prepare_test_case
 import json
 
+# 测试用例表插入的列
+TEST_CASE_COLUMNS = ['progressing_questions_id', 'input', 'output', 'input_hash', 'input_size',
+                     'output_hash', 'output_size', 'is_example']
+
+
+def insert_test_cases(problem_id, test_cases):
+    """
+    批量插入编程题的测试用例（较大的数据保存为文件），跳过输入输出都为空的用例
+    :param test_cases: 测试用例列表，格式: [{'input': '...', 'output': '...'}, ...]
+    :return: 插入的测试用例数
+    """
+    rows = []
+    for test_case in test_cases or []:
+        if isinstance(test_case, dict) and (test_case.get('input') or test_case.get('output')):
+            row = prepare_test_case(test_case.get('input', ''), test_case.get('output', ''))
+            rows.append((problem_id, row['input'], row['output'], row['input_hash'], row['input_size'],
+                         row['output_hash'], row['output_size'], False))
+    return db.execute_bulk_insert('progressing_questions_test_cases', TEST_CASE_COLUMNS, rows)
+
+
 def import_problem_to_db(title, description, input_desc=None, output_desc=None, test_cases=None,
                         difficulty='中等', solution_idea=None, reference_code=None,
                         question_type='programming', options=None, correct_answer=None, is_true=None,
@@ -36,18 +59,13 @@ def import_problem_to_db(title, description, input_desc=None, output_desc=None,
                 title, language, description, difficulty, knowledge_points or '',
                 input_desc, output_desc, solution_idea, reference_code
             ]
-            problem_id = db.execute_insert(sql, params)
-
-            # 插入测试用例
-            if test_cases and len(test_cases) > 0:
-                for test_case in test_cases:
-                    if isinstance(test_case, dict) and (test_case.get('input') or test_case.get('output')):
-                        db.execute_update("""
-                            INSERT INTO progressing_questions_test_cases
-                            (progressing_questions_id, input, output, is_example)
-                            VALUES (%s, %s, %s, %s)
-                        """, (problem_id, test_case.get('input', ''), test_case.get('output', ''), False))
+            # 题目和测试用例在同一个事务中插入
+            with db.transaction():
+                problem_id = db.execute_insert(sql, params)
+                insert_test_cases(problem_id, test_cases)
+                sync_question('progressing', problem_id)
 
+            problem_cache.invalidate(problem_id)
             return {"success": True, "id": problem_id}
 
         elif question_type == 'choice':
@@ -62,7 +80,9 @@ def import_problem_to_db(title, description, input_desc=None, output_desc=None,
                 json.dumps(options) if options else '[]',
                 correct_answer, solution_idea
             ]
-            choice_id = db.execute_update(sql, params)
+            with db.transaction():
+                choice_id = db.execute_insert(sql, params)
+                sync_question('choice', choice_id)
             return {"success": True, "id": choice_id}
 
         elif question_type == 'judgment':
@@ -76,7 +96,9 @@ def import_problem_to_db(title, description, input_desc=None, output_desc=None,
                 title, language, description, difficulty, knowledge_points or '',
                 is_true, solution_idea
             ]
-            judgment_id = db.execute_update(sql, params)
+            with db.transaction():
+                judgment_id = db.execute_insert(sql, params)
+                sync_question('judgment', judgment_id)
             return {"success": True, "id": judgment_id}
 
         else:
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+模拟数据库连接（用于测试）
+没有MySQL时用来测试连接池、读写分离等与连接打交道的逻辑：连接记录执行过的语句和提交、回滚次数，
+可以指定连接断开、建立连接失败；fake_database() 把全局 db 的主库和副本换成模拟连接的连接池：
+
+    with fake_database(replicas=2) as (primary, replicas):
+        db.execute_query("SELECT 1")
+    print(primary.statements, [replica.statements for replica in replicas])
+"""
+
+import contextlib
+import threading
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+from database import ConnectionPool, _Replica, db
+
+
+class FakeCursor:
+    """模拟游标：execute记录语句，fetchall返回执行该语句的连接名"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = 0
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.check()
+        self.conn.statements.append(' '.join(sql.split()))
+        self._rows = [{'conn': self.conn.name}]
+        self.lastrowid = len(self.conn.statements)
+        return 1
+
+    def executemany(self, sql, params_list):
+        for params in params_list:
+            self.execute(sql, params)
+        return len(params_list)
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeConnection:
+    """模拟的pymysql连接"""
+
+    def __init__(self, name):
+        self.name = name
+        self.open = True
+        self.broken = False  # 设为True后所有操作抛出连接断开的错误
+        self.statements = []
+        self.server_status = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.pings = 0
+        self._autocommit = True
+
+    def check(self):
+        if self.broken or not self.open:
+            raise pymysql.err.OperationalError(2013, 'Lost connection to MySQL server during query')
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def begin(self):
+        self.check()
+        self.server_status |= SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def commit(self):
+        self.check()
+        self.commits += 1
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def rollback(self):
+        self.check()
+        self.rollbacks += 1
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        self.check()
+
+    def get_autocommit(self):
+        return self._autocommit
+
+    def autocommit(self, value):
+        self._autocommit = value
+
+    def close(self):
+        self.open = False
+
+
+class FakeConnectionFactory:
+    """模拟连接的工厂，传给ConnectionPool作为create_connection"""
+
+    def __init__(self, name):
+        self.name = name
+        self.created = []
+        self.fail = False  # 设为True后建立连接失败（如副本不可达）
+
+    def __call__(self):
+        if self.fail:
+            raise pymysql.err.OperationalError(2003, f"Can't connect to MySQL server on '{self.name}'")
+        conn = FakeConnection(f'{self.name}-{len(self.created) + 1}')
+        self.created.append(conn)
+        return conn
+
+    @property
+    def statements(self):
+        """该工厂建立的所有连接执行过的语句"""
+        return [sql for conn in self.created for sql in conn.statements]
+
+
+@contextlib.contextmanager
+def fake_database(replicas=0, **pool_options):
+    """
+    把全局db的主库和只读副本换成模拟连接的连接池，退出时恢复
+    :param pool_options: 传给ConnectionPool的参数（max_size、max_wait等）
+    :return: (主库连接工厂, [副本连接工厂])
+    """
+    saved = db.connection_pool, db.replicas, db._replica_index, db._local
+    primary = FakeConnectionFactory('primary')
+    replica_factories = [FakeConnectionFactory(f'replica{i}') for i in range(replicas)]
+    db.connection_pool = ConnectionPool(primary, **pool_options)
+    db.replicas = [_Replica(factory.name, ConnectionPool(factory, **pool_options)) for factory in replica_factories]
+    db._replica_index = 0
+    db._local = threading.local()
+    try:
+        yield primary, replica_factories
+    finally:
+        db.connection_pool, db.replicas, db._replica_index, db._local = saved
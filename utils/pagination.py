@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+游标（keyset）分页工具
+列表按固定的排序键（如 创建时间+题型+ID）排序，每页返回最后一行排序键编码成的不透明游标，
+下一页用 WHERE 排序键 < 游标 继续读取，查询代价与翻到第几页无关，不需要 OFFSET 跳过前面的行。
+游标只是排序键的 base64 编码，不包含权限信息，接口仍需按原有条件过滤
+"""
+
+import base64
+import datetime
+import json
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 1000
+
+
+class CursorError(ValueError):
+    """游标格式错误"""
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(*values):
+    """把排序键编码为游标字符串"""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, converters):
+    """
+    解析游标字符串
+    :param token: encode_cursor 生成的游标
+    :param converters: 每个排序键的转换函数，如 (datetime.datetime.fromisoformat, str, int)
+    :return: 排序键元组
+    :raises CursorError: 游标格式错误或与排序键不匹配
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if not isinstance(values, list) or len(values) != len(converters):
+            raise CursorError("无效的分页游标")
+        return tuple(convert(value) for convert, value in zip(converters, values))
+    except CursorError:
+        raise
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise CursorError("无效的分页游标") from e
+
+
+def cursor_requested(args):
+    """请求是否使用游标分页（带 cursor 参数，首页传空字符串）"""
+    return 'cursor' in args
+
+
+def page_size(args, default=DEFAULT_PAGE_SIZE):
+    """每页行数（per_page 参数，限制在 1~MAX_PAGE_SIZE）"""
+    size = args.get('per_page', default, type=int) or default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def include_total(args):
+    """游标分页默认不统计总数，include_total=true 时统计"""
+    return args.get('include_total', 'false').lower() == 'true'
+
+
+def page_result(rows, size, cursor_of):
+    """
+    根据多读的一行判断是否还有下一页
+    :param rows: 按排序键读取的 size+1 行
+    :param cursor_of: 根据一行生成排序键元组的函数
+    :return: (本页数据, 分页信息)
+    """
+    has_more = len(rows) > size
+    rows = rows[:size]
+    next_cursor = encode_cursor(*cursor_of(rows[-1])) if has_more and rows else None
+    return rows, {"per_page": size, "has_more": has_more, "next_cursor": next_cursor}
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+SQL查询次数统计工具（用于测试）
+统计代码块内通过全局 db 执行的SQL语句，可用于检查任意接口的查询次数是否与数据量无关：
+
+    with QueryCounter() as counter:
+        client.get('/api/...')
+    print(counter.count, counter.statements)
+
+    with assert_max_queries(3):
+        client.get('/api/...')
+
+没有数据库时可以传入responder(sql, params)返回合成的查询结果，此时不会真正执行SQL
+"""
+
+import contextlib
+
+from database import db
+
+# 统计的数据库调用（execute_bulk_insert内部调用execute_update，按实际执行的语句计数）
+COUNTED_METHODS = ('execute_query', 'execute_update', 'execute_insert', 'execute_many_update')
+
+
+class QueryCounter:
+    """统计代码块内执行的SQL语句"""
+
+    def __init__(self, responder=None):
+        self.responder = responder
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        self.statements = []
+        for name in COUNTED_METHODS:
+            setattr(db, name, self._wrap(name, getattr(db, name)))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 删除实例属性，恢复为类上定义的方法
+        for name in COUNTED_METHODS:
+            db.__dict__.pop(name, None)
+        return False
+
+    def _wrap(self, name, method):
+        def counted(sql, params=None):
+            self.statements.append(' '.join(sql.split()))
+            if self.responder is None:
+                return method(sql, params)
+            if name == 'execute_query':
+                return self.responder(sql, params)
+            return 0
+        return counted
+
+
+@contextlib.contextmanager
+def assert_max_queries(limit, responder=None):
+    """代码块内执行的SQL语句超过limit条时抛出AssertionError（列出执行的语句）"""
+    with QueryCounter(responder) as counter:
+        yield counter
+    if counter.count > limit:
+        raise AssertionError(
+            f"执行了 {counter.count} 条SQL，超过上限 {limit}:\n" + '\n'.join(counter.statements)
+        )